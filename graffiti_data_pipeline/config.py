@@ -16,12 +16,73 @@ GRAFFITI_FILTER_ACTIVE_SERVICE_REQUESTS = (
 GRAFFITI_RECENT_REQUEST_DAYS = int(os.environ.get("GRAFFITI_RECENT_REQUEST_DAYS", 365))
 
 GRAFFITI_LOOKUPS_FILE = "public/graffiti-lookups.json"
+GRAFFITI_LOOKUPS_CHECKPOINT_FILE = "public/graffiti-lookups.checkpoint.jsonl"
 GEOCODE_CACHE_FILE = "public/geocode-cache.json"
+# Kept outside public/ so the trained model is never deployed with the site.
+GRAFFITI_MODEL_FILE = "data/graffiti-prediction-model.joblib"
+# NumPy-only export of the model, loaded by --predict-only runs.
+GRAFFITI_PACKED_MODEL_FILE = "data/graffiti-prediction-model.packed.joblib"
+FEATURE_CACHE_FILE = "data/feature-cache.joblib"
+PREDICTION_CACHE_FILE = "data/prediction-cache.joblib"
+# Prediction fields and source fingerprints per service request.  Fetch
+# replaces the lookups records every night, so predict-only runs read
+# what was predicted from here rather than from the records.
+PREDICTION_STORE_FILE = "data/prediction-store.json"
+# With PREDICTION_SIDECAR=True predictions go to this file, keyed by
+# service request, and the lookups file is left untouched.
+PREDICTIONS_SIDECAR_FILE = "public/graffiti-predictions.json"
+PREDICTION_SIDECAR = os.environ.get("PREDICTION_SIDECAR", "False") == "True"
+# Stage timings the prediction benchmark compares each run against.
+PREDICTION_BENCHMARK_BASELINE_FILE = (
+    "graffiti_data_pipeline/prediction/benchmark_baseline.json"
+)
 
 NYC_BOROUGHS = {"manhattan", "brooklyn", "queens", "bronx", "staten island"}
+# GeoJSON borough polygons, such as NYC Open Data's Borough Boundaries.
+# Without the file, boroughs are read from the address text.
+BOROUGH_BOUNDARIES_FILE = os.environ.get(
+    "BOROUGH_BOUNDARIES_FILE", "data/borough-boundaries.geojson"
+)
+BOROUGH_NAME_PROPERTY = os.environ.get("BOROUGH_NAME_PROPERTY", "boro_name")
 
 REQUEST_USER_AGENT = "graffiti-lookup-nyc-web"
 REQUEST_TIMEOUT = int(os.environ.get("REQUEST_TIMEOUT", 10))
 REQUEST_MIN_DELAY_SECONDS = float(os.environ.get("REQUEST_MIN_DELAY_SECONDS", 1.5))
 REQUEST_MAX_RETRIES = int(os.environ.get("REQUEST_MAX_RETRIES", 3))
 REQUEST_ERROR_WAIT_SECONDS = float(os.environ.get("REQUEST_ERROR_WAIT_SECONDS", 5.0))
+
+GRAFFITI_LOOKUP_URL = os.environ.get("GRAFFITI_LOOKUP_URL")
+GRAFFITI_LOOKUP_TIMEOUT = int(os.environ.get("GRAFFITI_LOOKUP_TIMEOUT", 10))
+GRAFFITI_LOOKUP_MAX_CONNECTIONS = int(
+    os.environ.get("GRAFFITI_LOOKUP_MAX_CONNECTIONS", 10)
+)
+GRAFFITI_LOOKUP_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.environ.get("GRAFFITI_LOOKUP_MAX_KEEPALIVE_CONNECTIONS", 5)
+)
+GRAFFITI_LOOKUP_CONCURRENCY = int(os.environ.get("GRAFFITI_LOOKUP_CONCURRENCY", 10))
+GRAFFITI_LOOKUP_MAX_RETRIES = int(os.environ.get("GRAFFITI_LOOKUP_MAX_RETRIES", 3))
+GRAFFITI_LOOKUP_BACKOFF_SECONDS = float(
+    os.environ.get("GRAFFITI_LOOKUP_BACKOFF_SECONDS", 1.0)
+)
+
+FEATURE_WORKERS = int(os.environ.get("FEATURE_WORKERS", 1))
+FEATURE_PARALLEL_MIN_REQUESTS = int(
+    os.environ.get("FEATURE_PARALLEL_MIN_REQUESTS", 100_000)
+)
+
+MODEL_N_JOBS = int(os.environ.get("MODEL_N_JOBS", 1))
+MODEL_ENGINE = os.environ.get("MODEL_ENGINE", "random_forest")
+MODEL_MULTI_OUTPUT = os.environ.get("MODEL_MULTI_OUTPUT", "False") == "True"
+MODEL_ADAPTIVE_TREES = os.environ.get("MODEL_ADAPTIVE_TREES", "False") == "True"
+MODEL_WARM_START_TREES = int(os.environ.get("MODEL_WARM_START_TREES", 10))
+MODEL_MAX_TREES = int(os.environ.get("MODEL_MAX_TREES", 200))
+# Cap on rows per training run, sampled per label; 0 trains on every row.
+MODEL_MAX_TRAINING_ROWS = int(os.environ.get("MODEL_MAX_TRAINING_ROWS", 0))
+# Per-borough model shards; smaller boroughs use the global model.
+MODEL_SHARDED = os.environ.get("MODEL_SHARDED", "False") == "True"
+MODEL_SHARD_MIN_ROWS = int(os.environ.get("MODEL_SHARD_MIN_ROWS", 1000))
+
+INFERENCE_SERVER_PORT = int(os.environ.get("INFERENCE_SERVER_PORT", 8765))
+# Requests are batched until this many rows are queued or the wait ends.
+INFERENCE_MAX_BATCH_ROWS = int(os.environ.get("INFERENCE_MAX_BATCH_ROWS", 1024))
+INFERENCE_BATCH_WAIT_MS = float(os.environ.get("INFERENCE_BATCH_WAIT_MS", 5))
@@ -0,0 +1,3 @@
+from graffiti_data_pipeline.fetch.fetcher import FetchResult, ServiceRequestFetcher
+
+__all__ = ["FetchResult", "ServiceRequestFetcher"]
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Entry point for fetching graffiti service requests from NYC 311."""
+
+import argparse
+import asyncio
+
+from graffiti_data_pipeline.config import (
+    GRAFFITI_LOOKUPS_CHECKPOINT_FILE,
+    GRAFFITI_LOOKUPS_FILE,
+)
+from graffiti_data_pipeline.fetch.fetcher import ServiceRequestFetcher
+from graffiti_data_pipeline.logger import get_logger
+from graffiti_data_pipeline.storages import JsonFile, JsonLinesFile
+
+logger = get_logger(__name__)
+
+
+def merge_with_previous(service_request_ids, result, previous_records):
+    """Order fetched records by ID, keeping old records for failed IDs.
+
+    A failed lookup falls back to the record saved by an earlier run,
+    so a flaky night does not drop requests from the lookups file.
+    """
+    previous = {record.get("service_request"): record for record in previous_records}
+    merged = []
+    for service_request_id in dict.fromkeys(service_request_ids):
+        record = result.records.get(service_request_id) or previous.get(
+            service_request_id
+        )
+        if record:
+            merged.append(record)
+    return merged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Fetch graffiti service requests from NYC 311."
+    )
+    parser.add_argument(
+        "--ids",
+        type=str,
+        required=True,
+        help="Comma separated list of graffiti service request IDs",
+    )
+    parser.add_argument(
+        "--file-path",
+        type=str,
+        default=GRAFFITI_LOOKUPS_FILE,
+        help="Path to write the graffiti service requests JSON file",
+    )
+    parser.add_argument(
+        "--checkpoint-path",
+        type=str,
+        default=GRAFFITI_LOOKUPS_CHECKPOINT_FILE,
+        help="Path of the JSON lines checkpoint used to resume a run",
+    )
+    args = parser.parse_args(argv)
+
+    service_request_ids = [
+        service_request_id.strip()
+        for service_request_id in args.ids.split(",")
+        if service_request_id.strip()
+    ]
+    checkpoint = JsonLinesFile(args.checkpoint_path)
+    fetcher = ServiceRequestFetcher.from_config(checkpoint)
+    result = asyncio.run(fetcher.fetch_all(service_request_ids))
+
+    lookups = JsonFile(args.file_path, default_data=[])
+    records = merge_with_previous(service_request_ids, result, lookups.load())
+    lookups.save(records)
+    checkpoint.clear()
+    logger.info(f"Saved {len(records)} service requests to {args.file_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Concurrent fetching of NYC graffiti service requests."""
+
+import asyncio
+from typing import Dict, List, NamedTuple
+
+import httpx
+from graffiti_lookup.client import GraffitiLookup
+
+from graffiti_data_pipeline.config import (
+    GRAFFITI_LOOKUP_BACKOFF_SECONDS,
+    GRAFFITI_LOOKUP_CONCURRENCY,
+    GRAFFITI_LOOKUP_MAX_CONNECTIONS,
+    GRAFFITI_LOOKUP_MAX_KEEPALIVE_CONNECTIONS,
+    GRAFFITI_LOOKUP_MAX_RETRIES,
+    GRAFFITI_LOOKUP_TIMEOUT,
+    GRAFFITI_LOOKUP_URL,
+)
+from graffiti_data_pipeline.logger import get_logger
+
+logger = get_logger(__name__)
+
+PROGRESS_LOG_INTERVAL = 100
+
+
+class FetchResult(NamedTuple):
+    """Fetched records keyed by requested ID, and the IDs that failed."""
+
+    records: Dict[str, dict]
+    failed_ids: List[str]
+
+
+class ServiceRequestFetcher:
+    """Fetches service request records with bounded concurrency.
+
+    Wraps an async lookup callable that resolves one service request
+    ID to its record dict.  At most *concurrency* lookups are in
+    flight at once, and transient failures (HTTP errors or empty
+    responses) are retried with exponential backoff.
+
+    Every record is appended to the *checkpoint* store as soon as it
+    arrives, so an interrupted run resumes where it left off instead
+    of fetching everything again.
+
+    Usage::
+
+        fetcher = ServiceRequestFetcher.from_config(JsonLinesFile(path))
+        result = asyncio.run(fetcher.fetch_all(["G258700", "G258801"]))
+    """
+
+    def __init__(
+        self,
+        lookup_fn,
+        checkpoint,
+        concurrency=GRAFFITI_LOOKUP_CONCURRENCY,
+        max_retries=GRAFFITI_LOOKUP_MAX_RETRIES,
+        backoff_seconds=GRAFFITI_LOOKUP_BACKOFF_SECONDS,
+        close_fn=None,
+        sleep_fn=asyncio.sleep,
+    ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self._lookup_fn = lookup_fn
+        self._checkpoint = checkpoint
+        self._concurrency = concurrency
+        self._max_retries = max_retries
+        self._backoff_seconds = backoff_seconds
+        self._close_fn = close_fn
+        self._sleep_fn = sleep_fn
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(concurrency={self._concurrency}, "
+            f"max_retries={self._max_retries}, "
+            f"backoff_seconds={self._backoff_seconds})"
+        )
+
+    @classmethod
+    def from_config(
+        cls,
+        checkpoint,
+        url=GRAFFITI_LOOKUP_URL,
+        timeout=GRAFFITI_LOOKUP_TIMEOUT,
+        max_connections=GRAFFITI_LOOKUP_MAX_CONNECTIONS,
+        max_keepalive_connections=GRAFFITI_LOOKUP_MAX_KEEPALIVE_CONNECTIONS,
+        concurrency=GRAFFITI_LOOKUP_CONCURRENCY,
+        max_retries=GRAFFITI_LOOKUP_MAX_RETRIES,
+        backoff_seconds=GRAFFITI_LOOKUP_BACKOFF_SECONDS,
+    ):
+        """Create a fetcher backed by the graffiti-lookup-nyc client.
+
+        The client keeps one pooled HTTP connection set for the whole
+        run.  Pass *url* to point it at a different 311 endpoint, e.g.
+        a local stand-in server.
+        """
+        lookup = GraffitiLookup(
+            timeout=timeout,
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        if url:
+            lookup.NYC_GRAFFITI_LOOKUP_URL = url
+
+        async def lookup_fn(service_request_id):
+            return await lookup.get_status_by_id(
+                service_request_id, close_connection=False
+            )
+
+        return cls(
+            lookup_fn,
+            checkpoint,
+            concurrency=concurrency,
+            max_retries=max_retries,
+            backoff_seconds=backoff_seconds,
+            close_fn=lookup.client.aclose,
+        )
+
+    async def fetch_all(self, service_request_ids) -> FetchResult:
+        """Fetch every ID not already present in the checkpoint.
+
+        Returns the records for all IDs that were fetched now or in a
+        previous, interrupted run, keyed by ID in the order of
+        *service_request_ids*.
+        """
+        unique_ids = list(dict.fromkeys(service_request_ids))
+        fetched = self._load_checkpoint()
+        pending = [
+            service_request_id
+            for service_request_id in unique_ids
+            if service_request_id not in fetched
+        ]
+        logger.info(
+            f"Fetching {len(pending)} service requests "
+            f"({len(unique_ids) - len(pending)} restored from checkpoint)"
+        )
+        pending_ids = iter(pending)
+
+        failed_ids = []
+
+        async def worker():
+            # All workers share one iterator, so each ID is taken once.
+            for service_request_id in pending_ids:
+                record = await self._fetch_with_retry(service_request_id)
+                if record:
+                    self._checkpoint.append(
+                        {"id": service_request_id, "record": record}
+                    )
+                    fetched[service_request_id] = record
+                else:
+                    failed_ids.append(service_request_id)
+                self._log_progress(len(fetched), len(failed_ids), len(unique_ids))
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self._concurrency)))
+        finally:
+            if self._close_fn is not None:
+                await self._close_fn()
+
+        logger.info(
+            f"Fetched {len(unique_ids) - len(failed_ids)} of "
+            f"{len(unique_ids)} service requests, {len(failed_ids)} failed"
+        )
+        records = {
+            service_request_id: fetched[service_request_id]
+            for service_request_id in unique_ids
+            if service_request_id in fetched
+        }
+        return FetchResult(records, failed_ids)
+
+    def _load_checkpoint(self):
+        """Map each checkpointed ID to its previously fetched record."""
+        return {entry["id"]: entry["record"] for entry in self._checkpoint.load()}
+
+    async def _fetch_with_retry(self, service_request_id):
+        """Look up one ID, retrying transient failures with backoff.
+
+        Returns the record dict, or ``None`` once retries are exhausted
+        or the response cannot be parsed into a service request.
+        """
+        attempts = self._max_retries + 1
+        for attempt in range(attempts):
+            try:
+                record = await self._lookup_fn(service_request_id)
+            except httpx.HTTPError as exc:
+                logger.warning(f"Lookup of {service_request_id} failed: {exc!r}")
+            except (TypeError, ValueError) as exc:
+                # The page was served but holds no usable record;
+                # asking again will not change that.
+                logger.error(f"Unparseable record for {service_request_id}: {exc}")
+                return None
+            else:
+                if record:
+                    return record
+                logger.warning(f"Empty response for {service_request_id}")
+
+            if attempt < attempts - 1:
+                await self._sleep_fn(self._backoff_seconds * 2**attempt)
+
+        logger.error(f"Giving up on {service_request_id} after {attempts} attempts")
+        return None
+
+    @staticmethod
+    def _log_progress(fetched_count, failed_count, total_count):
+        done_count = fetched_count + failed_count
+        if done_count % PROGRESS_LOG_INTERVAL == 0:
+            logger.info(f"Progress: {done_count}/{total_count} service requests")
@@ -0,0 +1,430 @@
+"""
+Geocoding Throughput Benchmark
+
+Runs ``Geocoder`` and ``geocode_service_requests`` against a simulated
+geocoding service on a virtual clock, so rate limiting, retry, and
+cache settings can be tuned offline without waiting on, or being
+throttled by, Nominatim.
+
+Usage::
+
+    python -m graffiti_data_pipeline.geocode.benchmark --requests 5000 \\
+        --min-delay 1.0 --cache-warmth 0 0.9 --duplicate-ratio 0 0.8
+"""
+
+import argparse
+import hashlib
+import logging
+import math
+import time
+from contextlib import contextmanager
+from typing import List, NamedTuple, Optional
+
+import geopy
+import numpy as np
+from geopy.exc import GeocoderRateLimited, GeocoderTimedOut, GeocoderUnavailable
+from geopy.extra.rate_limiter import RateLimiter
+
+from graffiti_data_pipeline.config import (
+    REQUEST_ERROR_WAIT_SECONDS,
+    REQUEST_MAX_RETRIES,
+    REQUEST_MIN_DELAY_SECONDS,
+    REQUEST_TIMEOUT,
+)
+from graffiti_data_pipeline.geocode.geocoder import (
+    Geocoder,
+    geocode_service_requests,
+)
+from graffiti_data_pipeline.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Latitude and longitude bounds of the five boroughs.
+NYC_BOUNDS = ((40.50, 40.91), (-74.25, -73.70))
+STREET_NAMES = [
+    "BROADWAY",
+    "MAIN ST",
+    "PARK AVE",
+    "ATLANTIC AVE",
+    "JAMAICA AVE",
+    "GRAND CONCOURSE",
+    *(f"E {number} ST" for number in range(1, 120)),
+    *(f"{number} AVE" for number in range(1, 40)),
+]
+BOROUGH_NAMES = ["Manhattan", "Brooklyn", "Queens", "Bronx", "Staten Island"]
+# geopy's RateLimiter reads the time and sleeps only through these
+# methods.  They are not public, so geopy is pinned in requirements.txt
+# and VirtualRateLimiter checks they are still there.
+RATE_LIMITER_HOOKS = ("_clock", "_sleep")
+
+
+class VirtualClock:
+    """Simulated time; sleeping and service latency advance it instantly."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __repr__(self):
+        return f"{type(self).__name__}(now={self.now:.3f})"
+
+    def advance(self, seconds: float):
+        # Always move forward: a wait too small to change ``now`` would
+        # keep the rate limiter asking to wait forever.
+        self.now = max(self.now + seconds, math.nextafter(self.now, math.inf))
+
+
+class VirtualRateLimiter(RateLimiter):
+    """geopy's ``RateLimiter`` on a :class:`VirtualClock`.
+
+    Keeps the production delay and retry logic while recording the
+    time it spends sleeping instead of waiting it out.  Raises
+    ``RuntimeError`` if the installed geopy lacks the
+    :data:`RATE_LIMITER_HOOKS` it overrides.
+    """
+
+    def __init__(self, func, clock: VirtualClock, **kwargs):
+        missing = [
+            name
+            for name in RATE_LIMITER_HOOKS
+            if not callable(getattr(RateLimiter, name, None))
+        ]
+        if missing:
+            raise RuntimeError(
+                f"geopy {geopy.__version__} RateLimiter has no {', '.join(missing)}; "
+                "install the version pinned in requirements.txt"
+            )
+        super().__init__(func, **kwargs)
+        self.clock = clock
+        self.lookups = 0
+        self.sleep_seconds = 0.0
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(lookups={self.lookups}, "
+            f"sleep_seconds={self.sleep_seconds:.3f})"
+        )
+
+    def __call__(self, *args, **kwargs):
+        self.lookups += 1
+        return super().__call__(*args, **kwargs)
+
+    def _clock(self):
+        return self.clock.now
+
+    def _sleep(self, seconds):
+        self.sleep_seconds += seconds
+        self.clock.advance(seconds)
+
+
+class SimulatedLocation(NamedTuple):
+    latitude: float
+    longitude: float
+
+
+class SimulatedGeocodingService:
+    """A geocoding service with random latency, failures, and 429s.
+
+    Each call takes a log-normal latency around *median_latency_seconds*;
+    calls slower than *timeout_seconds* time out after that long.  A
+    *failure_rate* share of calls fail as unavailable, and calls that
+    start less than ``1 / max_requests_per_second`` after the last
+    accepted one are rejected with a 429.  A *not_found_rate* share of
+    addresses have no result; the rest get fixed coordinates in NYC.
+
+    Usage::
+
+        service = SimulatedGeocodingService(VirtualClock(), failure_rate=0.05)
+        location = service.geocode("123 MAIN ST, NY, USA")
+    """
+
+    def __init__(
+        self,
+        clock: VirtualClock,
+        median_latency_seconds: float = 0.3,
+        latency_sigma: float = 0.5,
+        timeout_seconds: float = REQUEST_TIMEOUT,
+        failure_rate: float = 0.02,
+        max_requests_per_second: float = 1.0,
+        retry_after_seconds: float = 1.0,
+        not_found_rate: float = 0.05,
+        seed: int = 0,
+    ):
+        self.clock = clock
+        self.median_latency_seconds = median_latency_seconds
+        self.latency_sigma = latency_sigma
+        self.timeout_seconds = timeout_seconds
+        self.failure_rate = failure_rate
+        self.max_requests_per_second = max_requests_per_second
+        self.retry_after_seconds = retry_after_seconds
+        self.not_found_rate = not_found_rate
+        self.generator = np.random.default_rng(seed)
+        self.last_accepted = None
+        self.calls = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(calls={self.calls}, "
+            f"rate_limited={self.rate_limited}, failures={self.failures})"
+        )
+
+    def _wait(self, seconds: float):
+        self.busy_seconds += seconds
+        self.clock.advance(seconds)
+
+    def geocode(self, query: str, **kwargs) -> Optional[SimulatedLocation]:
+        self.calls += 1
+        started = self.clock.now
+        if (
+            self.max_requests_per_second
+            and self.last_accepted is not None
+            and started - self.last_accepted < 1 / self.max_requests_per_second
+        ):
+            self.rate_limited += 1
+            # A rejection comes back fast.
+            self._wait(self.median_latency_seconds / 10)
+            raise GeocoderRateLimited(
+                "Too many requests", retry_after=self.retry_after_seconds
+            )
+        self.last_accepted = started
+
+        latency = self.median_latency_seconds * self.generator.lognormal(
+            0.0, self.latency_sigma
+        )
+        if latency > self.timeout_seconds:
+            self.failures += 1
+            self._wait(self.timeout_seconds)
+            raise GeocoderTimedOut("Service timed out")
+        self._wait(latency)
+        if self.generator.random() < self.failure_rate:
+            self.failures += 1
+            raise GeocoderUnavailable("Service unavailable")
+        return self.coordinates_for(query)
+
+    def coordinates_for(self, query: str) -> Optional[SimulatedLocation]:
+        """The result for *query*, without latency, failures, or 429s.
+
+        Fixed per query, so repeated calls agree.
+        """
+        digest = hashlib.blake2b(query.encode(), digest_size=12).digest()
+        found, latitude, longitude = np.frombuffer(digest, ">u4") / 2**32
+        if found < self.not_found_rate:
+            return None
+        (south, north), (west, east) = NYC_BOUNDS
+        return SimulatedLocation(
+            south + latitude * (north - south), west + longitude * (east - west)
+        )
+
+
+class GeocodeBenchmarkReport(NamedTuple):
+    """Throughput of one run of ``geocode_service_requests``.
+
+    ``reused_share`` is the share of requests answered without a
+    service lookup: from the cache, or from another request at the
+    same location.  ``service_calls`` also counts retries.  Times are
+    virtual except ``cpu_seconds``, the real time spent in the
+    pipeline's own code.
+    """
+
+    cache_warmth: float
+    duplicate_ratio: float
+    requests: int
+    geocoded: int
+    service_calls: int
+    rate_limited: int
+    failures: int
+    reused_share: float
+    sleep_seconds: float
+    service_seconds: float
+    addresses_per_second: float
+    cpu_seconds: float
+
+
+def _spelling_variant(address: str) -> str:
+    return address.replace(" ST,", " STREET,").replace(" AVE,", " AVENUE,")
+
+
+def service_requests(count: int, duplicate_ratio: float, seed: int = 0) -> List[dict]:
+    """*count* lookups records without coordinates.
+
+    A *duplicate_ratio* share repeat an earlier record's address, half
+    of them spelled differently, as the 311 data does.
+    """
+    generator = np.random.default_rng(seed)
+    records = []
+    for _ in range(count):
+        if records and generator.random() < duplicate_ratio:
+            address = records[generator.integers(len(records))]["address"]
+            if generator.random() < 0.5:
+                address = _spelling_variant(address)
+        else:
+            house = generator.integers(1, 3000)
+            street = STREET_NAMES[generator.integers(len(STREET_NAMES))]
+            borough = BOROUGH_NAMES[generator.integers(len(BOROUGH_NAMES))]
+            address = f"{house} {street}, {borough}"
+        records.append({"address": address})
+    return records
+
+
+def warm_cache(records: List[dict], cache_warmth: float, seed: int = 0) -> dict:
+    """A geocode cache holding a *cache_warmth* share of the addresses."""
+    generator = np.random.default_rng(seed)
+    addresses = sorted({record["address"] for record in records})
+    service = SimulatedGeocodingService(VirtualClock(), not_found_rate=0.0)
+    return {
+        address: tuple(service.coordinates_for(f"{address}, NY, USA"))
+        for address in addresses
+        if generator.random() < cache_warmth
+    }
+
+
+@contextmanager
+def _quiet(*logger_names):
+    """Silence per-address logging, which would swamp the report."""
+    loggers = [logging.getLogger(name) for name in logger_names]
+    levels = [named_logger.level for named_logger in loggers]
+    for named_logger in loggers:
+        named_logger.setLevel(logging.CRITICAL)
+    try:
+        yield
+    finally:
+        for named_logger, level in zip(loggers, levels):
+            named_logger.setLevel(level)
+
+
+def benchmark_geocoding(
+    count: int,
+    cache_warmth: float,
+    duplicate_ratio: float,
+    min_delay_seconds: float = REQUEST_MIN_DELAY_SECONDS,
+    max_retries: int = REQUEST_MAX_RETRIES,
+    error_wait_seconds: float = REQUEST_ERROR_WAIT_SECONDS,
+    seed: int = 0,
+    **service_options,
+) -> GeocodeBenchmarkReport:
+    """Geocode *count* simulated records once and report the throughput.
+
+    *service_options* configure the :class:`SimulatedGeocodingService`.
+    """
+    records = service_requests(count, duplicate_ratio, seed)
+    clock = VirtualClock()
+    service = SimulatedGeocodingService(clock, seed=seed, **service_options)
+    geocoder = Geocoder.from_config(
+        cache=warm_cache(records, cache_warmth, seed),
+        min_delay_seconds=min_delay_seconds,
+        max_retries=max_retries,
+        error_wait_seconds=error_wait_seconds,
+        geolocator=service,
+        rate_limiter=lambda func, **options: VirtualRateLimiter(func, clock, **options),
+    )
+    rate_limiter = geocoder.geocode_fn
+
+    with _quiet("geopy", "graffiti_data_pipeline.geocode.geocoder"):
+        started = time.perf_counter()
+        geocode_service_requests(records, geocoder)
+        cpu_seconds = time.perf_counter() - started
+
+    return GeocodeBenchmarkReport(
+        cache_warmth=cache_warmth,
+        duplicate_ratio=duplicate_ratio,
+        requests=count,
+        geocoded=sum("latitude" in record for record in records),
+        service_calls=service.calls,
+        rate_limited=service.rate_limited,
+        failures=service.failures,
+        reused_share=1 - rate_limiter.lookups / count if count else 0.0,
+        sleep_seconds=rate_limiter.sleep_seconds,
+        service_seconds=service.busy_seconds,
+        addresses_per_second=count / clock.now if clock.now else float("inf"),
+        cpu_seconds=cpu_seconds,
+    )
+
+
+def format_report(reports: List[GeocodeBenchmarkReport]) -> str:
+    """Render reports as a fixed-width table, one row per scenario."""
+
+    def cell(value):
+        if isinstance(value, int):
+            return str(value)
+        return f"{value:.3f}"
+
+    rows = [GeocodeBenchmarkReport._fields] + [
+        tuple(cell(value) for value in report) for report in reports
+    ]
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    return "\n".join(
+        "  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip()
+        for row in rows
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark geocoding throughput against a simulated service."
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument(
+        "--cache-warmth",
+        type=float,
+        nargs="+",
+        default=[0.0, 0.5, 0.9],
+        help="Shares of the addresses already in the geocode cache",
+    )
+    parser.add_argument(
+        "--duplicate-ratio",
+        type=float,
+        nargs="+",
+        default=[0.0, 0.5, 0.8],
+        help="Shares of requests repeating an earlier address",
+    )
+    parser.add_argument("--min-delay", type=float, default=REQUEST_MIN_DELAY_SECONDS)
+    parser.add_argument("--max-retries", type=int, default=REQUEST_MAX_RETRIES)
+    parser.add_argument("--error-wait", type=float, default=REQUEST_ERROR_WAIT_SECONDS)
+    parser.add_argument(
+        "--median-latency",
+        type=float,
+        default=0.3,
+        help="Median service latency in seconds",
+    )
+    parser.add_argument(
+        "--latency-sigma",
+        type=float,
+        default=0.5,
+        help="Spread of the log-normal service latency",
+    )
+    parser.add_argument("--failure-rate", type=float, default=0.02)
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=1.0,
+        help="Requests per second the service accepts before answering 429",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    reports = [
+        benchmark_geocoding(
+            args.requests,
+            cache_warmth,
+            duplicate_ratio,
+            min_delay_seconds=args.min_delay,
+            max_retries=args.max_retries,
+            error_wait_seconds=args.error_wait,
+            seed=args.seed,
+            median_latency_seconds=args.median_latency,
+            latency_sigma=args.latency_sigma,
+            failure_rate=args.failure_rate,
+            max_requests_per_second=args.rate_limit,
+        )
+        for cache_warmth in args.cache_warmth
+        for duplicate_ratio in args.duplicate_ratio
+    ]
+    report = format_report(reports)
+    logger.info(f"Geocoding benchmark:\n{report}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
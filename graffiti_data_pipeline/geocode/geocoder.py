@@ -14,6 +14,7 @@ from graffiti_data_pipeline.config import (
     REQUEST_USER_AGENT,
 )
 from graffiti_data_pipeline.geocode.sanitize import normalize_street_name
+from graffiti_data_pipeline.locations import resolve_locations
 from graffiti_data_pipeline.logger import get_logger
 
 logger = get_logger(__name__)
@@ -60,14 +61,19 @@ class Geocoder:
         min_delay_seconds=REQUEST_MIN_DELAY_SECONDS,
         max_retries=REQUEST_MAX_RETRIES,
         error_wait_seconds=REQUEST_ERROR_WAIT_SECONDS,
+        geolocator=None,
+        rate_limiter=RateLimiter,
     ):
         """Create a production Geocoder from project configuration.
 
         Pass *cache* to seed the geocoder with previously persisted
         results.  When omitted, starts with an empty cache.
+        *geolocator* (default Nominatim) and the *rate_limiter* class
+        can be swapped, e.g. for a simulated service.
         """
-        geolocator = Nominatim(user_agent=user_agent, timeout=timeout)
-        geocode_fn = RateLimiter(
+        if geolocator is None:
+            geolocator = Nominatim(user_agent=user_agent, timeout=timeout)
+        geocode_fn = rate_limiter(
             geolocator.geocode,
             min_delay_seconds=min_delay_seconds,
             max_retries=max_retries,
@@ -80,6 +86,15 @@ class Geocoder:
         """The current in-memory geocode cache."""
         return self._cache
 
+    @property
+    def geocode_fn(self):
+        """The callable queried on a cache miss.
+
+        For a geocoder made by :meth:`from_config`, the rate limiter
+        wrapping the geolocator.
+        """
+        return self._geocode_fn
+
     def geocode(self, address):
         """Resolve *address* to :class:`Coordinates`, or ``None``.
 
@@ -128,6 +143,13 @@ def geocode_service_requests(service_requests, geocoder):
         inserting ``latitude`` and ``longitude`` keys for every
         successfully geocoded address.
 
+    Spelling variants of one address are resolved to one location
+    (see :func:`~graffiti_data_pipeline.locations.resolve_locations`),
+    so a location is geocoded at most once, and not at all when any
+    of its requests already has coordinates.  Only variants that parse
+    the same, or similar ones in the same geohash cell, share a
+    location, so a misspelled street never borrows coordinates.
+
     Also backfills the geocoder's cache from service requests that
     already have coordinates, keeping the cache in sync without
     extra network calls.
@@ -136,17 +158,30 @@ def geocode_service_requests(service_requests, geocoder):
     backfill), ``False`` otherwise.
     """
     cache_changed = False
+    requests = [request for request in service_requests if isinstance(request, dict)]
+    location_ids = resolve_locations(
+        [request.get("address") for request in requests],
+        [(request.get("latitude"), request.get("longitude")) for request in requests],
+        require_geohash=True,
+    )
+    known_coordinates = {
+        location_id: Coordinates(request["latitude"], request["longitude"])
+        for request, location_id in zip(requests, location_ids)
+        if request.get("latitude") is not None and request.get("longitude") is not None
+    }
 
-    for request in service_requests:
-        if not isinstance(request, dict):
-            continue
-
+    for request, location_id in zip(requests, location_ids):
         address = request.get("address")
         if _needs_geocoding(request):
-            coords = geocoder.geocode(address)
+            coords = known_coordinates.get(location_id)
+            if coords is None and isinstance(address, str):
+                coords = geocoder.geocode(
+                    address if address in geocoder.cache else location_id
+                )
             if coords is not None:
                 request["latitude"] = coords.latitude
                 request["longitude"] = coords.longitude
+                known_coordinates[location_id] = coords
                 cache_changed = True
         elif _can_backfill_cache(request, address, geocoder.cache):
             geocoder.cache[address] = (
@@ -0,0 +1,408 @@
+"""
+Address Entity Resolution
+
+Groups spelling variants of the same address, such as ``123 MAIN STREET``
+and ``123 Main St.``, under one canonical location ID.
+
+Every address is parsed into a house number, borough, and street
+tokens.  Addresses only become candidate matches when they share a
+cheap blocking key (borough and house number plus a street token, or
+house number plus a geohash cell when coordinates are known), and only
+candidates are compared by string similarity, so the cost stays
+near-linear in the number of distinct addresses.
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from functools import lru_cache
+from itertools import combinations
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas
+
+from graffiti_data_pipeline.config import NYC_BOROUGHS
+
+# Street names in the same block at least this similar are merged.
+STREET_SIMILARITY_THRESHOLD = 0.85
+# Within ~150m (a 7 character geohash cell) a looser match is enough.
+GEOHASH_SIMILARITY_THRESHOLD = 0.6
+GEOHASH_PRECISION = 7
+# Geocoded addresses farther apart than this never merge on their
+# street alone, however similar.
+MAX_STREET_MATCH_METERS = 250
+# Larger blocks hold a token too common to tell addresses apart, so
+# they are skipped instead of compared pair by pair.
+MAX_BLOCK_SIZE = 50
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+_EARTH_RADIUS_METERS = 6_371_000
+
+_STREET_TYPES = {
+    "STREET": "ST",
+    "AVENUE": "AVE",
+    "AV": "AVE",
+    "ROAD": "RD",
+    "DRIVE": "DR",
+    "PLACE": "PL",
+    "BOULEVARD": "BLVD",
+    "LANE": "LN",
+    "COURT": "CT",
+    "TERRACE": "TER",
+    "PARKWAY": "PKWY",
+    "EXPRESSWAY": "EXPY",
+    "HIGHWAY": "HWY",
+    "SQUARE": "SQ",
+    "WAY": "WAY",
+}
+_DIRECTIONS = {"NORTH": "N", "SOUTH": "S", "EAST": "E", "WEST": "W"}
+_ORDINAL_WORDS = {
+    word: str(number)
+    for number, word in enumerate(
+        [
+            "FIRST",
+            "SECOND",
+            "THIRD",
+            "FOURTH",
+            "FIFTH",
+            "SIXTH",
+            "SEVENTH",
+            "EIGHTH",
+            "NINTH",
+            "TENTH",
+        ],
+        start=1,
+    )
+}
+_NAME_WORDS = {"SAINT": "ST", "MOUNT": "MT", "FORT": "FT"}
+_TOKEN_NAMES = {**_STREET_TYPES, **_DIRECTIONS, **_ORDINAL_WORDS, **_NAME_WORDS}
+_ABBREVIATIONS = set(_STREET_TYPES.values()) | set(_DIRECTIONS.values())
+
+_HOUSE_NUMBER = re.compile(r"^\d+(-\d+)?[A-Z]?$")
+_ORDINAL_NUMBER = re.compile(r"^(\d+)(ST|ND|RD|TH)$")
+_SEPARATORS = re.compile(r"[^A-Z0-9-]+")
+
+
+class ParsedAddress(NamedTuple):
+    """The parts of an address that decide whether two addresses match."""
+
+    house_number: Optional[str]
+    street: Tuple[str, ...]
+    borough: Optional[str]
+
+    @property
+    def street_name(self) -> str:
+        """Street tokens other than numbers, directions, and types."""
+        return " ".join(
+            token
+            for token in self.street
+            if not token.isdigit() and token not in _ABBREVIATIONS
+        )
+
+    @property
+    def street_numbers(self) -> Tuple[str, ...]:
+        return tuple(token for token in self.street if token.isdigit())
+
+    @property
+    def street_types(self) -> Tuple[str, ...]:
+        return tuple(token for token in self.street if token in _ABBREVIATIONS)
+
+
+@lru_cache(maxsize=None)
+def _street_token(token: str) -> str:
+    ordinal = _ORDINAL_NUMBER.match(token)
+    if ordinal:
+        return ordinal.group(1)
+    return _TOKEN_NAMES.get(token, token)
+
+
+def parse_address(address: str) -> ParsedAddress:
+    """Split *address* into house number, normalized street, and borough.
+
+    Street types and directions are abbreviated and ordinals become
+    plain numbers, so ``EAST 3RD STREET`` and ``E THIRD ST`` both give
+    the street ``("E", "3", "ST")``.  The borough is the last one named
+    after the first comma, if any.
+    """
+    street_part, _, rest = address.partition(",")
+    rest = rest.lower()
+    named = [borough for borough in NYC_BOROUGHS if borough in rest]
+    borough = max(named, key=rest.rfind) if named else None
+
+    tokens = [
+        token.strip("-") for token in _SEPARATORS.split(street_part.upper()) if token
+    ]
+    tokens = [token for token in tokens if token]
+    house_number = None
+    if len(tokens) > 1 and _HOUSE_NUMBER.match(tokens[0]):
+        house_number, tokens = tokens[0], tokens[1:]
+    return ParsedAddress(
+        house_number, tuple(_street_token(token) for token in tokens), borough
+    )
+
+
+def geohash_cells(latitude, longitude, precision: int = GEOHASH_PRECISION):
+    """Geohash cell of each point, as the integer its base32 string spells.
+
+    The longitude and latitude ranges are halved in turn, longitude
+    first, and each halving adds one bit; every five bits make one
+    base32 character.
+    """
+    bit_count = 5 * precision
+    longitude_bits, latitude_bits = (bit_count + 1) // 2, bit_count // 2
+    longitude_steps = np.clip(
+        np.floor((np.asarray(longitude, float) + 180) / 360 * 2**longitude_bits),
+        0,
+        2**longitude_bits - 1,
+    ).astype(np.int64)
+    latitude_steps = np.clip(
+        np.floor((np.asarray(latitude, float) + 90) / 180 * 2**latitude_bits),
+        0,
+        2**latitude_bits - 1,
+    ).astype(np.int64)
+    cells = np.zeros(len(longitude_steps), np.int64)
+    for bit in range(bit_count):
+        axis_steps, axis_bits = (
+            (longitude_steps, longitude_bits)
+            if bit % 2 == 0
+            else (latitude_steps, latitude_bits)
+        )
+        cells = (cells << 1) | ((axis_steps >> (axis_bits - 1 - bit // 2)) & 1)
+    return cells
+
+
+def geohash(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION):
+    """The geohash of a point, *precision* base32 characters long."""
+    cell = int(geohash_cells([latitude], [longitude], precision)[0])
+    return "".join(
+        _GEOHASH_ALPHABET[(cell >> (5 * place)) & 31]
+        for place in reversed(range(precision))
+    )
+
+
+def _located(latitude, longitude) -> np.ndarray:
+    """Usable coordinate pairs; 0, 0 means never geocoded."""
+    return (
+        (np.abs(latitude) <= 90)
+        & (np.abs(longitude) <= 180)
+        & ~((latitude == 0) & (longitude == 0))
+    )
+
+
+def _distance_meters(first, second) -> float:
+    """Approximate distance between two (latitude, longitude) points."""
+    mean_latitude = math.radians((first[0] + second[0]) / 2)
+    north = math.radians(second[0] - first[0])
+    east = math.radians(second[1] - first[1]) * math.cos(mean_latitude)
+    return _EARTH_RADIUS_METERS * math.hypot(north, east)
+
+
+def same_street(first: ParsedAddress, second: ParsedAddress, threshold: float):
+    """Whether two parsed addresses name the same street.
+
+    Numbered streets must have the same numbers and, when both give a
+    street type, the same type; the remaining names must be at least
+    *threshold* similar.
+    """
+    if first.street_numbers != second.street_numbers:
+        return False
+    if first.street_types and second.street_types:
+        if first.street_types != second.street_types:
+            return False
+    if first.street_name == second.street_name:
+        return True
+    return (
+        SequenceMatcher(None, first.street_name, second.street_name).ratio()
+        >= threshold
+    )
+
+
+class _DisjointSets:
+    """Union-find over ``0..size-1`` with path halving."""
+
+    def __init__(self, size: int):
+        self.parents = list(range(size))
+
+    def __repr__(self):
+        return f"{type(self).__name__}(size={len(self.parents)})"
+
+    def find(self, item: int) -> int:
+        parents = self.parents
+        while parents[item] != item:
+            parents[item] = parents[parents[item]]
+            item = parents[item]
+        return item
+
+    def union(self, first: int, second: int):
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            self.parents[max(first, second)] = min(first, second)
+
+
+def _blocking_keys(parts: ParsedAddress):
+    """Street keys an address is blocked under, besides its house number.
+
+    Every distinctive token catches reordered or partly misspelled
+    names; the first letter of the name catches a typo in a one-word
+    name.
+    """
+    keys = {token for token in parts.street if token not in _ABBREVIATIONS}
+    keys.add((parts.street_numbers, parts.street_name[:1]))
+    return keys
+
+
+def _merge_blocks(blocks, parsed, sets: _DisjointSets, threshold: float, points=None):
+    """Merge similar streets within each block.
+
+    With *points*, the (latitude, longitude) of each distinct address
+    or NaN, two geocoded addresses must also be within
+    :data:`MAX_STREET_MATCH_METERS`.
+    """
+    for members in blocks.values():
+        if len(members) < 2 or len(members) > MAX_BLOCK_SIZE:
+            continue
+        for first, second in combinations(members, 2):
+            if (
+                sets.find(first) != sets.find(second)
+                and same_street(parsed[first], parsed[second], threshold)
+                and (
+                    points is None
+                    # NaN distances compare False, so merge when unknown.
+                    or not _distance_meters(points[first], points[second])
+                    > MAX_STREET_MATCH_METERS
+                )
+            ):
+                sets.union(first, second)
+
+
+def _coordinate_rows(addresses, coordinates, position_of):
+    """Distinct-address position (-1 if none) and coordinates of each row."""
+    positions = np.array(
+        [
+            position_of.get(address, -1) if isinstance(address, str) else -1
+            for address in addresses
+        ],
+        np.int64,
+    )
+    values = np.array(
+        [
+            [np.nan if value is None else value for value in pair]
+            for pair in coordinates
+        ],
+        float,
+    ).reshape(-1, 2)
+    return positions, values
+
+
+def _address_points(addresses, coordinates, position_of):
+    """First usable (latitude, longitude) of each distinct address, or NaN."""
+    positions, values = _coordinate_rows(addresses, coordinates, position_of)
+    usable = (positions >= 0) & _located(values[:, 0], values[:, 1])
+    points = np.full((len(position_of), 2), np.nan)
+    located_positions, first_rows = np.unique(positions[usable], return_index=True)
+    points[located_positions] = values[usable][first_rows]
+    return points
+
+
+def _geohash_blocks(addresses, coordinates, position_of, parsed):
+    """Distinct addresses per house number and geohash cell.
+
+    Only blocks of two or more addresses are returned.
+    """
+    positions, values = _coordinate_rows(addresses, coordinates, position_of)
+    house_ids, house_numbers = pandas.factorize(
+        pandas.Series([parts.house_number for parts in parsed], dtype=object)
+    )
+    house_ids = np.append(house_ids, -1)
+    usable = (house_ids[positions] >= 0) & _located(values[:, 0], values[:, 1])
+    positions = positions[usable]
+    cells = geohash_cells(values[usable, 0], values[usable, 1])
+    # One entry per (house number, cell, address), grouped by block.
+    entries = np.unique(
+        np.column_stack([house_ids[positions], cells, positions]), axis=0
+    )
+    block_starts = np.flatnonzero(
+        np.any(np.diff(entries[:, :2], axis=0, prepend=-2) != 0, axis=1)
+    )
+    block_sizes = np.diff(np.append(block_starts, len(entries)))
+    shared = block_sizes > 1
+    members = entries[np.repeat(shared, block_sizes), 2]
+    blocks = np.split(members, np.cumsum(block_sizes[shared])[:-1])
+    return dict(enumerate(block.tolist() for block in blocks if len(block)))
+
+
+def resolve_locations(
+    addresses: Sequence[str],
+    coordinates: Optional[Sequence[Tuple[float, float]]] = None,
+    require_geohash: bool = False,
+) -> List[str]:
+    """The canonical location ID of each of *addresses*.
+
+    Addresses that parse to the same house number, street, and borough
+    are one location.  Beyond that, two addresses are merged when they
+    have the same house number and similar streets, and either name
+    the same borough or, with *coordinates* (latitude, longitude pairs
+    row-aligned with *addresses*), fall in the same geohash cell.
+    Addresses in the same borough that are both geocoded must also be
+    within :data:`MAX_STREET_MATCH_METERS` of each other.
+    Addresses without a house number or borough only merge on an exact
+    parse or a shared geohash cell.
+    With *require_geohash* the borough alone is not enough: similar
+    streets only merge in a shared geohash cell, so addresses without
+    coordinates only merge on an exact parse.  Use it where a wrong
+    merge costs more than a missed one, such as copying coordinates.
+
+    A location's ID is its most common address, the alphabetically
+    first on ties, so IDs are the same whatever the input order.
+    Values that are not non-empty strings are returned unchanged.
+    """
+    counts: Counter = Counter(
+        address for address in addresses if isinstance(address, str) and address.strip()
+    )
+    distinct = list(counts)
+    parsed = [parse_address(address) for address in distinct]
+    position_of = {address: position for position, address in enumerate(distinct)}
+    sets = _DisjointSets(len(distinct))
+
+    same_parse: Dict[ParsedAddress, int] = {}
+    street_blocks = defaultdict(list)
+    for position, parts in enumerate(parsed):
+        first = same_parse.setdefault(parts, position)
+        if first != position:
+            sets.union(first, position)
+            continue
+        if parts.house_number is None or parts.borough is None or require_geohash:
+            continue
+        for key in _blocking_keys(parts):
+            street_blocks[(parts.borough, parts.house_number, key)].append(position)
+    _merge_blocks(
+        street_blocks,
+        parsed,
+        sets,
+        STREET_SIMILARITY_THRESHOLD,
+        (
+            None
+            if coordinates is None
+            else _address_points(addresses, coordinates, position_of)
+        ),
+    )
+
+    if coordinates is not None:
+        _merge_blocks(
+            _geohash_blocks(addresses, coordinates, position_of, parsed),
+            parsed,
+            sets,
+            GEOHASH_SIMILARITY_THRESHOLD,
+        )
+
+    clusters = defaultdict(list)
+    for position, address in enumerate(distinct):
+        clusters[sets.find(position)].append(address)
+    canonical = {}
+    for members in clusters.values():
+        location_id = min(members, key=lambda address: (-counts[address], address))
+        for address in members:
+            canonical[address] = location_id
+    return [canonical.get(address, address) for address in addresses]
@@ -2,6 +2,7 @@ from graffiti_data_pipeline.prediction.features import extract_features
 from graffiti_data_pipeline.prediction.model import (
     GraffitiPredictionModel,
     PredictionResult,
+    TrainingTargets,
 )
 from graffiti_data_pipeline.prediction.request import GraffitiServiceRequest
 
@@ -9,5 +10,6 @@ __all__ = [
     "GraffitiPredictionModel",
     "GraffitiServiceRequest",
     "PredictionResult",
+    "TrainingTargets",
     "extract_features",
 ]
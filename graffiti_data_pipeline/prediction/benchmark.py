@@ -0,0 +1,494 @@
+"""
+Prediction Benchmark Suite
+
+Times location resolution, feature extraction, the training of each
+estimator, prediction, and enrichment on seeded synthetic NYC lookups
+at growing sizes, with the peak memory of each stage, and compares the
+results against a stored baseline so a slower-than-linear change shows
+up as a regression.  Baselines record the hardware they were taken on
+and are only compared on the same hardware.
+
+Usage::
+
+    python -m graffiti_data_pipeline.prediction.benchmark --sizes 1000 10000
+    python -m graffiti_data_pipeline.prediction.benchmark --save-baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from graffiti_data_pipeline.config import (
+    GRAFFITI_CLEANED_STATUS,
+    GRAFFITI_COMPLETE_STATUSES,
+    GRAFFITI_SITE_TO_BE_CLEANED_STATUS,
+    PREDICTION_BENCHMARK_BASELINE_FILE,
+)
+from graffiti_data_pipeline.logger import get_logger
+from graffiti_data_pipeline.prediction.features import (
+    MODEL_FEATURE_COLUMNS,
+    FeatureMatrix,
+    extract_features,
+)
+from graffiti_data_pipeline.prediction.model import (
+    GraffitiPredictionModel,
+    TrainingTargets,
+)
+from graffiti_data_pipeline.prediction.request import (
+    GraffitiServiceRequest,
+    assign_location_ids,
+)
+
+logger = get_logger(__name__)
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+REFERENCE_DAY = 20_000
+# Requests are created over this many days before the reference day.
+DATE_SPREAD_DAYS = 3 * 365
+# A stage regresses when it takes this many times its baseline, plus
+# the slack, which keeps millisecond stages from flagging on noise.
+REGRESSION_TOLERANCE = 1.5
+TIME_SLACK_SECONDS = 0.05
+MEMORY_SLACK_MEGABYTES = 1.0
+
+# Center, spread in degrees, and share of requests of each borough.
+BOROUGHS = {
+    "Manhattan": ((40.78, -73.97), (0.04, 0.02), 0.25),
+    "Brooklyn": ((40.65, -73.95), (0.05, 0.05), 0.30),
+    "Queens": ((40.72, -73.82), (0.05, 0.07), 0.22),
+    "Bronx": ((40.84, -73.88), (0.04, 0.04), 0.18),
+    "Staten Island": ((40.58, -74.15), (0.04, 0.05), 0.05),
+}
+STREET_NAMES = [
+    "BROADWAY",
+    "MAIN ST",
+    "PARK AVE",
+    "LEXINGTON AVE",
+    "AMSTERDAM AVE",
+    "FLATBUSH AVE",
+    "ATLANTIC AVE",
+    "JAMAICA AVE",
+    "GRAND CONCOURSE",
+    "QUEENS BLVD",
+    "RICHMOND TER",
+    "BEDFORD AVE",
+    "KNICKERBOCKER AVE",
+    "STEINWAY ST",
+    "FORDHAM RD",
+    *(f"{direction} {number} ST" for direction in "EW" for number in range(1, 120)),
+    *(f"{number} AVE" for number in range(1, 40)),
+]
+# Share of each status; the rest are still open.
+STATUS_SHARES = {
+    GRAFFITI_CLEANED_STATUS: 0.40,
+    GRAFFITI_SITE_TO_BE_CLEANED_STATUS: 0.15,
+    **{
+        status: 0.05
+        for status in GRAFFITI_COMPLETE_STATUSES
+        if status != GRAFFITI_CLEANED_STATUS
+    },
+}
+OPEN_STATUS = "Open"
+# Share of locations that were never geocoded.
+UNLOCATED_SHARE = 0.03
+# Share of requests whose address is spelled out differently, such as
+# ``123 MAIN STREET`` or ``123 Main St.`` for ``123 MAIN ST``.
+SPELLING_VARIANT_SHARE = 0.2
+_LONG_FORMS = {
+    "ST": "STREET",
+    "AVE": "AVENUE",
+    "BLVD": "BOULEVARD",
+    "RD": "ROAD",
+    "TER": "TERRACE",
+    "E": "EAST",
+    "W": "WEST",
+}
+
+
+class BenchmarkResult(NamedTuple):
+    """Time and peak traced memory of one stage at one size.
+
+    ``peak_megabytes`` is the most memory the stage allocated beyond
+    what was in use when it started, None when memory was not traced.
+    """
+
+    stage: str
+    rows: int
+    seconds: float
+    peak_megabytes: Optional[float]
+
+
+class Regression(NamedTuple):
+    """A stage whose *metric* grew past the tolerance over its baseline."""
+
+    stage: str
+    rows: int
+    metric: str
+    baseline: float
+    current: float
+
+
+def spelling_variant(address: str, style: int) -> str:
+    """*address* with its street respelled in one of two styles.
+
+    Style 0 spells out street types and directions, style 1 writes the
+    street in title case with a trailing period.  Either way the
+    address parses the same as the original.
+    """
+    street, borough = address.split(", ")
+    if style == 0:
+        street = " ".join(_LONG_FORMS.get(word, word) for word in street.split())
+    else:
+        street = f"{street.title()}."
+    return f"{street}, {borough}"
+
+
+def synthetic_records(
+    count: int, reports_per_location: float = 3.0, seed: int = 0
+) -> List[Dict[str, object]]:
+    """*count* lookups records shaped like the real ones.
+
+    Locations are spread over the boroughs, and a few popular ones get
+    most of the repeat reports.  Statuses follow :data:`STATUS_SHARES`,
+    creation dates span :data:`DATE_SPREAD_DAYS`, and updates follow
+    creation after an exponentially distributed delay.  About
+    :data:`SPELLING_VARIANT_SHARE` of the requests give their address
+    as a :func:`spelling_variant`.
+    """
+    generator = np.random.default_rng(seed)
+    location_count = max(1, int(count / reports_per_location))
+    borough_names = list(BOROUGHS)
+    borough_of = generator.choice(
+        len(borough_names),
+        location_count,
+        p=[share for _, _, share in BOROUGHS.values()],
+    )
+    centers = np.array([center for center, _, _ in BOROUGHS.values()])
+    spreads = np.array([spread for _, spread, _ in BOROUGHS.values()])
+    coordinates = centers[borough_of] + generator.normal(size=(location_count, 2)) * (
+        spreads[borough_of]
+    )
+    located = generator.random(location_count) >= UNLOCATED_SHARE
+    addresses = [
+        f"{house} {STREET_NAMES[street]}, {borough_names[borough]}"
+        for house, street, borough in zip(
+            generator.integers(1, 3000, location_count),
+            generator.integers(0, len(STREET_NAMES), location_count),
+            borough_of,
+        )
+    ]
+
+    popularity = generator.pareto(3.0, location_count) + 1
+    location_of = generator.choice(
+        location_count, count, p=popularity / popularity.sum()
+    )
+    created = REFERENCE_DAY - generator.integers(0, DATE_SPREAD_DAYS, count)
+    last_updated = np.minimum(
+        created + generator.exponential(20.0, count).astype(np.int64), REFERENCE_DAY
+    )
+    statuses = [*STATUS_SHARES, OPEN_STATUS]
+    shares = [*STATUS_SHARES.values(), 1 - sum(STATUS_SHARES.values())]
+    status_of = generator.choice(len(statuses), count, p=shares)
+    created_dates = created.astype("datetime64[D]").astype(str).tolist()
+    updated_dates = last_updated.astype("datetime64[D]").astype(str).tolist()
+    variant_styles = np.where(
+        generator.random(count) < SPELLING_VARIANT_SHARE,
+        generator.integers(0, 2, count),
+        -1,
+    ).tolist()
+
+    records = []
+    for number, location in enumerate(location_of.tolist()):
+        address = addresses[location]
+        if variant_styles[number] >= 0:
+            address = spelling_variant(address, variant_styles[number])
+        record = {
+            "service_request": f"G{number:07d}",
+            "address": address,
+            "created": created_dates[number],
+            "last_updated": updated_dates[number],
+            "status": statuses[status_of[number]],
+            "unique_key": f"G{number:07d}",
+        }
+        if located[location]:
+            record["latitude"] = float(coordinates[location, 0])
+            record["longitude"] = float(coordinates[location, 1])
+        records.append(record)
+    return records
+
+
+@contextmanager
+def _stage(name: str, rows: int, results: List[BenchmarkResult]):
+    """Time the body and, while tracing, its peak memory, into *results*."""
+    traced = tracemalloc.is_tracing()
+    if traced:
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    yield
+    seconds = time.perf_counter() - started
+    peak = None
+    if traced:
+        peak = (tracemalloc.get_traced_memory()[1] - memory_before) / 2**20
+    results.append(BenchmarkResult(name, rows, seconds, peak))
+
+
+def benchmark_size(rows: int, seed: int = 0) -> List[BenchmarkResult]:
+    """Run every stage once on *rows* synthetic requests."""
+    requests = [
+        GraffitiServiceRequest(record) for record in synthetic_records(rows, seed=seed)
+    ]
+    results: List[BenchmarkResult] = []
+    with _stage("assign_location_ids", rows, results):
+        assign_location_ids(requests)
+    with _stage("extract_features", rows, results):
+        features = extract_features(requests, [GRAFFITI_CLEANED_STATUS], REFERENCE_DAY)
+    targets = TrainingTargets.from_features(features)
+    matrix = FeatureMatrix.of(features[MODEL_FEATURE_COLUMNS])
+
+    model = GraffitiPredictionModel()
+    for train_fn, model_targets in model.training_jobs(targets):
+        with _stage(train_fn.__name__, rows, results):
+            train_fn(matrix, model_targets)
+    with _stage("predict", rows, results):
+        predictions = model.predict(matrix)
+    with _stage("enrich_requests", rows, results):
+        model.enrich_requests(
+            requests,
+            *predictions,
+            times_reported=features["times_reported"],
+            times_cleaned=features["times_cleaned"],
+        )
+    return results
+
+
+def run_benchmarks(
+    sizes: List[int], seed: int = 0, trace_memory: bool = True
+) -> List[BenchmarkResult]:
+    """Results of every stage at every size, smallest size first.
+
+    Tracing memory slows allocation-heavy stages, so baselines should
+    be taken with the same *trace_memory* as the runs compared to them.
+    """
+    results = []
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        for size in sorted(sizes):
+            results.extend(benchmark_size(size, seed))
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return results
+
+
+def _processor_name() -> str:
+    """The CPU model, from ``/proc/cpuinfo`` where there is one."""
+    try:
+        with open("/proc/cpuinfo") as file:
+            for line in file:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def hardware_profile() -> Dict[str, object]:
+    """The machine this process runs on, as stored with a baseline."""
+    return {
+        "machine": platform.machine(),
+        "processor": _processor_name(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def save_baseline(
+    results: List[BenchmarkResult],
+    path: str,
+    hardware: Optional[Dict[str, object]] = None,
+):
+    """Write *results* to *path* as the baseline for later runs.
+
+    *hardware* (default this machine's :func:`hardware_profile`) is
+    stored with them.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(
+            {
+                "hardware": hardware or hardware_profile(),
+                "results": [result._asdict() for result in results],
+            },
+            file,
+            indent=2,
+        )
+        file.write("\n")
+
+
+def load_baseline(
+    path: str, hardware: Optional[Dict[str, object]] = None
+) -> List[BenchmarkResult]:
+    """The results stored at *path* if taken on *hardware*, else empty.
+
+    *hardware* defaults to this machine's :func:`hardware_profile`.
+    Timings from other hardware say nothing about this code, so they
+    are never compared.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        baseline = json.load(file)
+    hardware = hardware or hardware_profile()
+    stored_hardware = baseline.get("hardware") if isinstance(baseline, dict) else None
+    if stored_hardware != hardware:
+        logger.warning(
+            f"Ignoring the benchmark baseline in {path}: it was taken on "
+            f"{stored_hardware}, not {hardware}"
+        )
+        return []
+    return [BenchmarkResult(**result) for result in baseline["results"]]
+
+
+def compare_to_baseline(
+    results: List[BenchmarkResult],
+    baseline: List[BenchmarkResult],
+    tolerance: float = REGRESSION_TOLERANCE,
+) -> List[Regression]:
+    """Stages slower or hungrier than *tolerance* times their baseline.
+
+    Results without a baseline entry of the same stage and size are
+    not compared; neither is memory unless both runs traced it.
+    """
+    expected = {(result.stage, result.rows): result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = expected.get((result.stage, result.rows))
+        if previous is None:
+            continue
+        if result.seconds > previous.seconds * tolerance + TIME_SLACK_SECONDS:
+            regressions.append(
+                Regression(
+                    result.stage,
+                    result.rows,
+                    "seconds",
+                    previous.seconds,
+                    result.seconds,
+                )
+            )
+        if (
+            result.peak_megabytes is not None
+            and previous.peak_megabytes is not None
+            and result.peak_megabytes
+            > previous.peak_megabytes * tolerance + MEMORY_SLACK_MEGABYTES
+        ):
+            regressions.append(
+                Regression(
+                    result.stage,
+                    result.rows,
+                    "peak_megabytes",
+                    previous.peak_megabytes,
+                    result.peak_megabytes,
+                )
+            )
+    return regressions
+
+
+def format_report(
+    results: List[BenchmarkResult], baseline: List[BenchmarkResult] = ()
+) -> str:
+    """Render results as a fixed-width table, with baseline seconds if known."""
+    expected = {(result.stage, result.rows): result for result in baseline}
+
+    def megabytes(value):
+        return "n/a" if value is None else f"{value:.1f}"
+
+    rows = [("stage", "rows", "seconds", "peak_megabytes", "baseline_seconds")] + [
+        (
+            result.stage,
+            str(result.rows),
+            f"{result.seconds:.3f}",
+            megabytes(result.peak_megabytes),
+            (
+                f"{expected[result.stage, result.rows].seconds:.3f}"
+                if (result.stage, result.rows) in expected
+                else "n/a"
+            ),
+        )
+        for result in results
+    ]
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    return "\n".join(
+        "  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip()
+        for row in rows
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark feature extraction, training, and prediction."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="Numbers of synthetic requests to benchmark",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--baseline-path",
+        type=str,
+        default=PREDICTION_BENCHMARK_BASELINE_FILE,
+        help="Baseline results to compare against",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Replace the baseline with this run's results",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=REGRESSION_TOLERANCE,
+        help="Slowdown factor over the baseline that counts as a regression",
+    )
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="Skip memory tracing, which slows allocation-heavy stages",
+    )
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.seed, not args.no_memory)
+    if args.save_baseline:
+        save_baseline(results, args.baseline_path)
+        logger.info(f"Saved the benchmark baseline to {args.baseline_path}")
+        baseline = results
+    else:
+        baseline = load_baseline(args.baseline_path)
+    report = format_report(results, baseline)
+    logger.info(f"Prediction benchmark:\n{report}")
+
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    for regression in regressions:
+        logger.warning(
+            f"{regression.stage} on {regression.rows} rows: {regression.metric} "
+            f"{regression.current:.3f} against a baseline of {regression.baseline:.3f}"
+        )
+    if regressions:
+        raise SystemExit(f"{len(regressions)} benchmark regressions")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Boundary Polygons
+
+Assigns points to named areas, such as boroughs or neighborhoods, from
+GeoJSON boundary polygons.  A grid index labels every cell center up
+front, so each lookup only tests the polygon edges in its own cell.
+
+Usage::
+
+    python -m graffiti_data_pipeline.prediction.boundaries \\
+        --boundaries-path data/neighborhoods.geojson --name-property ntaname
+"""
+
+import argparse
+import json
+import os
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+
+from graffiti_data_pipeline.config import GRAFFITI_LOOKUPS_FILE
+from graffiti_data_pipeline.logger import get_logger
+from graffiti_data_pipeline.storages import JsonFile
+
+logger = get_logger(__name__)
+
+# Rows and columns of the grid laid over the polygons' bounding box.
+GRID_SIZE = 256
+# Upper bound on (point, edge) pairs tested at once, to cap memory use.
+MAX_PAIRS_PER_CHUNK = 1_000_000
+
+OUTSIDE = -1
+
+
+def _expand_ranges(first, last):
+    """Owner position and value for every integer in each ``first..last``."""
+    lengths = np.maximum(last - first + 1, 0)
+    owners = np.repeat(np.arange(len(first)), lengths)
+    range_starts = np.cumsum(lengths) - lengths
+    return owners, np.arange(lengths.sum()) - np.repeat(range_starts - first, lengths)
+
+
+def _csr(keys, values, key_count):
+    """*values* grouped by *keys*, with offsets so group k is ``[k]:[k + 1]``."""
+    order = np.argsort(keys, kind="stable")
+    return values[order], np.searchsorted(keys[order], np.arange(key_count + 1))
+
+
+def _orientation(ax, ay, bx, by, cx, cy):
+    """Sign of the turn from a to b to c: 1 left, -1 right, 0 collinear."""
+    return np.sign((bx - ax) * (cy - ay) - (by - ay) * (cx - ax))
+
+
+class BoundaryIndex:
+    """Named polygons, indexed for fast point-in-polygon lookups.
+
+    Each area is a list of rings (``(x, y)`` vertex arrays; longitude
+    and latitude for GeoJSON) combined with the even-odd rule, so
+    holes and multi-polygons need no special casing.  Areas are
+    expected not to overlap.
+
+    A :data:`GRID_SIZE` square grid covers the polygons, and each cell
+    lists the edges whose bounding box touches it.  The area around
+    every cell center is found once, by sorting where each grid row's
+    center line crosses the edges.  A point then takes its cell's
+    center label, flipped by whichever of the cell's edges the segment
+    from the point to the center crosses.
+
+    Usage::
+
+        index = BoundaryIndex.from_geojson("data/boroughs.geojson", "boro_name")
+        names = index.names(longitude, latitude)
+    """
+
+    def __init__(
+        self,
+        names: List[str],
+        areas: List[List[np.ndarray]],
+        grid_size: int = GRID_SIZE,
+    ):
+        self.area_names = list(names)
+        self.grid_size = grid_size
+        edges, owners = [np.empty((0, 4))], [np.empty(0, np.int64)]
+        for area, rings in enumerate(areas):
+            for ring in rings:
+                ring = np.asarray(ring, float)[:, :2]
+                if len(ring) < 3:
+                    continue
+                if not np.array_equal(ring[0], ring[-1]):
+                    ring = np.vstack([ring, ring[:1]])
+                edges.append(np.hstack([ring[:-1], ring[1:]]))
+                owners.append(np.full(len(ring) - 1, area))
+        self.edges = np.vstack(edges)
+        self.edge_areas = np.concatenate(owners)
+
+        vertices = self.edges.reshape(-1, 2)
+        self.lower = vertices.min(axis=0) if len(vertices) else np.zeros(2)
+        upper = vertices.max(axis=0) if len(vertices) else np.ones(2)
+        self.cell_size = np.maximum((upper - self.lower) / grid_size, 1e-12)
+
+        x1, y1, x2, y2 = self.edges.T
+        low_rows = self._rows(np.minimum(y1, y2))
+        heights = self._rows(np.maximum(y1, y2)) - low_rows + 1
+        low_columns = self._columns(np.minimum(x1, x2))
+        widths = self._columns(np.maximum(x1, x2)) - low_columns + 1
+
+        edge_of_cell, offsets = _expand_ranges(
+            np.zeros(len(self.edges), np.int64), heights * widths - 1
+        )
+        cells = (
+            low_rows[edge_of_cell] + offsets // widths[edge_of_cell]
+        ) * grid_size + (low_columns[edge_of_cell] + offsets % widths[edge_of_cell])
+        self.cell_edges, self.cell_offsets = _csr(cells, edge_of_cell, grid_size**2)
+        self.center_areas = self._center_areas(low_rows, heights)
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(areas={len(self.area_names)}, "
+            f"edges={len(self.edges)}, grid_size={self.grid_size})"
+        )
+
+    @classmethod
+    def from_geojson(
+        cls, path: str, name_property: str, grid_size: int = GRID_SIZE
+    ) -> "BoundaryIndex":
+        """Index the Polygon and MultiPolygon features of a GeoJSON file.
+
+        Each feature is one area, named by its *name_property*.
+        """
+        with open(path) as file:
+            collection = json.load(file)
+        names, areas = [], []
+        for feature in collection["features"]:
+            geometry = feature.get("geometry") or {}
+            if geometry.get("type") == "Polygon":
+                polygons = [geometry["coordinates"]]
+            elif geometry.get("type") == "MultiPolygon":
+                polygons = geometry["coordinates"]
+            else:
+                continue
+            names.append(str(feature["properties"][name_property]))
+            areas.append([np.array(ring) for polygon in polygons for ring in polygon])
+        return cls(names, areas, grid_size)
+
+    def _rows(self, y):
+        return np.clip(
+            np.floor((y - self.lower[1]) / self.cell_size[1]), 0, self.grid_size - 1
+        ).astype(np.int64)
+
+    def _columns(self, x):
+        return np.clip(
+            np.floor((x - self.lower[0]) / self.cell_size[0]), 0, self.grid_size - 1
+        ).astype(np.int64)
+
+    def _center_areas(self, low_rows, heights) -> np.ndarray:
+        """Area around each cell center, by even-odd counts along its row.
+
+        Only edges spanning a row can cross its center line, so each
+        row looks at those alone.
+        """
+        edge_of_row, rows = _expand_ranges(low_rows, low_rows + heights - 1)
+        row_edges, row_offsets = _csr(rows, edge_of_row, self.grid_size)
+        center_x = self.lower[0] + (np.arange(self.grid_size) + 0.5) * self.cell_size[0]
+        areas = np.full((self.grid_size, self.grid_size), OUTSIDE, np.int64)
+        for row in range(self.grid_size):
+            y = self.lower[1] + (row + 0.5) * self.cell_size[1]
+            start, end = row_offsets[row], row_offsets[row + 1]
+            edges = row_edges[start:end]
+            x1, y1, x2, y2 = self.edges[edges].T
+            straddles = (y1 > y) != (y2 > y)
+            edges = edges[straddles]
+            x1, y1, x2, y2 = x1[straddles], y1[straddles], x2[straddles], y2[straddles]
+            crossing_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+            order = np.argsort(crossing_x)
+            # Crossings of each area at or left of every position.
+            counts = np.zeros((len(order) + 1, len(self.area_names)), np.int64)
+            counts[np.arange(1, len(order) + 1), self.edge_areas[edges[order]]] = 1
+            counts = np.cumsum(counts, axis=0)
+            left = counts[np.searchsorted(crossing_x[order], center_x, side="right")]
+            inside = (counts[-1] - left) % 2 == 1
+            areas[row] = np.where(inside.any(axis=1), inside.argmax(axis=1), OUTSIDE)
+        return areas.ravel()
+
+    def locate(self, x, y) -> np.ndarray:
+        """Index of the area containing each point, -1 when in none."""
+        x = np.asarray(x, float)
+        y = np.asarray(y, float)
+        areas = np.full(len(x), OUTSIDE, np.int64)
+        if not self.area_names:
+            return areas
+        upper = self.lower + self.cell_size * self.grid_size
+        within = np.flatnonzero(
+            (x >= self.lower[0])
+            & (x <= upper[0])
+            & (y >= self.lower[1])
+            & (y <= upper[1])
+        )
+        rows = self._rows(y[within])
+        columns = self._columns(x[within])
+        cells = rows * self.grid_size + columns
+        areas[within] = self.center_areas[cells]
+        center_x = self.lower[0] + (columns + 0.5) * self.cell_size[0]
+        center_y = self.lower[1] + (rows + 0.5) * self.cell_size[1]
+
+        starts = self.cell_offsets[cells]
+        lengths = self.cell_offsets[cells + 1] - starts
+        chunk_ends = np.searchsorted(
+            np.cumsum(lengths),
+            np.arange(MAX_PAIRS_PER_CHUNK, lengths.sum(), MAX_PAIRS_PER_CHUNK),
+        )
+        bounds = np.unique(np.concatenate([[0], chunk_ends + 1, [len(within)]]))
+        area_count = len(self.area_names)
+        for first, last in zip(bounds[:-1], np.minimum(bounds[1:], len(within))):
+            local, positions = _expand_ranges(
+                starts[first:last], starts[first:last] + lengths[first:last] - 1
+            )
+            if not len(positions):
+                continue
+            local += first
+            points = within[local]
+            edges = self.cell_edges[positions]
+            x1, y1, x2, y2 = self.edges[edges].T
+            px, py = x[points], y[points]
+            cx, cy = center_x[local], center_y[local]
+            crosses = (
+                _orientation(px, py, cx, cy, x1, y1)
+                * _orientation(px, py, cx, cy, x2, y2)
+                < 0
+            ) & (
+                _orientation(x1, y1, x2, y2, px, py)
+                * _orientation(x1, y1, x2, y2, cx, cy)
+                < 0
+            )
+            # An odd number of crossings of one area's edges flips
+            # whether the point is inside it, relative to the center.
+            keys, counts = np.unique(
+                points[crosses] * area_count + self.edge_areas[edges[crosses]],
+                return_counts=True,
+            )
+            flipped = keys[counts % 2 == 1]
+            flipped_points = flipped // area_count
+            flipped_areas = flipped % area_count
+            leaving = flipped_areas == areas[flipped_points]
+            areas[flipped_points[leaving]] = OUTSIDE
+            areas[flipped_points[~leaving]] = flipped_areas[~leaving]
+        return areas
+
+    def names(self, x, y) -> List[Optional[str]]:
+        """Name of the area containing each point, None when in none."""
+        return [
+            self.area_names[area] if area != OUTSIDE else None
+            for area in self.locate(x, y)
+        ]
+
+
+@lru_cache(maxsize=4)
+def _cached_index(path: str, name_property: str, modified: float) -> BoundaryIndex:
+    return BoundaryIndex.from_geojson(path, name_property)
+
+
+def load_boundary_index(path: str, name_property: str) -> Optional[BoundaryIndex]:
+    """The index of the GeoJSON file at *path*, None if there is none.
+
+    Indexes are kept per file and rebuilt when the file changes.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    return _cached_index(path, name_property, os.path.getmtime(path))
+
+
+def coordinate_arrays(records):
+    """Longitude and latitude arrays of *records*; NaN where missing."""
+    longitude = np.array([record.get("longitude") for record in records], dtype=float)
+    latitude = np.array([record.get("latitude") for record in records], dtype=float)
+    return longitude, latitude
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Name the area, such as the neighborhood, of each lookup record."
+    )
+    parser.add_argument(
+        "--file-path",
+        type=str,
+        default=GRAFFITI_LOOKUPS_FILE,
+        help="Path of the graffiti lookups JSON file",
+    )
+    parser.add_argument(
+        "--boundaries-path", type=str, required=True, help="GeoJSON boundary polygons"
+    )
+    parser.add_argument(
+        "--name-property",
+        type=str,
+        required=True,
+        help="Feature property holding each area's name",
+    )
+    parser.add_argument(
+        "--field",
+        type=str,
+        default="neighborhood",
+        help="Record field to write each area name to",
+    )
+    args = parser.parse_args(argv)
+
+    index = BoundaryIndex.from_geojson(args.boundaries_path, args.name_property)
+    storage = JsonFile(args.file_path)
+    records = storage.load()
+    names = index.names(*coordinate_arrays(records))
+    for record, name in zip(records, names):
+        record[args.field] = name
+    storage.save(records)
+    located = sum(name is not None for name in names)
+    logger.info(f"Named the {args.field} of {located} of {len(records)} records")
+
+
+if __name__ == "__main__":
+    main()
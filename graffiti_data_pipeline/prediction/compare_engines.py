@@ -0,0 +1,180 @@
+"""
+Engine Comparison Report
+
+Trains ``GraffitiPredictionModel`` once per engine on the same split of
+the lookups data and reports train time, predict time, and holdout
+accuracy side by side.
+
+Usage::
+
+    python -m graffiti_data_pipeline.prediction.compare_engines
+"""
+
+import argparse
+import time
+from typing import List, NamedTuple
+
+import numpy as np
+import pandas
+from sklearn.metrics import accuracy_score, mean_absolute_error
+from sklearn.model_selection import train_test_split
+
+from graffiti_data_pipeline.config import (
+    GRAFFITI_CLEANED_STATUS,
+    GRAFFITI_LOOKUPS_FILE,
+    MODEL_N_JOBS,
+)
+from graffiti_data_pipeline.logger import get_logger
+from graffiti_data_pipeline.prediction.engines import ENGINES
+from graffiti_data_pipeline.prediction.features import (
+    MODEL_FEATURE_COLUMNS,
+    extract_features,
+)
+from graffiti_data_pipeline.prediction.model import (
+    GraffitiPredictionModel,
+    TrainingTargets,
+)
+from graffiti_data_pipeline.prediction.request import (
+    GraffitiServiceRequest,
+    today_epoch_day,
+)
+from graffiti_data_pipeline.storages import JsonFile
+
+logger = get_logger(__name__)
+
+
+class EngineReport(NamedTuple):
+    """Timings and holdout scores for one engine.
+
+    Accuracies are for the two classifiers; the ``*_mae`` fields are
+    mean absolute errors in days over holdout rows with a known target,
+    ``None`` when the regressor could not be trained or scored.
+    """
+
+    engine: str
+    train_seconds: float
+    predict_seconds: float
+    recurrence_accuracy: float
+    cleaning_accuracy: float
+    time_to_next_update_mae: object
+    recurrence_window_mae: object
+    resolution_time_mae: object
+
+
+def _regression_error(actual: pandas.Series, predicted):
+    """Mean absolute error over rows with a known target, or None."""
+    known = actual.notnull().to_numpy()
+    predicted = np.asarray(predicted, dtype=object)
+    if not known.any() or any(value is None for value in predicted[known]):
+        return None
+    return float(
+        mean_absolute_error(actual[known].astype(float), predicted[known].astype(float))
+    )
+
+
+def compare_engines(
+    features: pandas.DataFrame,
+    targets: TrainingTargets,
+    engines=tuple(ENGINES),
+    test_size: float = 0.2,
+    n_jobs=MODEL_N_JOBS,
+) -> List[EngineReport]:
+    """Train and score every engine on one shared train/holdout split."""
+    split = train_test_split(features, *targets, test_size=test_size, random_state=42)
+    train_features, test_features = split[0], split[1]
+    train_targets = TrainingTargets(*split[2::2])
+    test_targets = TrainingTargets(*split[3::2])
+
+    reports = []
+    for engine in engines:
+        model = GraffitiPredictionModel(n_jobs=n_jobs, engine=engine)
+
+        started = time.perf_counter()
+        model.train(train_features, train_targets)
+        train_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        predictions = model.predict(test_features)
+        predict_seconds = time.perf_counter() - started
+
+        reports.append(
+            EngineReport(
+                engine=engine,
+                train_seconds=train_seconds,
+                predict_seconds=predict_seconds,
+                recurrence_accuracy=accuracy_score(
+                    test_targets.recurrence,
+                    predictions.recurrence_probabilities > 0.5,
+                ),
+                cleaning_accuracy=accuracy_score(
+                    test_targets.cleaning, predictions.cleaning_probabilities > 0.5
+                ),
+                time_to_next_update_mae=_regression_error(
+                    test_targets.time_to_next_update, predictions.time_predictions
+                ),
+                recurrence_window_mae=_regression_error(
+                    test_targets.recurrence_window,
+                    predictions.recurrence_window_predictions,
+                ),
+                resolution_time_mae=_regression_error(
+                    test_targets.resolution_time,
+                    predictions.resolution_time_predictions,
+                ),
+            )
+        )
+    return reports
+
+
+def format_report(reports: List[EngineReport]) -> str:
+    """Render reports as a fixed-width table, one row per engine."""
+
+    def cell(value):
+        if value is None:
+            return "n/a"
+        if isinstance(value, str):
+            return value
+        return f"{value:.3f}"
+
+    rows = [EngineReport._fields] + [
+        tuple(cell(value) for value in report) for report in reports
+    ]
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    return "\n".join(
+        "  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip()
+        for row in rows
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare prediction engines on the graffiti lookups data."
+    )
+    parser.add_argument(
+        "--file-path",
+        type=str,
+        default=GRAFFITI_LOOKUPS_FILE,
+        help="Path of the graffiti lookups JSON file",
+    )
+    parser.add_argument(
+        "--engines",
+        type=str,
+        default=",".join(ENGINES),
+        help="Comma separated engine names to compare",
+    )
+    args = parser.parse_args(argv)
+
+    records = JsonFile(args.file_path).load()
+    requests = [GraffitiServiceRequest(record) for record in records]
+    features = extract_features(
+        requests, [GRAFFITI_CLEANED_STATUS], reference_day=today_epoch_day()
+    )
+    targets = TrainingTargets.from_features(features)
+    engines = [engine.strip() for engine in args.engines.split(",") if engine.strip()]
+    reports = compare_engines(features[MODEL_FEATURE_COLUMNS], targets, engines)
+    report = format_report(reports)
+    logger.info(f"Engine comparison on {len(requests)} requests:\n{report}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
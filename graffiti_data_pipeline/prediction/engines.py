@@ -0,0 +1,193 @@
+"""
+Estimator Engines
+
+Each engine builds the classifiers and regressors used by
+``GraffitiPredictionModel`` and knows how to size and grow them.
+scikit-learn is only imported when an estimator is built, so loading a
+packed model for prediction (see ``inference``) never imports it.
+"""
+
+import warnings
+from typing import List, Optional
+
+from graffiti_data_pipeline.config import MODEL_MAX_TREES
+from graffiti_data_pipeline.prediction.packed_trees import PackedEnsemble
+
+N_ESTIMATORS = 50
+MAX_BOOSTING_ITERATIONS = 100
+
+# Adaptive sizing grows forests this many trees at a time, up to the
+# engine's max_trees, and stops once the out-of-bag score improves by
+# less than OOB_PLATEAU_TOLERANCE.
+ADAPTIVE_TREE_STEP = 10
+OOB_PLATEAU_TOLERANCE = 0.005
+
+
+class RandomForestEngine:
+    """Bagged trees: every tree sees the full, unbinned feature matrix.
+
+    ``n_jobs`` spreads tree building and evaluation over cores.
+    Adaptive sizing stops at *max_trees*, the same limit a warm-started
+    forest is retrained at.
+    """
+
+    name = "random_forest"
+    supports_multi_output = True
+    supports_adaptive_sizing = True
+
+    def __init__(self, max_trees: int = MODEL_MAX_TREES):
+        self.max_trees = max_trees
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(n_estimators={N_ESTIMATORS}, "
+            f"max_trees={self.max_trees})"
+        )
+
+    @staticmethod
+    def classifier(n_jobs: int):
+        from sklearn.ensemble import RandomForestClassifier
+
+        return RandomForestClassifier(
+            n_estimators=N_ESTIMATORS, random_state=42, n_jobs=n_jobs
+        )
+
+    @staticmethod
+    def regressor(n_jobs: int):
+        from sklearn.ensemble import RandomForestRegressor
+
+        return RandomForestRegressor(
+            n_estimators=N_ESTIMATORS, random_state=42, n_jobs=n_jobs
+        )
+
+    @staticmethod
+    def set_jobs(estimator, n_jobs: int):
+        estimator.set_params(n_jobs=n_jobs)
+
+    @staticmethod
+    def size(estimator) -> int:
+        """Fitted trees, 0 if the estimator was never fitted."""
+        return len(getattr(estimator, "estimators_", ()))
+
+    def prepare_to_grow(self, estimator, additional_trees: int):
+        """Make the next ``fit`` add *additional_trees* to the fitted ones."""
+        estimator.set_params(
+            warm_start=True, n_estimators=self.size(estimator) + additional_trees
+        )
+
+    def pack(self, estimator) -> Optional[PackedEnsemble]:
+        """NumPy-only copy of a fitted *estimator*, None if unfitted."""
+        if not self.size(estimator):
+            return None
+        return PackedEnsemble.from_random_forest(estimator)
+
+    def fit_adaptively(
+        self,
+        estimator,
+        features,
+        targets,
+        step: int = ADAPTIVE_TREE_STEP,
+        max_trees: Optional[int] = None,
+        tolerance: float = OOB_PLATEAU_TOLERANCE,
+    ) -> List[float]:
+        """Fit *estimator* on every row, *step* trees at a time.
+
+        Each round warm-starts *step* more trees and scores the forest
+        on the rows each tree did not sample (out-of-bag: accuracy for
+        classifiers, R² for regressors), stopping once a round improves
+        the score by less than *tolerance* or *max_trees* (default the
+        engine's) is reached.  No rows are held out.  Returns the score
+        after each round.
+        """
+        if max_trees is None:
+            max_trees = self.max_trees
+        scores = []
+        estimator.set_params(n_estimators=step, oob_score=True, warm_start=False)
+        try:
+            with warnings.catch_warnings():
+                # The first rounds leave a few rows without out-of-bag trees.
+                warnings.simplefilter("ignore", UserWarning)
+                estimator.fit(features, targets)
+                scores.append(estimator.oob_score_)
+                estimator.set_params(warm_start=True)
+                while self.size(estimator) + step <= max_trees:
+                    estimator.set_params(n_estimators=self.size(estimator) + step)
+                    estimator.fit(features, targets)
+                    scores.append(estimator.oob_score_)
+                    if scores[-1] - scores[-2] < tolerance:
+                        break
+        finally:
+            # Later warm starts should not pay for out-of-bag scoring.
+            estimator.set_params(warm_start=False, oob_score=False)
+        return scores
+
+
+class HistGradientBoostingEngine:
+    """Boosted trees over features binned into at most 255 buckets.
+
+    Binning makes each split search O(bins) instead of O(rows), so
+    training stays fast on large row counts, and missing values are
+    routed natively instead of needing imputation.  Threading is
+    handled by OpenMP, so ``n_jobs`` is ignored.
+    """
+
+    name = "hist_gradient_boosting"
+    supports_multi_output = False
+    # Boosting has its own validation-based early stopping.
+    supports_adaptive_sizing = False
+
+    def __repr__(self):
+        return f"{type(self).__name__}(max_iter={MAX_BOOSTING_ITERATIONS})"
+
+    @staticmethod
+    def classifier(n_jobs: int):
+        from sklearn.ensemble import HistGradientBoostingClassifier
+
+        return HistGradientBoostingClassifier(
+            max_iter=MAX_BOOSTING_ITERATIONS, random_state=42
+        )
+
+    @staticmethod
+    def regressor(n_jobs: int):
+        from sklearn.ensemble import HistGradientBoostingRegressor
+
+        return HistGradientBoostingRegressor(
+            max_iter=MAX_BOOSTING_ITERATIONS, random_state=42
+        )
+
+    @staticmethod
+    def set_jobs(estimator, n_jobs: int):
+        pass
+
+    @staticmethod
+    def size(estimator) -> int:
+        """Boosting iterations run, 0 if the estimator was never fitted."""
+        return getattr(estimator, "n_iter_", 0)
+
+    def prepare_to_grow(self, estimator, additional_trees: int):
+        """Make the next ``fit`` run *additional_trees* more iterations."""
+        estimator.set_params(
+            warm_start=True, max_iter=self.size(estimator) + additional_trees
+        )
+
+    def pack(self, estimator) -> Optional[PackedEnsemble]:
+        """NumPy-only copy of a fitted *estimator*, None if unfitted."""
+        if not self.size(estimator):
+            return None
+        return PackedEnsemble.from_hist_gradient_boosting(estimator)
+
+
+ENGINES = {
+    engine.name: engine
+    for engine in (RandomForestEngine(), HistGradientBoostingEngine())
+}
+
+
+def get_engine(name: str):
+    """Look up an engine by name, e.g. ``"random_forest"``."""
+    try:
+        return ENGINES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown model engine {name!r}; choose one of {sorted(ENGINES)}"
+        ) from None
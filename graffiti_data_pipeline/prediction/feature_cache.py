@@ -0,0 +1,243 @@
+"""
+Incremental Feature Cache
+
+Persists feature rows between runs so addresses whose requests have
+not changed skip feature extraction entirely.
+"""
+
+import os
+from typing import List, Optional
+
+import joblib
+import numpy as np
+import pandas
+
+from graffiti_data_pipeline.logger import get_logger
+from graffiti_data_pipeline.prediction.features import (
+    DATE_RELATIVE_COLUMNS,
+    EXPECTED_COLUMNS,
+    FEATURE_SCHEMA_VERSION,
+    NEIGHBORHOOD_COLUMNS,
+    borough_codes,
+    days_since,
+    extract_features,
+    extract_request_features,
+    neighborhood_columns,
+    normalize_optional_columns,
+)
+from graffiti_data_pipeline.prediction.request import GraffitiServiceRequest
+
+logger = get_logger(__name__)
+
+# Copied from each request as is, so never cached.
+REQUEST_COLUMNS = ["latitude", "longitude", "index"]
+
+# Date-relative, borough, and neighborhood columns depend on more than
+# the address's own requests, so they are recomputed every run.
+CACHED_COLUMNS = [
+    column
+    for column in EXPECTED_COLUMNS
+    if column not in DATE_RELATIVE_COLUMNS
+    and column not in NEIGHBORHOOD_COLUMNS
+    and column not in REQUEST_COLUMNS
+    and column != "borough"
+]
+
+
+# Same column order as extract_features.
+OUTPUT_COLUMNS = [
+    *DATE_RELATIVE_COLUMNS,
+    *(column for column in EXPECTED_COLUMNS if column not in DATE_RELATIVE_COLUMNS),
+]
+
+
+def request_keys(
+    requests: List[GraffitiServiceRequest], created, last_updated
+) -> np.ndarray:
+    """Cache key per request: its own dates and status plus its address's requests.
+
+    Every cached feature is a function of the address, dates, and
+    statuses of the requests at the same address, so a key that
+    changes whenever any of those change tells when a row is stale.
+    """
+    groups, unique_addresses = pandas.factorize(
+        pandas.Series([request.location_id for request in requests], dtype=object),
+        use_na_sentinel=False,
+    )
+    address_hashes = pandas.util.hash_array(np.asarray(unique_addresses, dtype=object))
+    source = pandas.DataFrame(
+        {
+            "address": address_hashes[groups],
+            "created": created,
+            "last_updated": last_updated,
+            "status": pandas.Series(
+                [request.status for request in requests], dtype=object
+            ),
+        }
+    )
+    row_keys = pandas.util.hash_pandas_object(source, index=False).to_numpy()
+
+    # Summing row hashes (wrapping at 2**64) gives an order-independent
+    # hash of each address's request set.
+    order = np.argsort(groups, kind="stable")
+    group_starts = np.flatnonzero(np.diff(groups[order], prepend=-1))
+    address_sums = np.add.reduceat(row_keys[order], group_starts)
+    address_keys = pandas.util.hash_array(address_sums)[groups]
+
+    return pandas.util.hash_pandas_object(
+        pandas.DataFrame({"address": address_keys, "row": row_keys}), index=False
+    ).to_numpy()
+
+
+def _numeric_columns(features: pandas.DataFrame):
+    """Cached columns as plain numeric arrays; missing values become NaN."""
+    return {
+        column: pandas.to_numeric(features[column]).to_numpy()
+        for column in CACHED_COLUMNS
+    }
+
+
+class FeatureCache:
+    """Feature rows from earlier runs, keyed by :func:`request_keys`.
+
+    :meth:`extract` reuses the cached rows of every address whose
+    requests are unchanged, runs :func:`extract_request_features` only
+    for the other addresses, and recomputes the date-relative, borough,
+    and neighborhood columns for all rows.  The file holds one numeric
+    array per column so it loads quickly, and is rewritten with the
+    current rows, dropping entries for vanished addresses.
+
+    Usage::
+
+        cache = FeatureCache("data/feature-cache.joblib")
+        features = cache.extract(requests, ["Cleaned"], today_epoch_day())
+    """
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self.reused_rows = 0
+        self.computed_rows = 0
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(file_name={self.file_name!r}, "
+            f"reused_rows={self.reused_rows}, computed_rows={self.computed_rows})"
+        )
+
+    def load(self, cleaned_status_keywords: List[str]):
+        """Sorted keys and matching column arrays; empty if missing or stale."""
+        empty = np.empty(0, dtype=np.uint64), {}
+        if not os.path.exists(self.file_name):
+            return empty
+        payload = joblib.load(self.file_name)
+        if payload.get("feature_schema_version") != FEATURE_SCHEMA_VERSION or (
+            payload.get("cleaned_status_keywords") != list(cleaned_status_keywords)
+        ):
+            logger.info(f"Discarding feature cache {self.file_name}: settings changed")
+            return empty
+        return payload["keys"], payload["columns"]
+
+    def save(self, keys, columns, cleaned_status_keywords: List[str]):
+        """Write *columns* sorted by *keys*, one row per distinct key."""
+        directory = os.path.dirname(self.file_name)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        sorted_keys, first_rows = np.unique(keys, return_index=True)
+        joblib.dump(
+            {
+                "feature_schema_version": FEATURE_SCHEMA_VERSION,
+                "cleaned_status_keywords": list(cleaned_status_keywords),
+                "keys": sorted_keys,
+                "columns": {
+                    column: values[first_rows] for column, values in columns.items()
+                },
+            },
+            self.file_name,
+        )
+
+    def extract(
+        self,
+        requests: List[GraffitiServiceRequest],
+        cleaned_status_keywords: List[str],
+        reference_day: Optional[int] = None,
+        neighborhood_requests: Optional[List[GraffitiServiceRequest]] = None,
+        **extract_options,
+    ) -> pandas.DataFrame:
+        """Same frame as :func:`extract_features`, reusing unchanged rows."""
+        if not requests:
+            return extract_features(requests, cleaned_status_keywords, reference_day)
+
+        created = np.fromiter(
+            (request.created_day for request in requests), np.int64, len(requests)
+        )
+        last_updated = np.fromiter(
+            (request.last_updated_day for request in requests),
+            np.int64,
+            len(requests),
+        )
+        keys = request_keys(requests, created, last_updated)
+        cached_keys, cached_columns = self.load(cleaned_status_keywords)
+
+        if len(cached_keys):
+            cached_rows = np.minimum(
+                np.searchsorted(cached_keys, keys), len(cached_keys) - 1
+            )
+            reused = cached_keys[cached_rows] == keys
+        else:
+            cached_rows = np.zeros(len(keys), dtype=np.int64)
+            reused = np.zeros(len(keys), dtype=bool)
+        reused_positions = np.flatnonzero(reused)
+        computed_positions = np.flatnonzero(~reused)
+
+        computed_columns = {column: np.empty(0) for column in CACHED_COLUMNS}
+        if len(computed_positions):
+            computed_columns = _numeric_columns(
+                extract_request_features(
+                    [requests[position] for position in computed_positions],
+                    cleaned_status_keywords,
+                    reference_day,
+                    **extract_options,
+                )
+            )
+        row_order = np.concatenate([reused_positions, computed_positions])
+        columns = {}
+        for column in CACHED_COLUMNS:
+            reused_values = cached_columns.get(column, np.empty(0))[
+                cached_rows[reused_positions]
+            ]
+            values = np.concatenate(
+                [
+                    part
+                    for part in (reused_values, computed_columns[column])
+                    if len(part)
+                ]
+            )
+            columns[column] = np.empty_like(values)
+            columns[column][row_order] = values
+
+        self.reused_rows += len(reused_positions)
+        self.computed_rows += len(computed_positions)
+        logger.info(
+            f"Feature cache reused {len(reused_positions)} rows, "
+            f"computed {len(computed_positions)}"
+        )
+        self.save(keys, columns, cleaned_status_keywords)
+
+        features = pandas.DataFrame(
+            {
+                "days_since_last_tag": days_since(reference_day, last_updated),
+                "borough": borough_codes(requests),
+                **columns,
+                "latitude": [request.latitude for request in requests],
+                "longitude": [request.longitude for request in requests],
+                "index": [request.unique_key for request in requests],
+                **neighborhood_columns(
+                    requests,
+                    cleaned_status_keywords,
+                    reference_day,
+                    neighborhood_requests,
+                ),
+            }
+        )
+        features = normalize_optional_columns(features)
+        return features[OUTPUT_COLUMNS]
@@ -5,29 +5,141 @@ Provides functions to engineer features from graffiti service requests.
 """
 
 from collections import defaultdict
-from typing import Dict, List
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
 
+import numpy as np
 import pandas
 
-from graffiti_data_pipeline.prediction.request import GraffitiServiceRequest
+from graffiti_data_pipeline.config import (
+    BOROUGH_BOUNDARIES_FILE,
+    BOROUGH_NAME_PROPERTY,
+    FEATURE_PARALLEL_MIN_REQUESTS,
+    FEATURE_WORKERS,
+    GRAFFITI_CLEANED_STATUS,
+    GRAFFITI_COMPLETE_STATUSES,
+    GRAFFITI_SITE_TO_BE_CLEANED_STATUS,
+    NYC_BOROUGHS,
+)
+from graffiti_data_pipeline.logger import get_logger
+from graffiti_data_pipeline.prediction.boundaries import (
+    OUTSIDE,
+    load_boundary_index,
+)
+from graffiti_data_pipeline.prediction.request import (
+    GraffitiServiceRequest,
+    today_epoch_day,
+)
+from graffiti_data_pipeline.prediction.spatial import (
+    NEIGHBORHOOD_COLUMNS,
+    ReportPoints,
+    neighborhood_features,
+)
+from graffiti_data_pipeline.prediction.timeline import (
+    RECENT_REPORT_WINDOWS,
+    AddressIndex,
+    AddressTimeline,
+    GroupTimelines,
+)
+
+logger = get_logger(__name__)
+
+# Bump whenever a model feature is added, removed, or re-encoded, so
+# persisted models trained on the old layout are rejected.
+FEATURE_SCHEMA_VERSION = 5
+
+# Fixed codebooks keep borough and status codes identical across runs,
+# whichever values a particular run happens to contain.
+BOROUGH_CODEBOOK = [*sorted(NYC_BOROUGHS), "unknown"]
+STATUS_CODEBOOK = sorted(
+    {*GRAFFITI_COMPLETE_STATUSES, GRAFFITI_SITE_TO_BE_CLEANED_STATUS}
+)
+OTHER_STATUS_CODE = len(STATUS_CODEBOOK)
+
+RECENT_REPORT_COLUMNS = [f"reports_last_{days}d" for days in RECENT_REPORT_WINDOWS]
+
+MODEL_FEATURE_COLUMNS = [
+    "days_since_last_tag",
+    "borough",
+    "total_tags",
+    "response_time",
+    "created_day_of_week",
+    "created_month",
+    "times_cleaned",
+    "resolution_velocity",
+    *RECENT_REPORT_COLUMNS,
+    "decayed_report_rate",
+    "latitude",
+    "longitude",
+    "status_code",
+    *NEIGHBORHOOD_COLUMNS,
+]
+
+# Columns measured against today's date; they change every day for every
+# row, so they are ignored when deciding whether a row is new data.
+DATE_RELATIVE_COLUMNS = ["days_since_last_tag"]
+
+
+@dataclass(frozen=True)
+class FeatureMatrix:
+    """Model features as one C-contiguous float32 array.
+
+    Forests compare features as float32, so this is the layout they
+    would otherwise convert every frame to on each ``fit`` and
+    ``predict``.  One matrix is built per run and every estimator fits
+    on it, selecting training rows with index arrays rather than
+    boolean-mask copies of a frame.
+    """
+
+    values: np.ndarray
+    columns: List[str]
+
+    def __repr__(self):
+        return f"{type(self).__name__}(rows={len(self.values)}, columns={self.columns})"
+
+    @classmethod
+    def of(cls, features) -> "FeatureMatrix":
+        """*features* as a matrix; a frame is converted in one allocation."""
+        if isinstance(features, cls):
+            return features
+        values = features.to_numpy(dtype=np.float32)
+        return cls(np.ascontiguousarray(values), list(features.columns))
+
+    def __len__(self):
+        return len(self.values)
+
+    def rows(self, positions: Optional[np.ndarray]) -> np.ndarray:
+        """Values of the rows at *positions*, every row (no copy) for None."""
+        if positions is None:
+            return self.values
+        return self.values[positions]
 
 
 def _build_address_index(
     requests: List[GraffitiServiceRequest],
-) -> Dict[str, List[GraffitiServiceRequest]]:
-    """Map each address to its list of requests for O(1) lookup."""
-    index: Dict[str, List[GraffitiServiceRequest]] = defaultdict(list)
+) -> AddressIndex:
+    """Map each location ID to its sorted timeline for O(log k) queries."""
+    grouped: Dict[str, List[GraffitiServiceRequest]] = defaultdict(list)
     for request in requests:
-        index[request.address].append(request)
-    return dict(index)
+        grouped[request.location_id].append(request)
+    return {
+        address: AddressTimeline(same_address)
+        for address, same_address in grouped.items()
+    }
 
 
 def _build_status_categories(
     requests: List[GraffitiServiceRequest],
 ) -> Dict[str, int]:
-    """Assign deterministic integer codes to statuses (sorted alphabetically)."""
-    unique_statuses = sorted({request.status for request in requests})
-    return {status: code for code, status in enumerate(unique_statuses)}
+    """Map each status to its fixed code from :data:`STATUS_CODEBOOK`.
+
+    Statuses outside the codebook all share :data:`OTHER_STATUS_CODE`.
+    """
+    categories = {status: code for code, status in enumerate(STATUS_CODEBOOK)}
+    for status in {request.status for request in requests}:
+        categories.setdefault(status, OTHER_STATUS_CODE)
+    return categories
 
 
 EXPECTED_COLUMNS = [
@@ -40,6 +152,8 @@ EXPECTED_COLUMNS = [
     "times_reported",
     "times_cleaned",
     "resolution_velocity",
+    *RECENT_REPORT_COLUMNS,
+    "decayed_report_rate",
     "latitude",
     "longitude",
     "status_code",
@@ -49,33 +163,348 @@ EXPECTED_COLUMNS = [
     "recurrence_window",
     "resolution_time",
     "index",
+    *NEIGHBORHOOD_COLUMNS,
 ]
 
+OPTIONAL_DAY_COLUMNS = ["time_to_next_update", "recurrence_window", "resolution_time"]
+
+
+def days_since(reference_day: Optional[int], days: np.ndarray) -> np.ndarray:
+    """Days from each of *days* to *reference_day* (default today)."""
+    if reference_day is None:
+        reference_day = today_epoch_day()
+    return reference_day - days
+
+
+def _optional_days(days: np.ndarray, found: np.ndarray) -> np.ndarray:
+    """Integer days where *found*, missing elsewhere.
+
+    Mirrors how pandas infers a column of ints and ``None``: int64
+    when nothing is missing, object when everything is, else float64.
+    """
+    if found.all():
+        return days.astype(np.int64)
+    if not found.any():
+        return np.full(len(days), None, dtype=object)
+    return np.where(found, days, np.nan)
+
+
+def _address_history(groups, created, last_updated, completed, cleaned_here):
+    """Compute the raw same-address history arrays for every request.
+
+    Takes only flat NumPy arrays so it can run in a worker process on
+    any subset of addresses.  Each optional value comes with a
+    ``has_*`` mask; :func:`_history_columns` turns them into columns.
+    """
+    timelines = GroupTimelines(groups, created, last_updated, completed, cleaned_here)
+
+    total_tags = timelines.report_counts[groups].astype(np.int64)
+    next_report, has_next_report = timelines.next_report_after(groups, created)
+    next_update, has_next_update = timelines.next_report_after(groups, last_updated)
+    first_completion, has_completion = timelines.first_completion_on_or_after(
+        groups, created
+    )
+    past_count, past_total = timelines.completions_before(groups, created)
+    has_history = past_count > 0
+
+    return {
+        "total_tags": total_tags,
+        "times_cleaned": timelines.cleaned_counts[groups],
+        "resolution_velocity": np.round(
+            past_total / np.where(has_history, past_count, 1)
+        ),
+        "has_history": has_history,
+        **{
+            f"reports_last_{days}d": timelines.reports_between(
+                groups, created - days, created
+            )
+            for days in RECENT_REPORT_WINDOWS
+        },
+        "decayed_report_rate": timelines.decayed_report_rate(groups, created),
+        "time_to_next_update": next_update - last_updated,
+        "has_next_update": has_next_update,
+        "recurrence_window": next_report - created,
+        "has_next_report": has_next_report,
+        "resolution_time": np.maximum(first_completion - created, 0),
+        "has_completion": has_completion,
+    }
+
+
+def _partitioned_address_history(
+    group_partitions, groups, created, last_updated, completed, cleaned_here
+):
+    """Run :func:`_address_history` per address partition in a process pool.
+
+    *group_partitions* assigns each address group to a partition.
+    Every worker receives only its partition's rows as flat arrays,
+    and the results are scattered back so row order is preserved.
+    """
+    row_partitions = group_partitions[groups]
+    partition_count = int(group_partitions.max()) + 1
+    history = {}
+    with ProcessPoolExecutor(max_workers=partition_count) as executor:
+        pending = []
+        for partition in range(partition_count):
+            rows = np.flatnonzero(row_partitions == partition)
+            if not len(rows):
+                continue
+            _, local_groups = np.unique(groups[rows], return_inverse=True)
+            future = executor.submit(
+                _address_history,
+                local_groups,
+                created[rows],
+                last_updated[rows],
+                completed[rows],
+                cleaned_here[rows],
+            )
+            pending.append((future, rows))
+        for future, rows in pending:
+            for name, values in future.result().items():
+                if name not in history:
+                    history[name] = np.empty(len(groups), dtype=values.dtype)
+                history[name][rows] = values
+    return history
+
+
+def _history_columns(history):
+    """Turn raw history arrays into the final feature columns."""
+    return {
+        "total_tags": history["total_tags"],
+        "times_cleaned": history["times_cleaned"],
+        "resolution_velocity": _optional_days(
+            history["resolution_velocity"], history["has_history"]
+        ),
+        **{column: history[column] for column in RECENT_REPORT_COLUMNS},
+        "decayed_report_rate": history["decayed_report_rate"],
+        "tagged_again": (history["total_tags"] > 1).astype(np.int64),
+        "time_to_next_update": _optional_days(
+            history["time_to_next_update"], history["has_next_update"]
+        ),
+        "recurrence_window": _optional_days(
+            history["recurrence_window"], history["has_next_report"]
+        ),
+        "resolution_time": _optional_days(
+            history["resolution_time"], history["has_completion"]
+        ),
+    }
+
+
+def _normalize_optional_days(column) -> np.ndarray:
+    """Re-infer an optional day column as :func:`_optional_days` would.
+
+    Used after rows from different runs are combined, since each part
+    may have been inferred with a different dtype.
+    """
+    values = pandas.to_numeric(pandas.Series(column)).to_numpy(dtype=float)
+    found = ~np.isnan(values)
+    return _optional_days(np.where(found, values, 0), found)
+
+
+def _velocity_column(resolution_velocity) -> pandas.Series:
+    # Fill missing velocity with -1 (no prior history at address).
+    # This is a feature column, so NaN would break the estimators.
+    return pandas.Series(resolution_velocity).fillna(-1)
+
+
+def normalize_optional_columns(features: pandas.DataFrame) -> pandas.DataFrame:
+    """Give the optional columns of a combined frame their usual dtypes."""
+    for column in OPTIONAL_DAY_COLUMNS:
+        features[column] = _normalize_optional_days(features[column])
+    velocity = pandas.to_numeric(features["resolution_velocity"]).to_numpy(float)
+    found = velocity != -1
+    features["resolution_velocity"] = _velocity_column(
+        _optional_days(np.where(found, velocity, 0), found)
+    )
+    return features
+
+
+def borough_codes(requests: List[GraffitiServiceRequest]) -> np.ndarray:
+    """:data:`BOROUGH_CODEBOOK` code of each request's borough.
+
+    Every request at a location gets the borough of its first one.
+    With a :data:`BOROUGH_BOUNDARIES_FILE`, that request's coordinates
+    are looked up in the borough polygons; addresses without
+    coordinates, or outside every borough, fall back to
+    :meth:`GraffitiServiceRequest.get_borough`.
+    """
+    groups, _ = pandas.factorize(
+        pandas.Series([request.location_id for request in requests], dtype=object),
+        use_na_sentinel=False,
+    )
+    _, first_of_group = np.unique(groups, return_index=True)
+    firsts = [requests[position] for position in first_of_group]
+    group_boroughs = np.full(len(firsts), None, dtype=object)
+
+    index = load_boundary_index(BOROUGH_BOUNDARIES_FILE, BOROUGH_NAME_PROPERTY)
+    if index is None:
+        logger.warning(
+            f"No borough boundaries at {BOROUGH_BOUNDARIES_FILE}; "
+            "reading boroughs from the address text"
+        )
+    else:
+        areas = index.locate(
+            np.array([request.longitude for request in firsts], dtype=float),
+            np.array([request.latitude for request in firsts], dtype=float),
+        )
+        area_boroughs = np.array(
+            [
+                name.lower() if name.lower() in BOROUGH_CODEBOOK else None
+                for name in index.area_names
+            ]
+            + [None],
+            dtype=object,
+        )
+        group_boroughs = area_boroughs[np.where(areas == OUTSIDE, -1, areas)]
+    for position, borough in enumerate(group_boroughs):
+        if borough is None:
+            group_boroughs[position] = firsts[position].get_borough()
+    return pandas.Categorical(group_boroughs[groups], categories=BOROUGH_CODEBOOK).codes
+
 
 def extract_features(
-    requests: List[GraffitiServiceRequest], cleaned_status_keywords: List[str]
+    requests: List[GraffitiServiceRequest],
+    cleaned_status_keywords: List[str],
+    reference_day: Optional[int] = None,
+    workers: int = FEATURE_WORKERS,
+    parallel_min_requests: int = FEATURE_PARALLEL_MIN_REQUESTS,
+    neighborhood_requests: Optional[List[GraffitiServiceRequest]] = None,
 ) -> pandas.DataFrame:
     """Extract a feature DataFrame from service requests.
 
-    Builds an address index and deterministic status codes before
-    iterating, bringing overall complexity from O(n^3) down to O(n*k)
-    where k is the max requests per address.
+    :func:`extract_request_features` plus the
+    :data:`NEIGHBORHOOD_COLUMNS`, which count the reports near each
+    request among *neighborhood_requests*.  Those default to
+    *requests*; pass every request when *requests* is only a subset,
+    so the counts still see all of its neighbors.
+    """
+    features = extract_request_features(
+        requests,
+        cleaned_status_keywords,
+        reference_day,
+        workers,
+        parallel_min_requests,
+    )
+    if requests:
+        features = features.assign(
+            **neighborhood_columns(
+                requests, cleaned_status_keywords, reference_day, neighborhood_requests
+            )
+        )
+    return features
+
+
+def neighborhood_columns(
+    requests: List[GraffitiServiceRequest],
+    cleaned_status_keywords: List[str],
+    reference_day: Optional[int] = None,
+    neighborhood_requests: Optional[List[GraffitiServiceRequest]] = None,
+) -> Dict[str, np.ndarray]:
+    """:data:`NEIGHBORHOOD_COLUMNS` of *requests* among *neighborhood_requests*.
+
+    *requests* must all be among *neighborhood_requests* (default
+    *requests* itself).
+    """
+    queries = ReportPoints.from_requests(requests, cleaned_status_keywords)
+    if neighborhood_requests is None:
+        reports = queries
+    else:
+        reports = ReportPoints.from_requests(
+            neighborhood_requests, cleaned_status_keywords
+        )
+    return neighborhood_features(queries, reports, reference_day)
+
+
+def extract_request_features(
+    requests: List[GraffitiServiceRequest],
+    cleaned_status_keywords: List[str],
+    reference_day: Optional[int] = None,
+    workers: int = FEATURE_WORKERS,
+    parallel_min_requests: int = FEATURE_PARALLEL_MIN_REQUESTS,
+) -> pandas.DataFrame:
+    """Extract every feature except the neighborhood columns.
+
+    Works column-wise: requests are grouped by location ID and every
+    "next event" or "prior history" question is answered for all rows
+    at once by sorting and ``searchsorted``, so the cost is
+    O(n log n) regardless of how many requests share an address.
+    Produces the same frame as calling
+    :meth:`GraffitiServiceRequest.to_feature_dict` per request.
+
+    History features only depend on requests at the same address, so
+    with ``workers > 1`` and at least *parallel_min_requests* requests
+    the addresses are hashed into one partition per worker and
+    processed in parallel.  Smaller inputs run serially, where process
+    start-up would cost more than it saves.
+
+    Date-relative columns (:data:`DATE_RELATIVE_COLUMNS`) are measured
+    against *reference_day* in epoch days, today if not given.
     """
     if not requests:
         return pandas.DataFrame(columns=EXPECTED_COLUMNS)
 
     status_categories = _build_status_categories(requests)
-    address_index = _build_address_index(requests)
+    addresses = [request.location_id for request in requests]
+    statuses = pandas.Series([request.status for request in requests], dtype=object)
+    created = np.fromiter(
+        (request.created_day for request in requests), np.int64, len(requests)
+    )
+    last_updated = np.fromiter(
+        (request.last_updated_day for request in requests), np.int64, len(requests)
+    )
+
+    groups, unique_addresses = pandas.factorize(
+        pandas.Series(addresses, dtype=object), use_na_sentinel=False
+    )
 
-    feature_dicts = [
-        request.to_feature_dict(
-            status_categories, cleaned_status_keywords, address_index
+    history_inputs = (
+        groups,
+        created,
+        last_updated,
+        statuses.isin(GRAFFITI_COMPLETE_STATUSES).to_numpy(),
+        (statuses == GRAFFITI_CLEANED_STATUS).to_numpy(),
+    )
+    if workers > 1 and len(requests) >= parallel_min_requests:
+        group_partitions = pandas.util.hash_array(
+            np.asarray(unique_addresses, dtype=object)
+        ) % np.uint64(workers)
+        raw_history = _partitioned_address_history(
+            group_partitions.astype(np.int64), *history_inputs
         )
-        for request in requests
-    ]
-    features = pandas.DataFrame(feature_dicts)
-    features["borough"] = features["borough"].astype("category").cat.codes
-    # Fill missing velocity with -1 (no prior history at address).
-    # This is a feature column, so NaN would break the estimators.
-    features["resolution_velocity"] = features["resolution_velocity"].fillna(-1)
+    else:
+        raw_history = _address_history(*history_inputs)
+    history = _history_columns(raw_history)
+
+    status_lookup = statuses.drop_duplicates()
+    cleaned_by_status = {
+        status: int(any(keyword in status for keyword in cleaned_status_keywords))
+        for status in status_lookup
+    }
+
+    created_months = created.astype("datetime64[D]").astype("datetime64[M]")
+
+    features = pandas.DataFrame(
+        {
+            "days_since_last_tag": days_since(reference_day, last_updated),
+            "borough": borough_codes(requests),
+            "total_tags": history["total_tags"],
+            "response_time": last_updated - created,
+            # 1970-01-01 was a Thursday (dayofweek=3).
+            "created_day_of_week": (created + 3) % 7,
+            "created_month": created_months.astype(np.int64) % 12 + 1,
+            "times_reported": history["total_tags"],
+            "times_cleaned": history["times_cleaned"],
+            "resolution_velocity": _velocity_column(history["resolution_velocity"]),
+            **{column: history[column] for column in RECENT_REPORT_COLUMNS},
+            "decayed_report_rate": history["decayed_report_rate"],
+            "latitude": [request.latitude for request in requests],
+            "longitude": [request.longitude for request in requests],
+            "status_code": statuses.map(status_categories).to_numpy(np.int64),
+            "tagged_again": history["tagged_again"],
+            "cleaned": statuses.map(cleaned_by_status).to_numpy(np.int64),
+            "time_to_next_update": history["time_to_next_update"],
+            "recurrence_window": history["recurrence_window"],
+            "resolution_time": history["resolution_time"],
+            "index": [request.unique_key for request in requests],
+        }
+    )
     return features
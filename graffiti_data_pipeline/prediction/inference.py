@@ -0,0 +1,171 @@
+"""
+Packed Inference Model
+
+A ``GraffitiPredictionModel`` with every estimator exported to a
+:class:`~graffiti_data_pipeline.prediction.packed_trees.PackedEnsemble`,
+so prediction-only runs load a small file and never import scikit-learn.
+"""
+
+import os
+from typing import Dict, Optional
+
+import joblib
+import numpy as np
+import pandas
+
+from graffiti_data_pipeline.logger import get_logger
+from graffiti_data_pipeline.prediction.features import FeatureMatrix
+from graffiti_data_pipeline.prediction.model import (
+    PredictionEnricher,
+    PredictionResult,
+    check_model_schema,
+    model_schema,
+)
+from graffiti_data_pipeline.prediction.packed_trees import PackedEnsemble, split_range
+
+logger = get_logger(__name__)
+
+
+class PackedPredictionModel(PredictionEnricher):
+    """NumPy-only stand-in for a trained ``GraffitiPredictionModel``.
+
+    Built with :meth:`from_model` after training and written with
+    :meth:`save`; :meth:`load` and :meth:`predict` need neither
+    scikit-learn nor the original estimators.  Predictions match the
+    source model's ``predict_proba`` and ``predict`` up to float
+    rounding.
+
+    Usage::
+
+        PackedPredictionModel.from_model(model).save(path)
+        predictions = PackedPredictionModel.load(path).predict(features)
+    """
+
+    def __init__(
+        self,
+        ensembles: Dict[str, Optional[PackedEnsemble]],
+        engine: str,
+        multi_output: bool = False,
+        day_count_medians=None,
+        version: Optional[str] = None,
+    ):
+        self.ensembles = ensembles
+        self.engine = engine
+        self.multi_output = multi_output
+        self.day_count_medians = day_count_medians
+        # The source model's version; None for files packed before it was kept.
+        self.version = version
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(engine={self.engine!r}, "
+            f"multi_output={self.multi_output}, "
+            f"ensembles={sorted(self.ensembles)})"
+        )
+
+    @classmethod
+    def from_model(cls, model) -> "PackedPredictionModel":
+        """Pack every fitted estimator of *model*; unfitted ones become None."""
+        return cls(
+            ensembles={
+                attribute: model.engine.pack(getattr(model, attribute))
+                for attribute in model.estimator_attributes
+            },
+            engine=model.engine.name,
+            multi_output=model.multi_output,
+            day_count_medians=getattr(model, "day_count_medians", None),
+            version=model.version,
+        )
+
+    def to_payload(self) -> Dict[str, object]:
+        """The packed ensembles and their feature schema, as saved."""
+        return {
+            **model_schema(),
+            "engine": self.engine,
+            "multi_output": self.multi_output,
+            "day_count_medians": self.day_count_medians,
+            "ensembles": self.ensembles,
+            "version": self.version,
+        }
+
+    @classmethod
+    def from_payload(
+        cls, payload: Dict[str, object], path: str
+    ) -> "PackedPredictionModel":
+        """Rebuild a model from :meth:`to_payload` output read from *path*."""
+        check_model_schema(payload, path)
+        return cls(
+            ensembles=payload["ensembles"],
+            engine=payload["engine"],
+            multi_output=payload["multi_output"],
+            day_count_medians=payload["day_count_medians"],
+            version=payload.get("version"),
+        )
+
+    def save(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        joblib.dump(self.to_payload(), path, compress=3)
+        logger.info(f"Saved packed prediction model to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "PackedPredictionModel":
+        """Read a model written by :meth:`save`; ``ValueError`` if stale."""
+        model = cls.from_payload(joblib.load(path), path)
+        logger.info(f"Loaded packed prediction model from {path}")
+        return model
+
+    def split_range(self, features, column: str):
+        """Per row, the values of *column* that keep every prediction.
+
+        See :meth:`PackedEnsemble.split_range
+        <graffiti_data_pipeline.prediction.packed_trees.PackedEnsemble.split_range>`.
+        """
+        matrix = FeatureMatrix.of(features)
+        return split_range(
+            self.ensembles.values(), matrix.values, matrix.columns.index(column)
+        )
+
+    def _class_probabilities(self, attribute: str, inputs: np.ndarray):
+        ensemble = self.ensembles[attribute]
+        if ensemble is None:
+            raise ValueError(f"{attribute} was never fitted")
+        if len(ensemble.classes) == 1:
+            return np.full(len(inputs), float(ensemble.classes[0] == 1))
+        return ensemble.predict(inputs)[:, 1]
+
+    def _regressor_predictions(self, attribute: str, inputs: np.ndarray):
+        """Predictions with one column per output, None if never fitted."""
+        ensemble = self.ensembles[attribute]
+        if ensemble is None:
+            return None
+        return ensemble.predict(inputs)
+
+    def predict(self, features: pandas.DataFrame) -> PredictionResult:
+        inputs = FeatureMatrix.of(features).values
+        unavailable = [None] * len(inputs)
+        recurrence = self._class_probabilities("recurrence_model", inputs)
+        cleaning = self._class_probabilities("cleaning_model", inputs)
+        if self.multi_output:
+            predictions = self._regressor_predictions("day_count_regressor", inputs)
+            day_counts = [
+                (
+                    unavailable
+                    if predictions is None or median is None
+                    else predictions[:, column]
+                )
+                for column, median in enumerate(self.day_count_medians)
+            ]
+        else:
+            day_counts = []
+            for attribute in (
+                "time_regressor",
+                "recurrence_window_regressor",
+                "resolution_time_regressor",
+            ):
+                predictions = self._regressor_predictions(attribute, inputs)
+                day_counts.append(
+                    unavailable if predictions is None else predictions[:, 0]
+                )
+        return PredictionResult(recurrence, cleaning, *day_counts)
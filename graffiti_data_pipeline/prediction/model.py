@@ -6,24 +6,103 @@ and time-to-next-update using machine learning models.
 """
 
 import datetime
+import hashlib
 import math
-from typing import NamedTuple
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
+import joblib
 import numpy as np
 import pandas
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
-from sklearn.metrics import accuracy_score
-from sklearn.model_selection import train_test_split
 
 from graffiti_data_pipeline.config import (
     GRAFFITI_CLEANED_STATUS,
     GRAFFITI_SITE_TO_BE_CLEANED_STATUS,
+    MODEL_ADAPTIVE_TREES,
+    MODEL_ENGINE,
+    MODEL_MULTI_OUTPUT,
+    MODEL_N_JOBS,
+    MODEL_WARM_START_TREES,
 )
 from graffiti_data_pipeline.logger import get_logger
+from graffiti_data_pipeline.prediction.engines import get_engine
+from graffiti_data_pipeline.prediction.packed_trees import split_range
+from graffiti_data_pipeline.prediction.features import (
+    BOROUGH_CODEBOOK,
+    DATE_RELATIVE_COLUMNS,
+    FEATURE_SCHEMA_VERSION,
+    MODEL_FEATURE_COLUMNS,
+    NEIGHBORHOOD_COLUMNS,
+    STATUS_CODEBOOK,
+    FeatureMatrix,
+)
 
 logger = get_logger(__name__)
 
 MIN_TRAIN_SIZE = 10
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+_MAX_EPOCH_DAY = datetime.date.max.toordinal() - _EPOCH_ORDINAL
+MODEL_COUNT = 5
+# Share of classifier training rows held out to log accuracy.
+HOLDOUT_FRACTION = 0.2
+_HASH_MULTIPLIER = np.uint64(1_000_003)
+
+# Estimator attributes, in the same order as TrainingTargets.
+MODEL_ATTRIBUTES = (
+    "recurrence_model",
+    "cleaning_model",
+    "time_regressor",
+    "recurrence_window_regressor",
+    "resolution_time_regressor",
+)
+# With multi_output=True one regressor predicts every day-count target.
+MULTI_OUTPUT_ATTRIBUTES = ("recurrence_model", "cleaning_model", "day_count_regressor")
+DAY_COUNT_TARGETS = ("time_to_next_update", "recurrence_window", "resolution_time")
+
+
+def split_job_budget(
+    n_jobs: int, model_count: int = MODEL_COUNT
+) -> Tuple[int, List[int]]:
+    """Split one CPU budget between concurrent models and trees per model.
+
+    Returns ``(model_workers, tree_jobs)``: how many models to fit at
+    once, and the tree-level jobs of each of the *model_count* models.
+    When every model runs at once the cores left over after an even
+    split go one each to the first models, so the whole budget is used;
+    the jobs of models running at once never add up to more than the
+    budget, so the two levels do not oversubscribe the machine.
+    ``n_jobs=-1`` means every core.
+    """
+    budget = (os.cpu_count() or 1) if n_jobs == -1 else max(n_jobs, 1)
+    model_workers = min(model_count, budget)
+    if model_workers < model_count:
+        return model_workers, [1] * model_count
+    per_model, spare = divmod(budget, model_count)
+    return model_workers, [
+        per_model + (position < spare) for position in range(model_count)
+    ]
+
+
+class TrainingTargets(NamedTuple):
+    """Target columns for the five models, in training order."""
+
+    recurrence: pandas.Series
+    cleaning: pandas.Series
+    time_to_next_update: pandas.Series
+    recurrence_window: pandas.Series
+    resolution_time: pandas.Series
+
+    @classmethod
+    def from_features(cls, features: pandas.DataFrame) -> "TrainingTargets":
+        """Pick the target columns out of an ``extract_features`` frame."""
+        return cls(
+            recurrence=features["tagged_again"],
+            cleaning=features["cleaned"],
+            time_to_next_update=features["time_to_next_update"],
+            recurrence_window=features["recurrence_window"],
+            resolution_time=features["resolution_time"],
+        )
 
 
 class PredictionResult(NamedTuple):
@@ -36,18 +115,12 @@ class PredictionResult(NamedTuple):
     resolution_time_predictions: np.ndarray
 
 
-class GraffitiPredictionModel:
-    def __init__(self, min_train_size: int = MIN_TRAIN_SIZE):
-        self.min_train_size = min_train_size
-        self.recurrence_model = RandomForestClassifier(n_estimators=50, random_state=42)
-        self.cleaning_model = RandomForestClassifier(n_estimators=50, random_state=42)
-        self.time_regressor = RandomForestRegressor(n_estimators=50, random_state=42)
-        self.recurrence_window_regressor = RandomForestRegressor(
-            n_estimators=50, random_state=42
-        )
-        self.resolution_time_regressor = RandomForestRegressor(
-            n_estimators=50, random_state=42
-        )
+class PredictionEnricher:
+    """Turns raw model outputs into the prediction fields of each record.
+
+    Shared by :class:`GraffitiPredictionModel` and the packed, NumPy-only
+    model used for prediction-only runs.
+    """
 
     @staticmethod
     def estimate_next_tag_date(last_updated: str, likelihood_percent: float) -> str:
@@ -73,122 +146,6 @@ class GraffitiPredictionModel:
         except Exception:
             return "Unknown"
 
-    def train_recurrence_classifier(
-        self, features: pandas.DataFrame, targets: pandas.Series
-    ):
-        if features.empty or targets.empty:
-            raise ValueError("Features and targets must not be empty.")
-        if len(features) > self.min_train_size:
-            features_train, features_test, targets_train, targets_test = (
-                train_test_split(features, targets, test_size=0.2, random_state=42)
-            )
-            self.recurrence_model.fit(features_train, targets_train)
-            predictions = self.recurrence_model.predict(features_test)
-            accuracy = accuracy_score(targets_test, predictions)
-            logger.info(f"Recurrence model accuracy: {accuracy:.3f}")
-        else:
-            self.recurrence_model.fit(features, targets)
-
-    def train_cleaning_classifier(
-        self, features: pandas.DataFrame, targets: pandas.Series
-    ):
-        if features.empty or targets.empty:
-            raise ValueError("Features and targets must not be empty.")
-        if len(features) > self.min_train_size:
-            features_train, features_test, targets_train, targets_test = (
-                train_test_split(features, targets, test_size=0.2, random_state=42)
-            )
-            self.cleaning_model.fit(features_train, targets_train)
-            predictions = self.cleaning_model.predict(features_test)
-            accuracy = accuracy_score(targets_test, predictions)
-            logger.info(f"Cleaning model accuracy: {accuracy:.3f}")
-        else:
-            self.cleaning_model.fit(features, targets)
-
-    def train_time_regressor(self, features: pandas.DataFrame, targets: pandas.Series):
-        if features.empty or targets.empty:
-            raise ValueError("Features and targets must not be empty.")
-        valid_mask = targets.notnull()
-        if valid_mask.sum() > self.min_train_size:
-            self.time_regressor.fit(features[valid_mask], targets[valid_mask])
-        else:
-            logger.warning("Not enough data to train time regressor")
-
-    def train_recurrence_window_regressor(
-        self, features: pandas.DataFrame, targets: pandas.Series
-    ):
-        """Train regressor that predicts days until next report at address."""
-        if features.empty or targets.empty:
-            raise ValueError("Features and targets must not be empty.")
-        valid_mask = targets.notnull()
-        if valid_mask.sum() > self.min_train_size:
-            self.recurrence_window_regressor.fit(
-                features[valid_mask], targets[valid_mask]
-            )
-        else:
-            logger.warning("Not enough data to train recurrence window regressor")
-
-    def train_resolution_time_regressor(
-        self, features: pandas.DataFrame, targets: pandas.Series
-    ):
-        """Train regressor that predicts days from report to resolution."""
-        if features.empty or targets.empty:
-            raise ValueError("Features and targets must not be empty.")
-        valid_mask = targets.notnull()
-        if valid_mask.sum() > self.min_train_size:
-            self.resolution_time_regressor.fit(
-                features[valid_mask], targets[valid_mask]
-            )
-        else:
-            logger.warning("Not enough data to train resolution time regressor")
-
-    def predict(self, features: pandas.DataFrame) -> PredictionResult:
-        recurrence_probabilities = self._get_class_probabilities(
-            self.recurrence_model, features
-        )
-        cleaning_probabilities = self._get_class_probabilities(
-            self.cleaning_model, features
-        )
-        time_predictions = self._get_time_predictions(features)
-        recurrence_window_predictions = self._get_regressor_predictions(
-            self.recurrence_window_regressor, features
-        )
-        resolution_time_predictions = self._get_regressor_predictions(
-            self.resolution_time_regressor, features
-        )
-        return PredictionResult(
-            recurrence_probabilities,
-            cleaning_probabilities,
-            time_predictions,
-            recurrence_window_predictions,
-            resolution_time_predictions,
-        )
-
-    def _get_class_probabilities(self, model, features):
-        proba = model.predict_proba(features)
-        if proba.shape[1] == 1:
-            single_class = model.classes_[0]
-            if single_class == 1:
-                return np.ones(len(features))
-            else:
-                return np.zeros(len(features))
-        else:
-            return proba[:, 1]
-
-    def _get_time_predictions(self, features):
-        try:
-            return self.time_regressor.predict(features)
-        except Exception:
-            return [None] * len(features)
-
-    @staticmethod
-    def _get_regressor_predictions(regressor, features):
-        """Safely predict from a regressor, returning None on failure."""
-        try:
-            return regressor.predict(features)
-        except Exception:
-            return [None] * len(features)
-
     def predict_cleaning_date(
         self, last_updated: str, cleaning_prob: float, predicted_days=None
     ) -> str:
@@ -208,7 +165,7 @@ class GraffitiPredictionModel:
         except (ValueError, OverflowError):
             return "Unknown"
 
-    def enrich_requests(
+    def enrichment_columns(
         self,
         requests,
         recurrence_probabilities,
@@ -218,12 +175,16 @@ class GraffitiPredictionModel:
         resolution_time_predictions=None,
         times_reported=None,
         times_cleaned=None,
-    ):
-        """Enrich each request record with prediction fields.
-
-        .. warning::
-            Mutates each ``request.record`` in place and returns the
-            list of mutated record dicts.
+    ) -> Dict[str, list]:
+        """Prediction fields for every request, one list per record key.
+
+        Gives the same values as :meth:`estimate_next_tag_date`,
+        :meth:`compute_predicted_time_to_next_update`, and
+        :meth:`predict_cleaning_date` applied per request, but works on
+        whole arrays: each distinct ``last_updated`` string is parsed
+        once, date offsets are integer day arithmetic, and each
+        distinct result date is formatted once.  Keys are in the order
+        :meth:`enrich_requests` writes them.
         """
         prediction_count = len(requests)
         if (
@@ -247,52 +208,89 @@ class GraffitiPredictionModel:
         if times_cleaned is None:
             times_cleaned = [0] * prediction_count
 
-        for idx, request in enumerate(requests):
-            rec_prob = float(recurrence_probabilities[idx])
-            clean_prob = float(cleaning_probabilities[idx])
-            predicted_days = time_predictions[idx]
-
-            request.record["graffiti_likelihood"] = self._to_percent(rec_prob)
-            request.record["estimated_next_tag"] = self.compute_estimated_next_tag(
-                request.last_updated, rec_prob
-            )
-            request.record["predicted_time_to_next_update"] = (
-                self.compute_predicted_time_to_next_update(
-                    request.last_updated, predicted_days
-                )
-            )
-
-            # New continuous predictions
-            recurrence_window = recurrence_window_predictions[idx]
-            request.record["predicted_recurrence_days"] = (
-                round(float(recurrence_window))
-                if _is_valid_day_count(recurrence_window)
-                else None
-            )
+        last_updated = [request.last_updated for request in requests]
+        statuses = np.array([request.status for request in requests], dtype=object)
+        last_days, parsed = _parse_dates(last_updated)
+        recurrence_percent = np.asarray(recurrence_probabilities, dtype=float) * 100
+        cleaning_probabilities = np.asarray(cleaning_probabilities, dtype=float)
+        predicted_days = _day_counts(time_predictions)
+
+        # Higher likelihood means fewer days: 1 day at 100%, 366 at 0.01%.
+        likely = parsed & (recurrence_percent > 0) & ~np.isnan(recurrence_percent)
+        likelihood = np.maximum(
+            np.minimum(np.where(likely, recurrence_percent, 100), 100), 0.01
+        )
+        days_until_next_tag = (365 * (1 - (likelihood / 100))).astype(np.int64) + 1
+        estimated_next_tag = _format_days(last_days + days_until_next_tag, likely)
+
+        has_update = parsed & ~np.isnan(predicted_days)
+        whole_days = np.trunc(np.where(has_update, predicted_days, 0))
+        has_update &= whole_days <= _MAX_EPOCH_DAY - last_days
+        whole_days = np.where(has_update, whole_days, 0).astype(np.int64)
+        predicted_update = _format_days(last_days + whole_days, has_update)
+
+        cleaned = statuses == GRAFFITI_CLEANED_STATUS
+        to_be_cleaned = statuses == GRAFFITI_SITE_TO_BE_CLEANED_STATUS
+        cleaning_likelihood = np.where(
+            cleaned, 100.0, np.where(to_be_cleaned, 90.0, cleaning_probabilities * 100)
+        )
+        # NaN is not <= 0.5, so like the scalar path it keeps the date.
+        cleaning_unlikely = cleaning_probabilities <= 0.5
+        predicted_cleaning_date = np.where(
+            cleaning_unlikely | to_be_cleaned, "Unknown", predicted_update
+        ).astype(object)
+        predicted_cleaning_date[cleaned] = np.asarray(last_updated, dtype=object)[
+            cleaned
+        ]
+
+        return {
+            "graffiti_likelihood": recurrence_percent.tolist(),
+            "estimated_next_tag": estimated_next_tag.tolist(),
+            "predicted_time_to_next_update": predicted_update.tolist(),
+            "predicted_recurrence_days": _rounded_day_counts(
+                recurrence_window_predictions
+            ),
+            "predicted_resolution_days": _rounded_day_counts(
+                resolution_time_predictions
+            ),
+            "times_reported": np.asarray(times_reported).astype(np.int64).tolist(),
+            "times_cleaned": np.asarray(times_cleaned).astype(np.int64).tolist(),
+            "cleaning_likelihood": cleaning_likelihood.tolist(),
+            "predicted_cleaning_date": predicted_cleaning_date.tolist(),
+        }
 
-            resolution_days = resolution_time_predictions[idx]
-            request.record["predicted_resolution_days"] = (
-                round(float(resolution_days))
-                if _is_valid_day_count(resolution_days)
-                else None
-            )
+    def enrich_requests(
+        self,
+        requests,
+        recurrence_probabilities,
+        cleaning_probabilities,
+        time_predictions,
+        recurrence_window_predictions=None,
+        resolution_time_predictions=None,
+        times_reported=None,
+        times_cleaned=None,
+    ):
+        """Enrich each request record with prediction fields.
 
-            request.record["times_reported"] = int(times_reported[idx])
-            request.record["times_cleaned"] = int(times_cleaned[idx])
+        Ground truth replaces the cleaning predictions when a request
+        is already cleaned or scheduled for cleaning.  See
+        :meth:`enrichment_columns` for how the fields are computed.
 
-            # Ground truth replaces predictions when the outcome is known.
-            if request.status == GRAFFITI_CLEANED_STATUS:
-                request.record["cleaning_likelihood"] = 100.0
-                request.record["predicted_cleaning_date"] = request.last_updated
-            elif request.status == GRAFFITI_SITE_TO_BE_CLEANED_STATUS:
-                request.record["cleaning_likelihood"] = 90.0
-                request.record["predicted_cleaning_date"] = "Unknown"
-            else:
-                request.record["cleaning_likelihood"] = self._to_percent(clean_prob)
-                request.record["predicted_cleaning_date"] = self.predict_cleaning_date(
-                    request.last_updated, clean_prob, predicted_days
-                )
-        return [request.record for request in requests]
+        .. warning::
+            Mutates each ``request.record`` in place and returns the
+            list of mutated record dicts.
+        """
+        columns = self.enrichment_columns(
+            requests,
+            recurrence_probabilities,
+            cleaning_probabilities,
+            time_predictions,
+            recurrence_window_predictions,
+            resolution_time_predictions,
+            times_reported,
+            times_cleaned,
+        )
+        return write_prediction_fields(requests, columns)
 
     @staticmethod
     def _to_percent(probability: float) -> float:
@@ -320,6 +318,689 @@ class GraffitiPredictionModel:
             return "Unknown"
 
 
+class GraffitiPredictionModel(PredictionEnricher):
+    """Five forests predicting recurrence, cleaning, and day counts.
+
+    *n_jobs* is a single CPU budget shared by :meth:`train` and
+    :meth:`predict`: independent models run concurrently in threads
+    and each forest builds or evaluates its trees with the remaining
+    share of cores.  ``n_jobs=-1`` uses every core.
+
+    *engine* names the estimator family from
+    :data:`~graffiti_data_pipeline.prediction.engines.ENGINES`:
+    ``"random_forest"`` (the default) or ``"hist_gradient_boosting"``,
+    which bins features and trains much faster on large inputs.
+
+    With *multi_output* the three day-count targets share a single
+    multi-output forest, fitted once on every row with at least one
+    known target and evaluated in one pass per tree.  Missing targets
+    on those rows are imputed with that target's median.  Only engines
+    with ``supports_multi_output`` allow it.
+
+    With *adaptive* each forest is grown ten trees at a time until its
+    out-of-bag score stops improving, instead of a fixed size, and the
+    classifiers train on every row rather than holding 20% out to log
+    accuracy; the out-of-bag score is logged instead.  Only engines
+    with ``supports_adaptive_sizing`` allow it.
+
+    A trained model can be written with :meth:`save` and read back with
+    :meth:`load`; the file records the feature schema version and the
+    borough and status codebooks, and is rejected if either changed.
+    :meth:`warm_start` then grows the saved forests with extra trees
+    fitted on new rows only, instead of refitting every tree.
+    """
+
+    def __init__(
+        self,
+        min_train_size: int = MIN_TRAIN_SIZE,
+        n_jobs=MODEL_N_JOBS,
+        engine: str = MODEL_ENGINE,
+        multi_output: bool = MODEL_MULTI_OUTPUT,
+        adaptive: bool = MODEL_ADAPTIVE_TREES,
+    ):
+        self.min_train_size = min_train_size
+        self.n_jobs = n_jobs
+        self.engine = get_engine(engine)
+        if multi_output and not self.engine.supports_multi_output:
+            raise ValueError(f"Engine {engine!r} does not support multi-output")
+        self.multi_output = multi_output
+        if adaptive and not self.engine.supports_adaptive_sizing:
+            raise ValueError(f"Engine {engine!r} does not support adaptive sizing")
+        self.adaptive = adaptive
+        self.model_workers, tree_jobs = split_job_budget(
+            n_jobs, len(self.estimator_attributes)
+        )
+        self.trained_row_hashes = np.empty(0, dtype=np.uint64)
+        self.recurrence_model = self.engine.classifier(tree_jobs[0])
+        self.cleaning_model = self.engine.classifier(tree_jobs[1])
+        if multi_output:
+            self.day_count_regressor = self.engine.regressor(tree_jobs[2])
+            self.day_count_medians = [None] * len(DAY_COUNT_TARGETS)
+        else:
+            self.time_regressor = self.engine.regressor(tree_jobs[2])
+            self.recurrence_window_regressor = self.engine.regressor(tree_jobs[3])
+            self.resolution_time_regressor = self.engine.regressor(tree_jobs[4])
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(min_train_size={self.min_train_size}, "
+            f"n_jobs={self.n_jobs}, engine={self.engine.name!r}, "
+            f"multi_output={self.multi_output}, adaptive={self.adaptive})"
+        )
+
+    def to_payload(self) -> Dict[str, object]:
+        """The fitted estimators and their feature schema, as saved."""
+        return {
+            **model_schema(),
+            "min_train_size": self.min_train_size,
+            "engine": self.engine.name,
+            "multi_output": self.multi_output,
+            "adaptive": self.adaptive,
+            "day_count_medians": getattr(self, "day_count_medians", None),
+            "estimators": {
+                attribute: getattr(self, attribute)
+                for attribute in self.estimator_attributes
+            },
+            "trained_row_hashes": self.trained_row_hashes,
+        }
+
+    @classmethod
+    def from_payload(
+        cls, payload: Dict[str, object], path: str, n_jobs=MODEL_N_JOBS
+    ) -> "GraffitiPredictionModel":
+        """Rebuild a model from :meth:`to_payload` output read from *path*."""
+        check_model_schema(payload, path)
+        model = cls(
+            min_train_size=payload["min_train_size"],
+            n_jobs=n_jobs,
+            engine=payload["engine"],
+            multi_output=payload["multi_output"],
+            adaptive=payload.get("adaptive", False),
+        )
+        if model.multi_output:
+            model.day_count_medians = payload["day_count_medians"]
+        _, tree_jobs = split_job_budget(n_jobs, len(model.estimator_attributes))
+        jobs_by_attribute = dict(zip(model.estimator_attributes, tree_jobs))
+        for attribute, estimator in payload["estimators"].items():
+            model.engine.set_jobs(estimator, jobs_by_attribute[attribute])
+            setattr(model, attribute, estimator)
+        model.trained_row_hashes = payload["trained_row_hashes"]
+        return model
+
+    def save(self, path: str):
+        """Write the fitted estimators and their feature schema to *path*."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        joblib.dump(self.to_payload(), path)
+        logger.info(f"Saved prediction model to {path}")
+
+    @classmethod
+    def load(cls, path: str, n_jobs=MODEL_N_JOBS) -> "GraffitiPredictionModel":
+        """Read a model written by :meth:`save`.
+
+        Raises ``ValueError`` if the file was written for a different
+        feature schema, column layout, or codebook.
+        """
+        model = cls.from_payload(joblib.load(path), path, n_jobs)
+        logger.info(f"Loaded prediction model from {path}")
+        return model
+
+    @property
+    def estimator_attributes(self):
+        """Names of the estimator attributes used in this mode."""
+        return MULTI_OUTPUT_ATTRIBUTES if self.multi_output else MODEL_ATTRIBUTES
+
+    @property
+    def tree_count(self) -> int:
+        """Trees in the largest fitted forest, 0 if none is fitted."""
+        return max(
+            (
+                self.engine.size(getattr(self, attribute))
+                for attribute in self.estimator_attributes
+            ),
+            default=0,
+        )
+
+    @property
+    def version(self) -> str:
+        """Fingerprint of the fitted forests, changed by every fit.
+
+        Derived from the engine, the forest sizes, and the hashes of
+        the rows trained on, so equal models share a version.
+        """
+        digest = hashlib.sha1(
+            repr(
+                [
+                    self.engine.name,
+                    self.multi_output,
+                    *(
+                        self.engine.size(getattr(self, attribute))
+                        for attribute in self.estimator_attributes
+                    ),
+                ]
+            ).encode()
+        )
+        digest.update(self.trained_row_hashes.tobytes())
+        return digest.hexdigest()
+
+    def split_range(self, features, column: str):
+        """Per row, the values of *column* that keep every prediction.
+
+        See :meth:`PackedEnsemble.split_range
+        <graffiti_data_pipeline.prediction.packed_trees.PackedEnsemble.split_range>`.
+        """
+        matrix = FeatureMatrix.of(features)
+        return split_range(
+            (
+                self.engine.pack(getattr(self, attribute))
+                for attribute in self.estimator_attributes
+            ),
+            matrix.values,
+            matrix.columns.index(column),
+        )
+
+    def unseen_rows(self, features, targets: TrainingTargets) -> np.ndarray:
+        """Boolean mask of rows not yet used to train this model."""
+        return ~np.isin(training_row_hashes(features, targets), self.trained_row_hashes)
+
+    def training_jobs(self, targets: TrainingTargets):
+        """``(train_fn, targets)`` per estimator, in attribute order."""
+        classifier_jobs = [
+            (self.train_recurrence_classifier, targets.recurrence),
+            (self.train_cleaning_classifier, targets.cleaning),
+        ]
+        if self.multi_output:
+            return classifier_jobs + [(self.train_day_count_regressor, targets)]
+        return classifier_jobs + [
+            (self.train_time_regressor, targets.time_to_next_update),
+            (self.train_recurrence_window_regressor, targets.recurrence_window),
+            (self.train_resolution_time_regressor, targets.resolution_time),
+        ]
+
+    def train(
+        self,
+        features,
+        targets: TrainingTargets,
+        rows: Optional[np.ndarray] = None,
+    ):
+        """Train every model, fitting independent models concurrently.
+
+        *features* is a frame or a :class:`FeatureMatrix`; every model
+        fits on the same matrix.  *rows* limits training to those row
+        positions, e.g. from :func:`stratified_rows`.
+        """
+        matrix = FeatureMatrix.of(features)
+        self._run_concurrently(
+            [
+                (train_fn, matrix, model_targets, rows)
+                for train_fn, model_targets in self.training_jobs(targets)
+            ]
+        )
+        row_hashes = training_row_hashes(matrix, targets)
+        self.trained_row_hashes = row_hashes if rows is None else row_hashes[rows]
+
+    def warm_start(
+        self,
+        features,
+        targets: TrainingTargets,
+        additional_trees: int = MODEL_WARM_START_TREES,
+        rows: Optional[np.ndarray] = None,
+    ):
+        """Grow each fitted forest with trees fitted on *features* only.
+
+        Existing trees are kept as they are.  A model that has never
+        been fitted is trained normally instead; a forest with too few
+        labelled new rows, or a classifier whose new rows do not cover
+        exactly the classes it already knows, is left unchanged.
+        *rows* limits the new trees to those row positions.
+        """
+        matrix = FeatureMatrix.of(features)
+        self._run_concurrently(
+            [
+                (
+                    self._warm_start_model,
+                    attribute,
+                    train_fn,
+                    matrix,
+                    model_targets,
+                    rows,
+                    additional_trees,
+                )
+                for attribute, (train_fn, model_targets) in zip(
+                    self.estimator_attributes, self.training_jobs(targets)
+                )
+            ]
+        )
+        row_hashes = training_row_hashes(matrix, targets)
+        self.trained_row_hashes = np.union1d(
+            self.trained_row_hashes,
+            row_hashes if rows is None else row_hashes[rows],
+        )
+
+    def _warm_start_model(
+        self, attribute, train_fn, matrix, targets, rows, additional_trees
+    ):
+        estimator = getattr(self, attribute)
+        if not self.engine.size(estimator):
+            train_fn(matrix, targets, rows)
+            return
+        if attribute == "day_count_regressor":
+            known, labels = self._day_count_matrix(targets, rows)
+        else:
+            known, labels = _known_rows(targets, rows), targets.to_numpy()
+        labels = labels if known is None else labels[known]
+        if len(labels) <= self.min_train_size:
+            logger.info(f"Not enough new data to grow {attribute}")
+            return
+        if hasattr(estimator, "classes_") and not np.array_equal(
+            np.unique(labels), estimator.classes_
+        ):
+            logger.info(f"New data does not cover every class of {attribute}")
+            return
+        self.engine.prepare_to_grow(estimator, additional_trees)
+        try:
+            estimator.fit(matrix.rows(known), labels)
+        finally:
+            estimator.set_params(warm_start=False)
+        logger.info(f"Grew {attribute} to {self.engine.size(estimator)} trees")
+
+    def _run_concurrently(self, calls):
+        """Run ``(fn, *args)`` calls on the model thread pool, in order.
+
+        Forest fitting and prediction release the GIL, so threads give
+        real parallelism while sharing one feature matrix.
+        """
+        if self.model_workers == 1:
+            return [fn(*args) for fn, *args in calls]
+        with ThreadPoolExecutor(max_workers=self.model_workers) as executor:
+            futures = [executor.submit(fn, *args) for fn, *args in calls]
+            return [future.result() for future in futures]
+
+    def _fit(self, estimator, name, features, labels):
+        """Fit *estimator*, sizing it by out-of-bag score if adaptive."""
+        if not self.adaptive:
+            estimator.fit(features, labels)
+            return
+        scores = self.engine.fit_adaptively(estimator, features, labels)
+        logger.info(
+            f"Sized {name} at {self.engine.size(estimator)} trees, "
+            f"out-of-bag score {scores[-1]:.3f}"
+        )
+
+    def _fit_classifier(self, estimator, name, features, targets, rows=None):
+        """Fit on 80% of the rows and log accuracy on the rest.
+
+        With at most ``min_train_size`` rows, or when adaptive, every
+        row is used and no holdout accuracy is logged.
+        """
+        matrix = FeatureMatrix.of(features)
+        if not len(matrix) or targets.empty:
+            raise ValueError("Features and targets must not be empty.")
+        labels = targets.to_numpy()
+        positions = np.arange(len(matrix)) if rows is None else rows
+        if len(positions) > self.min_train_size and not self.adaptive:
+            shuffled = np.random.default_rng(42).permutation(positions)
+            test_count = math.ceil(len(shuffled) * HOLDOUT_FRACTION)
+            test_rows = np.sort(shuffled[:test_count])
+            train_rows = np.sort(shuffled[test_count:])
+            estimator.fit(matrix.rows(train_rows), labels[train_rows])
+            predictions = estimator.predict(matrix.rows(test_rows))
+            accuracy = float(np.mean(predictions == labels[test_rows]))
+            logger.info(f"{name} model accuracy: {accuracy:.3f}")
+        else:
+            self._fit(estimator, f"{name} model", matrix.rows(rows), labels[positions])
+
+    def _fit_regressor(self, estimator, name, features, targets, rows=None):
+        """Fit on the rows with a known target, if there are enough."""
+        matrix = FeatureMatrix.of(features)
+        if not len(matrix) or targets.empty:
+            raise ValueError("Features and targets must not be empty.")
+        known = _known_rows(targets, rows)
+        labels = targets.to_numpy(dtype=float)
+        labels = labels if known is None else labels[known]
+        if len(labels) > self.min_train_size:
+            self._fit(estimator, name, matrix.rows(known), labels)
+        else:
+            logger.warning(f"Not enough data to train {name}")
+
+    def train_recurrence_classifier(self, features, targets: pandas.Series, rows=None):
+        self._fit_classifier(
+            self.recurrence_model, "Recurrence", features, targets, rows
+        )
+
+    def train_cleaning_classifier(self, features, targets: pandas.Series, rows=None):
+        self._fit_classifier(self.cleaning_model, "Cleaning", features, targets, rows)
+
+    def train_time_regressor(self, features, targets: pandas.Series, rows=None):
+        self._fit_regressor(
+            self.time_regressor, "time regressor", features, targets, rows
+        )
+
+    def train_recurrence_window_regressor(
+        self, features, targets: pandas.Series, rows=None
+    ):
+        """Train regressor that predicts days until next report at address."""
+        self._fit_regressor(
+            self.recurrence_window_regressor,
+            "recurrence window regressor",
+            features,
+            targets,
+            rows,
+        )
+
+    def train_resolution_time_regressor(
+        self, features, targets: pandas.Series, rows=None
+    ):
+        """Train regressor that predicts days from report to resolution."""
+        self._fit_regressor(
+            self.resolution_time_regressor,
+            "resolution time regressor",
+            features,
+            targets,
+            rows,
+        )
+
+    def _day_count_matrix(self, targets: TrainingTargets, rows=None):
+        """Rows with any known day-count target, and the imputed targets.
+
+        Returns the positions (``None`` for every row) and a
+        ``(rows, targets)`` array for all rows.  Each missing value is
+        replaced by its target's median from :attr:`day_count_medians`;
+        a target never seen is filled with 0 and its predictions are
+        discarded.
+        """
+        matrix = np.column_stack(
+            [getattr(targets, name).to_numpy(dtype=float) for name in DAY_COUNT_TARGETS]
+        )
+        known = ~np.isnan(matrix).all(axis=1)
+        if rows is not None:
+            known_rows = rows[known[rows]]
+        elif known.all():
+            known_rows = None
+        else:
+            known_rows = np.flatnonzero(known)
+        fill_values = np.array(
+            [0.0 if median is None else median for median in self.day_count_medians]
+        )
+        return known_rows, np.where(np.isnan(matrix), fill_values, matrix)
+
+    def train_day_count_regressor(self, features, targets: TrainingTargets, rows=None):
+        """Train one regressor predicting every day-count target at once."""
+        matrix = FeatureMatrix.of(features)
+        if not len(matrix):
+            raise ValueError("Features and targets must not be empty.")
+        day_counts = [getattr(targets, name) for name in DAY_COUNT_TARGETS]
+        if rows is not None:
+            day_counts = [values.iloc[rows] for values in day_counts]
+        self.day_count_medians = [
+            None if known.empty else float(known.median())
+            for known in (values.dropna() for values in day_counts)
+        ]
+        known, labels = self._day_count_matrix(targets, rows)
+        labels = labels if known is None else labels[known]
+        if len(labels) > self.min_train_size:
+            self._fit(
+                self.day_count_regressor,
+                "day count regressor",
+                matrix.rows(known),
+                labels,
+            )
+        else:
+            logger.warning("Not enough data to train day count regressor")
+
+    def _get_day_count_predictions(self, features):
+        """Predictions per day-count target, ``None`` where unavailable."""
+        unavailable = [None] * len(features)
+        if not self.engine.size(self.day_count_regressor):
+            return [unavailable] * len(DAY_COUNT_TARGETS)
+        predictions = self.day_count_regressor.predict(features)
+        return [
+            unavailable if median is None else predictions[:, column]
+            for column, median in enumerate(self.day_count_medians)
+        ]
+
+    def predict(self, features) -> PredictionResult:
+        """Predict for a frame or :class:`FeatureMatrix` of model features."""
+        features = FeatureMatrix.of(features).values
+        if self.multi_output:
+            recurrence, cleaning, day_counts = self._run_concurrently(
+                [
+                    (self._get_class_probabilities, self.recurrence_model, features),
+                    (self._get_class_probabilities, self.cleaning_model, features),
+                    (self._get_day_count_predictions, features),
+                ]
+            )
+            return PredictionResult(recurrence, cleaning, *day_counts)
+        return PredictionResult(
+            *self._run_concurrently(
+                [
+                    (self._get_class_probabilities, self.recurrence_model, features),
+                    (self._get_class_probabilities, self.cleaning_model, features),
+                    (self._get_time_predictions, features),
+                    (
+                        self._get_regressor_predictions,
+                        self.recurrence_window_regressor,
+                        features,
+                    ),
+                    (
+                        self._get_regressor_predictions,
+                        self.resolution_time_regressor,
+                        features,
+                    ),
+                ]
+            )
+        )
+
+    def _get_class_probabilities(self, model, features):
+        proba = model.predict_proba(features)
+        # Gradient boosting keeps two columns even when it saw one class.
+        if len(model.classes_) == 1:
+            single_class = model.classes_[0]
+            if single_class == 1:
+                return np.ones(len(features))
+            else:
+                return np.zeros(len(features))
+        else:
+            return proba[:, 1]
+
+    def _get_time_predictions(self, features):
+        try:
+            return self.time_regressor.predict(features)
+        except Exception:
+            return [None] * len(features)
+
+    @staticmethod
+    def _get_regressor_predictions(regressor, features):
+        """Safely predict from a regressor, returning None on failure."""
+        try:
+            return regressor.predict(features)
+        except Exception:
+            return [None] * len(features)
+
+
+def write_prediction_fields(requests, columns) -> List[dict]:
+    """Write row-aligned *columns* into each request's record.
+
+    Returns the mutated records.
+    """
+    field_names = list(columns)
+    for request, values in zip(requests, zip(*columns.values())):
+        request.record.update(zip(field_names, values))
+    return [request.record for request in requests]
+
+
+def model_schema() -> Dict[str, object]:
+    """Feature layout a saved model is fitted on, stored in its file."""
+    return {
+        "feature_schema_version": FEATURE_SCHEMA_VERSION,
+        "feature_columns": MODEL_FEATURE_COLUMNS,
+        "borough_codebook": BOROUGH_CODEBOOK,
+        "status_codebook": STATUS_CODEBOOK,
+    }
+
+
+def check_model_schema(payload: Dict[str, object], path: str, sharded: bool = False):
+    """Raise ``ValueError`` unless *payload* matches :func:`model_schema`.
+
+    A sharded model file is only accepted where *sharded* is set, and
+    the other way round.
+    """
+    if bool(payload.get("sharded")) != sharded:
+        raise ValueError(
+            f"Saved model {path} is {'' if payload.get('sharded') else 'not '}sharded"
+        )
+    for key, value in model_schema().items():
+        if payload.get(key) != value:
+            raise ValueError(
+                f"Saved model {path} has {key}={payload.get(key)!r}, "
+                f"expected {value!r}"
+            )
+
+
+def training_row_hashes(features, targets: TrainingTargets) -> np.ndarray:
+    """Hash each training row from its stable features and its targets.
+
+    Date-relative and neighborhood columns are left out, so a row
+    only hashes differently once its own data or its outcome actually
+    changes.
+    """
+    matrix = FeatureMatrix.of(features)
+    stable_columns = [
+        matrix.values[:, position]
+        for position, column in enumerate(matrix.columns)
+        if column not in DATE_RELATIVE_COLUMNS and column not in NEIGHBORHOOD_COLUMNS
+    ]
+    return combine_hashes(
+        [*stable_columns, *(column.to_numpy() for column in targets)], len(matrix)
+    )
+
+
+def combine_hashes(columns, row_count: int) -> np.ndarray:
+    """One 64-bit hash per row of equally long column arrays.
+
+    Columns are hashed one at a time, so no row-wise copy is made.
+    """
+    row_hashes = np.zeros(row_count, dtype=np.uint64)
+    for values in columns:
+        row_hashes = row_hashes * _HASH_MULTIPLIER ^ pandas.util.hash_array(values)
+    return row_hashes
+
+
+def stratified_rows(
+    targets: TrainingTargets,
+    max_rows: int,
+    rows: Optional[np.ndarray] = None,
+    seed: int = 42,
+) -> Optional[np.ndarray]:
+    """At most *max_rows* of *rows* (default all), sorted, as positions.
+
+    Rows are sampled within each recurrence and cleaning label pair in
+    proportion to its share, so a capped training set keeps the class
+    balance of the full one.  Returns *rows* unchanged when no cap is
+    set (``max_rows=0``) or the rows already fit.
+    """
+    positions = np.arange(len(targets.recurrence)) if rows is None else rows
+    if not max_rows or len(positions) <= max_rows:
+        return rows
+    labels = np.column_stack(
+        [
+            targets.recurrence.to_numpy(dtype=np.int64)[positions],
+            targets.cleaning.to_numpy(dtype=np.int64)[positions],
+        ]
+    )
+    _, strata = np.unique(labels, axis=0, return_inverse=True)
+    strata = strata.ravel()
+    shares = np.bincount(strata) * max_rows / len(positions)
+    quotas = np.floor(shares).astype(np.int64)
+    # Hand the rows lost to rounding to the largest remainders.
+    remainder_order = np.argsort(quotas - shares, kind="stable")
+    quotas[remainder_order[: max_rows - quotas.sum()]] += 1
+    generator = np.random.default_rng(seed)
+    sampled = [
+        generator.choice(positions[strata == stratum], size=quota, replace=False)
+        for stratum, quota in enumerate(quotas)
+    ]
+    return np.sort(np.concatenate(sampled))
+
+
+def _known_rows(targets: pandas.Series, rows: Optional[np.ndarray]):
+    """Positions of *rows* (default all) with a known target.
+
+    ``None`` means every row, so callers can fit on the shared matrix
+    without selecting rows.
+    """
+    known = targets.notnull().to_numpy()
+    if rows is not None:
+        return rows[known[rows]]
+    return None if known.all() else np.flatnonzero(known)
+
+
+def _parse_dates(values) -> Tuple[np.ndarray, np.ndarray]:
+    """Epoch days of ``YYYY-MM-DD`` strings, and which ones parsed.
+
+    Each distinct string is parsed once with ``strptime``, so exactly
+    the strings the scalar helpers accept are accepted here.
+    """
+    codes, unique_values = pandas.factorize(
+        pandas.Series(values, dtype=object), use_na_sentinel=False
+    )
+    unique_days = np.zeros(len(unique_values), dtype=np.int64)
+    unique_parsed = np.zeros(len(unique_values), dtype=bool)
+    for position, value in enumerate(unique_values):
+        try:
+            parsed_date = datetime.datetime.strptime(value, "%Y-%m-%d")
+        except (TypeError, ValueError):
+            continue
+        unique_days[position] = parsed_date.toordinal() - _EPOCH_ORDINAL
+        unique_parsed[position] = True
+    return unique_days[codes], unique_parsed[codes]
+
+
+def _format_days(days: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """``YYYY-MM-DD`` strings for valid epoch days, ``"Unknown"`` elsewhere.
+
+    Days past 9999-12-31 cannot be represented and become ``"Unknown"``.
+    """
+    valid = valid & (days <= _MAX_EPOCH_DAY)
+    formatted = np.full(len(days), "Unknown", dtype=object)
+    unique_days, inverse = np.unique(days[valid], return_inverse=True)
+    unique_strings = np.array(
+        [
+            datetime.date.fromordinal(day + _EPOCH_ORDINAL).strftime("%Y-%m-%d")
+            for day in unique_days.tolist()
+        ],
+        dtype=object,
+    )
+    formatted[valid] = unique_strings[inverse]
+    return formatted
+
+
+def _day_counts(values) -> np.ndarray:
+    """Float day counts, NaN wherever :func:`_is_valid_day_count` is False."""
+    if isinstance(values, np.ndarray) and values.dtype.kind in "biuf":
+        days = values.astype(float)
+    else:
+        # Lists may hold None where a regressor could not predict.
+        days = pandas.to_numeric(
+            pandas.Series(values, dtype=object), errors="coerce"
+        ).to_numpy(dtype=float)
+    return np.where(np.isfinite(days) & (days > 0), days, np.nan)
+
+
+def _rounded_day_counts(values) -> list:
+    """``round(float(value))`` for valid day counts, ``None`` otherwise."""
+    days = _day_counts(values)
+    rounded = np.full(len(days), None, dtype=object)
+    valid = ~np.isnan(days)
+    # rint rounds half to even, exactly like round(); huge values keep
+    # the scalar path so they do not overflow int64.
+    fits = valid & (days < 2**62)
+    rounded[fits] = np.rint(days[fits]).astype(np.int64).tolist()
+    rounded[valid & ~fits] = [round(day) for day in days[valid & ~fits].tolist()]
+    return rounded.tolist()
+
+
 def _is_valid_day_count(value) -> bool:
     """Return True if *value* is a positive, finite number."""
     if value is None:
@@ -0,0 +1,232 @@
+"""
+Packed Trees
+
+Flat NumPy copies of fitted scikit-learn tree ensembles, evaluated
+without scikit-learn.
+"""
+
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+LEAF = -1
+# Upper bound on (tree, row) pairs walked at once, to cap memory use.
+MAX_PAIRS_PER_CHUNK = 1_000_000
+
+
+@dataclass
+class PackedEnsemble:
+    """The nodes of every tree in one ensemble, concatenated.
+
+    Node ``i`` splits on ``feature[i]``: rows with a value at or below
+    ``threshold[i]`` go to ``left[i]``, the others to ``right[i]``, and
+    missing values follow ``missing_left[i]``.  Leaves have
+    ``left == -1`` and hold one output per column of ``value``.
+    ``roots`` is the first node of each tree.
+
+    Forests average the leaf values of their trees; boosting sums them
+    onto ``baseline`` and, for classifiers, applies the logistic link.
+    ``float32_inputs`` reproduces the float32 cast random forests make
+    before comparing against thresholds.
+    """
+
+    feature: np.ndarray
+    threshold: np.ndarray
+    left: np.ndarray
+    right: np.ndarray
+    missing_left: np.ndarray
+    value: np.ndarray
+    roots: np.ndarray
+    combine: str
+    baseline: np.ndarray
+    logistic: bool
+    float32_inputs: bool
+    classes: Optional[np.ndarray] = None
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(trees={len(self.roots)}, "
+            f"nodes={len(self.feature)}, combine={self.combine!r})"
+        )
+
+    @classmethod
+    def from_random_forest(cls, forest) -> "PackedEnsemble":
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        is_classifier = hasattr(forest, "classes_")
+        # Classifier leaves hold class fractions, regressor leaves one
+        # value per output.
+        values = [
+            tree.value[:, 0, :] if is_classifier else tree.value[:, :, 0]
+            for tree in trees
+        ]
+        return cls._concatenate(
+            [
+                (
+                    tree.feature,
+                    tree.threshold,
+                    tree.children_left,
+                    tree.children_right,
+                    tree.missing_go_to_left,
+                    value,
+                )
+                for tree, value in zip(trees, values)
+            ],
+            combine="mean",
+            baseline=np.zeros(values[0].shape[1]),
+            logistic=False,
+            float32_inputs=True,
+            classes=getattr(forest, "classes_", None),
+        )
+
+    @classmethod
+    def from_hist_gradient_boosting(cls, boosting) -> "PackedEnsemble":
+        trees = []
+        for (predictor,) in boosting._predictors:
+            nodes = predictor.nodes
+            if nodes["is_categorical"].any():
+                raise ValueError("Categorical splits cannot be packed")
+            is_leaf = nodes["is_leaf"].astype(bool)
+            trees.append(
+                (
+                    nodes["feature_idx"],
+                    nodes["num_threshold"],
+                    np.where(is_leaf, LEAF, nodes["left"].astype(np.int64)),
+                    np.where(is_leaf, LEAF, nodes["right"].astype(np.int64)),
+                    nodes["missing_go_to_left"],
+                    nodes["value"][:, np.newaxis],
+                )
+            )
+        return cls._concatenate(
+            trees,
+            combine="sum",
+            baseline=np.asarray(boosting._baseline_prediction, dtype=float).ravel(),
+            logistic=hasattr(boosting, "classes_"),
+            float32_inputs=False,
+            classes=getattr(boosting, "classes_", None),
+        )
+
+    @classmethod
+    def _concatenate(cls, trees, **options) -> "PackedEnsemble":
+        """Join per-tree node arrays, offsetting child links per tree."""
+        sizes = [len(tree[0]) for tree in trees]
+        roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int32)
+        features, thresholds, lefts, rights, missing_lefts, values = zip(*trees)
+
+        def links(children):
+            return np.concatenate(
+                [
+                    np.where(child == LEAF, LEAF, child + root)
+                    for child, root in zip(children, roots)
+                ]
+            ).astype(np.int32)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=links(lefts),
+            right=links(rights),
+            missing_left=np.concatenate(missing_lefts).astype(bool),
+            value=np.concatenate(values).astype(np.float64),
+            roots=roots,
+            **options,
+        )
+
+    def _leaves(self, inputs: np.ndarray, visit=None) -> np.ndarray:
+        """Leaf node reached by each (tree, row) pair, trees first.
+
+        *visit*, if given, is called at every level of the walk with
+        the row, node, and branch (True for left) of each split taken.
+        """
+        tree_count, row_count = len(self.roots), len(inputs)
+        nodes = np.repeat(self.roots, row_count)
+        rows = np.tile(np.arange(row_count), tree_count)
+        active = np.flatnonzero(self.left[nodes] != LEAF)
+        while len(active):
+            active_nodes = nodes[active]
+            values = inputs[rows[active], self.feature[active_nodes]]
+            go_left = np.where(
+                np.isnan(values),
+                self.missing_left[active_nodes],
+                values <= self.threshold[active_nodes],
+            )
+            if visit is not None:
+                visit(rows[active], active_nodes, go_left)
+            nodes[active] = np.where(
+                go_left, self.left[active_nodes], self.right[active_nodes]
+            )
+            active = active[self.left[nodes[active]] != LEAF]
+        return nodes
+
+    def _prepared(self, inputs: np.ndarray) -> np.ndarray:
+        inputs = np.asarray(inputs, dtype=np.float64)
+        if self.float32_inputs:
+            inputs = inputs.astype(np.float32).astype(np.float64)
+        return inputs
+
+    def split_range(
+        self, inputs: np.ndarray, feature: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Per row, the values of column *feature* that keep every path.
+
+        Returns ``(low, high)``: with its other columns unchanged, a row
+        whose *feature* value is above ``low`` and at most ``high``
+        reaches the same leaves, so gets the same output.  Rows missing
+        the value get NaN bounds, which no value is within.
+        """
+        inputs = self._prepared(inputs)
+        low = np.full(len(inputs), -np.inf)
+        high = np.full(len(inputs), np.inf)
+        chunk_rows = max(MAX_PAIRS_PER_CHUNK // len(self.roots), 1)
+        for start in range(0, len(inputs), chunk_rows):
+            chunk = slice(start, min(start + chunk_rows, len(inputs)))
+
+            def narrow(rows, nodes, go_left, start=start):
+                on_feature = self.feature[nodes] == feature
+                thresholds = self.threshold[nodes]
+                left = on_feature & go_left
+                np.minimum.at(high, rows[left] + start, thresholds[left])
+                right = on_feature & ~go_left
+                np.maximum.at(low, rows[right] + start, thresholds[right])
+
+            self._leaves(inputs[chunk], narrow)
+        missing = np.isnan(inputs[:, feature])
+        low[missing] = high[missing] = np.nan
+        return low, high
+
+    def predict(self, inputs: np.ndarray) -> np.ndarray:
+        """Ensemble output per row, shape ``(rows, outputs)``.
+
+        Classifiers return class probabilities, regressors predictions.
+        """
+        inputs = self._prepared(inputs)
+        tree_count, output_count = len(self.roots), self.value.shape[1]
+        outputs = np.empty((len(inputs), output_count))
+        chunk_rows = max(MAX_PAIRS_PER_CHUNK // tree_count, 1)
+        for start in range(0, len(inputs), chunk_rows):
+            rows = slice(start, min(start + chunk_rows, len(inputs)))
+            leaf_values = self.value[self._leaves(inputs[rows])].reshape(
+                tree_count, -1, output_count
+            )
+            if self.combine == "mean":
+                outputs[rows] = leaf_values.mean(axis=0)
+            else:
+                outputs[rows] = self.baseline + leaf_values.sum(axis=0)
+        if self.logistic:
+            positive = 1.0 / (1.0 + np.exp(-outputs[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        return outputs
+
+
+def split_range(
+    ensembles: Iterable[Optional[PackedEnsemble]], inputs: np.ndarray, feature: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """:meth:`PackedEnsemble.split_range` shared by every fitted ensemble."""
+    low = np.full(len(inputs), -np.inf)
+    high = np.full(len(inputs), np.inf)
+    for ensemble in ensembles:
+        if ensemble is not None:
+            ensemble_low, ensemble_high = ensemble.split_range(inputs, feature)
+            low = np.maximum(low, ensemble_low)
+            high = np.minimum(high, ensemble_high)
+    return low, high
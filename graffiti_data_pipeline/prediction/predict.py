@@ -5,76 +5,291 @@ This module orchestrates loading data, feature engineering, model training,
 and enrichment for graffiti recurrence prediction.
 """
 
+import argparse
+import os
+
+import numpy as np
+
 from graffiti_data_pipeline.storages import JsonFile
 from graffiti_data_pipeline.logger import get_logger
-from graffiti_data_pipeline.config import GRAFFITI_CLEANED_STATUS, GRAFFITI_LOOKUPS_FILE
-from graffiti_data_pipeline.prediction.request import GraffitiServiceRequest
-from graffiti_data_pipeline.prediction.features import extract_features
-from graffiti_data_pipeline.prediction.model import GraffitiPredictionModel
+from graffiti_data_pipeline.config import (
+    FEATURE_CACHE_FILE,
+    GRAFFITI_CLEANED_STATUS,
+    GRAFFITI_LOOKUPS_FILE,
+    GRAFFITI_MODEL_FILE,
+    GRAFFITI_PACKED_MODEL_FILE,
+    MODEL_MAX_TRAINING_ROWS,
+    MODEL_MAX_TREES,
+    MODEL_SHARDED,
+    MODEL_WARM_START_TREES,
+    PREDICTION_CACHE_FILE,
+    PREDICTION_SIDECAR,
+    PREDICTION_STORE_FILE,
+    PREDICTIONS_SIDECAR_FILE,
+)
+from graffiti_data_pipeline.prediction.feature_cache import FeatureCache
+from graffiti_data_pipeline.prediction.request import (
+    SOURCE_FINGERPRINT_FIELD,
+    GraffitiServiceRequest,
+    assign_location_ids,
+    today_epoch_day,
+)
+from graffiti_data_pipeline.prediction.features import (
+    MODEL_FEATURE_COLUMNS,
+    FeatureMatrix,
+    extract_features,
+)
+from graffiti_data_pipeline.prediction.inference import PackedPredictionModel
+from graffiti_data_pipeline.prediction.model import (
+    GraffitiPredictionModel,
+    TrainingTargets,
+    stratified_rows,
+    write_prediction_fields,
+)
+from graffiti_data_pipeline.prediction.prediction_cache import PredictionCache
+from graffiti_data_pipeline.prediction.sharding import ShardedPredictionModel
+from graffiti_data_pipeline.prediction.sidecar import PredictionSidecar, record_key
 
 logger = get_logger(__name__)
 
 
-def main():
+def create_model():
+    """A fresh model, sharded by borough when ``MODEL_SHARDED`` is set."""
+    return ShardedPredictionModel() if MODEL_SHARDED else GraffitiPredictionModel()
+
+
+def load_or_create_model(model_path: str):
+    """Load the saved model, or start a fresh one if it is missing or stale."""
+    if os.path.exists(model_path):
+        model_class = (
+            ShardedPredictionModel if MODEL_SHARDED else GraffitiPredictionModel
+        )
+        try:
+            return model_class.load(model_path)
+        except ValueError as exc:
+            logger.warning(f"Discarding saved model: {exc}")
+    return create_model()
+
+
+def pack_model(predictor):
+    """The NumPy-only copy of *predictor* used by prediction-only runs."""
+    if isinstance(predictor, ShardedPredictionModel):
+        return predictor.packed()
+    return PackedPredictionModel.from_model(predictor)
+
+
+def load_packed_model(model_path: str):
+    """Read the packed model; ``ValueError`` if it is stale or of another kind."""
+    if MODEL_SHARDED:
+        return ShardedPredictionModel.load(
+            model_path, member_class=PackedPredictionModel
+        )
+    return PackedPredictionModel.load(model_path)
+
+
+def update_model(predictor, feature_matrix, targets):
+    """Bring *predictor* up to date with the current training rows.
+
+    Warm-starts the saved forests with the rows they have not seen,
+    and refits from scratch when nothing is fitted yet or the forests
+    would grow past ``MODEL_MAX_TREES``.  Either way at most
+    ``MODEL_MAX_TRAINING_ROWS`` rows are used, sampled per label;
+    rows left out stay unseen and are picked up by later runs.
     """
-    Main entry point for graffiti recurrence prediction.
-    Loads data, engineers features, trains model, enriches and saves results.
+    feature_matrix = FeatureMatrix.of(feature_matrix)
+    if predictor.tree_count + MODEL_WARM_START_TREES > MODEL_MAX_TREES:
+        logger.info("Saved forests are at their size limit; retraining from scratch")
+        predictor = create_model()
+    if predictor.tree_count == 0:
+        rows = stratified_rows(targets, MODEL_MAX_TRAINING_ROWS)
+        row_count = len(feature_matrix) if rows is None else len(rows)
+        logger.info(f"Training on {row_count} of {len(feature_matrix)} rows...")
+        predictor.train(feature_matrix, targets, rows=rows)
+        return predictor
+
+    new_rows = np.flatnonzero(predictor.unseen_rows(feature_matrix, targets))
+    if len(new_rows) <= predictor.min_train_size:
+        logger.info(f"Skipping training: only {len(new_rows)} new rows")
+        return predictor
+    rows = stratified_rows(targets, MODEL_MAX_TRAINING_ROWS, rows=new_rows)
+    logger.info(f"Warm-starting on {len(rows)} of {len(new_rows)} new rows...")
+    predictor.warm_start(feature_matrix, targets, rows=rows)
+    return predictor
+
+
+def select_changed_requests(requests, fingerprints):
+    """Requests at every location holding a new or changed record.
+
+    A record is changed when its stored source fingerprint no longer
+    matches its data.  *fingerprints* are the stored ones, row-aligned
+    with *requests*.  Features depend on every request at the same
+    location, so the whole location is recomputed together.
     """
-    logger.info("Loading graffiti lookup data...")
-    graffiti_records = JsonFile(GRAFFITI_LOOKUPS_FILE).load()
-    graffiti_requests = [GraffitiServiceRequest(record) for record in graffiti_records]
+    changed_locations = {
+        request.location_id
+        for request, fingerprint in zip(requests, fingerprints)
+        if fingerprint != request.source_fingerprint()
+    }
+    return [request for request in requests if request.location_id in changed_locations]
 
-    logger.info("Engineering features...")
-    features = extract_features(graffiti_requests, [GRAFFITI_CLEANED_STATUS])
-    feature_matrix = features[
-        [
-            "days_since_last_tag",
-            "borough",
-            "total_tags",
-            "response_time",
-            "created_day_of_week",
-            "created_month",
-            "times_cleaned",
-            "resolution_velocity",
-            "latitude",
-            "longitude",
-            "status_code",
-        ]
+
+def prediction_store() -> PredictionSidecar:
+    """Where prediction fields and fingerprints are kept between runs.
+
+    The public sidecar with ``PREDICTION_SIDECAR``, otherwise
+    ``PREDICTION_STORE_FILE``; never the lookups records, which fetch
+    replaces with fresh ones every night.
+    """
+    if PREDICTION_SIDECAR:
+        return PredictionSidecar(PREDICTIONS_SIDECAR_FILE)
+    return PredictionSidecar(PREDICTION_STORE_FILE)
+
+
+def enrich_with_predictions(
+    predictor,
+    requests,
+    features,
+    prediction_cache: PredictionCache,
+    feature_matrix=None,
+    all_requests=None,
+):
+    """Predict for *requests* and write out the prediction fields.
+
+    *feature_matrix* is the model-column matrix of *features*, built
+    here when not given.  Rows whose inputs are unchanged for the same
+    model reuse their fields from *prediction_cache*.  The
+    fields go into the :func:`prediction_store`, which keeps only rows
+    of *all_requests* (default *requests*), and unless
+    ``PREDICTION_SIDECAR`` is set into each record as well.
+    """
+    if feature_matrix is None:
+        feature_matrix = FeatureMatrix.of(features[MODEL_FEATURE_COLUMNS])
+    columns = prediction_cache.prediction_columns(
+        predictor, requests, features, feature_matrix
+    )
+    columns[SOURCE_FINGERPRINT_FIELD] = [
+        request.source_fingerprint() for request in requests
     ]
-    recurrence_targets = features["tagged_again"]
-    cleaning_targets = features["cleaned"]
-    time_to_next_update_targets = features["time_to_next_update"]
-    recurrence_window_targets = features["recurrence_window"]
-    resolution_time_targets = features["resolution_time"]
-
-    predictor = GraffitiPredictionModel()
-    predictor.train_recurrence_classifier(feature_matrix, recurrence_targets)
-    predictor.train_cleaning_classifier(feature_matrix, cleaning_targets)
-    predictor.train_time_regressor(feature_matrix, time_to_next_update_targets)
-    predictor.train_recurrence_window_regressor(
-        feature_matrix, recurrence_window_targets
+    prediction_store().update(
+        [record_key(request.record) for request in requests],
+        columns,
+        [record_key(request.record) for request in all_requests or requests],
     )
-    predictor.train_resolution_time_regressor(feature_matrix, resolution_time_targets)
+    if not PREDICTION_SIDECAR:
+        write_prediction_fields(requests, columns)
+
+
+def train_and_predict(graffiti_requests, reference_day, prediction_cache):
+    """Update the saved model on every request, then predict for all of them."""
+    logger.info("Engineering features...")
+    features = FeatureCache(FEATURE_CACHE_FILE).extract(
+        graffiti_requests, [GRAFFITI_CLEANED_STATUS], reference_day
+    )
+    targets = TrainingTargets.from_features(features)
+    # One float32 matrix shared by every fit and by prediction.
+    feature_matrix = FeatureMatrix.of(features[MODEL_FEATURE_COLUMNS])
+
+    predictor = update_model(
+        load_or_create_model(GRAFFITI_MODEL_FILE), feature_matrix, targets
+    )
+    predictor.save(GRAFFITI_MODEL_FILE)
+    pack_model(predictor).save(GRAFFITI_PACKED_MODEL_FILE)
 
     logger.info("Making predictions and enriching data...")
-    (
-        recurrence_probabilities,
-        cleaning_probabilities,
-        time_predictions,
-        recurrence_window_predictions,
-        resolution_time_predictions,
-    ) = predictor.predict(feature_matrix)
-    enriched_data = predictor.enrich_requests(
+    enrich_with_predictions(
+        predictor, graffiti_requests, features, prediction_cache, feature_matrix
+    )
+
+
+def predict_changed(graffiti_requests, reference_day, prediction_cache) -> bool:
+    """Predict with the packed model for new or changed records only.
+
+    Every other record keeps its previous predictions, copied back
+    from the :func:`prediction_store` unless ``PREDICTION_SIDECAR``
+    is set.  Returns False,
+    without touching any record, when there is no usable saved model.
+    The packed model needs only NumPy, so scikit-learn is never imported.
+    """
+    if not os.path.exists(GRAFFITI_PACKED_MODEL_FILE):
+        logger.warning(f"No saved model at {GRAFFITI_PACKED_MODEL_FILE}")
+        return False
+    try:
+        predictor = load_packed_model(GRAFFITI_PACKED_MODEL_FILE)
+    except ValueError as exc:
+        logger.warning(f"Saved model is unusable: {exc}")
+        return False
+
+    stored = prediction_store().load()
+    stored_fields = [
+        stored.get(record_key(request.record), {}) for request in graffiti_requests
+    ]
+    changed_requests = select_changed_requests(
         graffiti_requests,
-        recurrence_probabilities,
-        cleaning_probabilities,
-        time_predictions,
-        recurrence_window_predictions,
-        resolution_time_predictions,
-        times_reported=features["times_reported"],
-        times_cleaned=features["times_cleaned"],
+        [fields.get(SOURCE_FINGERPRINT_FIELD) for fields in stored_fields],
+    )
+    if not PREDICTION_SIDECAR:
+        # Changed records are overwritten below.
+        for request, fields in zip(graffiti_requests, stored_fields):
+            request.record.update(fields)
+    logger.info(
+        f"Predicting {len(changed_requests)} of {len(graffiti_requests)} "
+        "records with new or changed data..."
     )
-    JsonFile(GRAFFITI_LOOKUPS_FILE).save(enriched_data)
+    if changed_requests:
+        features = extract_features(
+            changed_requests,
+            [GRAFFITI_CLEANED_STATUS],
+            reference_day,
+            neighborhood_requests=graffiti_requests,
+        )
+        enrich_with_predictions(
+            predictor,
+            changed_requests,
+            features,
+            prediction_cache,
+            all_requests=graffiti_requests,
+        )
+    return True
+
+
+def main(argv=None):
+    """
+    Main entry point for graffiti recurrence prediction.
+    Loads data, engineers features, updates the saved model, enriches and
+    saves results.  With ``--predict-only`` the saved model is used as is
+    and only new or changed records are re-predicted.  With
+    ``PREDICTION_SIDECAR`` results go to the sidecar file and the
+    lookups file is not rewritten.
+    """
+    parser = argparse.ArgumentParser(
+        description="Predict graffiti recurrence and cleaning for service requests."
+    )
+    parser.add_argument(
+        "--predict-only",
+        action="store_true",
+        help="Skip training and re-predict only new or changed records",
+    )
+    args = parser.parse_args(argv)
+
+    logger.info("Loading graffiti lookup data...")
+    graffiti_records = JsonFile(GRAFFITI_LOOKUPS_FILE).load()
+    graffiti_requests = [GraffitiServiceRequest(record) for record in graffiti_records]
+    assign_location_ids(graffiti_requests)
+
+    # One reference day for the whole run keeps every date-relative
+    # feature consistent, even across midnight.
+    reference_day = today_epoch_day()
+    prediction_cache = PredictionCache(PREDICTION_CACHE_FILE)
+    if not (
+        args.predict_only
+        and predict_changed(graffiti_requests, reference_day, prediction_cache)
+    ):
+        if args.predict_only:
+            logger.info("Falling back to a full training run")
+        train_and_predict(graffiti_requests, reference_day, prediction_cache)
+
+    if not PREDICTION_SIDECAR:
+        JsonFile(GRAFFITI_LOOKUPS_FILE).save(graffiti_records)
     logger.info("Prediction enrichment complete.")
 
 
@@ -0,0 +1,235 @@
+"""
+Prediction Cache
+
+Persists the prediction fields written into each record between runs,
+so rows whose model inputs are unchanged skip the forests entirely.
+Date-relative inputs are left out of the key; each cached row keeps
+instead the range of their values over which the model's splits send
+it down the same paths, so it stays cached from one night to the next
+until its age crosses one of them.
+"""
+
+import os
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas
+
+from graffiti_data_pipeline.logger import get_logger
+from graffiti_data_pipeline.prediction.features import (
+    DATE_RELATIVE_COLUMNS,
+    FeatureMatrix,
+)
+from graffiti_data_pipeline.prediction.model import combine_hashes
+from graffiti_data_pipeline.prediction.request import GraffitiServiceRequest
+
+logger = get_logger(__name__)
+
+
+def prediction_keys(
+    feature_matrix: FeatureMatrix,
+    requests: List[GraffitiServiceRequest],
+    times_reported,
+) -> np.ndarray:
+    """Cache key per row: every date-independent input of its fields.
+
+    That is the model feature row without :data:`DATE_RELATIVE_COLUMNS`
+    plus the record values the fields are derived from besides the
+    model outputs.  ``last_updated`` anchors the date-relative columns,
+    which :class:`PredictionCache` checks against the cached ranges.
+    """
+    return combine_hashes(
+        [
+            *(
+                values
+                for column, values in zip(
+                    feature_matrix.columns, feature_matrix.values.T
+                )
+                if column not in DATE_RELATIVE_COLUMNS
+            ),
+            np.array([request.last_updated for request in requests], dtype=object),
+            np.array([request.status for request in requests], dtype=object),
+            np.asarray(times_reported, dtype=np.int64),
+        ],
+        len(requests),
+    )
+
+
+class PredictionCache:
+    """Prediction fields from earlier runs, keyed by model version and row.
+
+    :meth:`prediction_columns` gives the fields ``enrich_requests``
+    would write, but only rows whose :func:`prediction_keys` key is not
+    cached for the model's version, or whose date-relative inputs left
+    the cached row's ``split_range``, go through the model; every other
+    row gets its cached fields.
+    The file only ever holds one model version: saving under a new
+    version replaces it, and saving under the same version adds to it,
+    so prediction-only runs over a few changed records keep the rest.
+    Models without a version are never cached.
+
+    Usage::
+
+        cache = PredictionCache("data/prediction-cache.joblib")
+        columns = cache.prediction_columns(
+            predictor, requests, features, feature_matrix
+        )
+    """
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(file_name={self.file_name!r}, "
+            f"hits={self.hits}, misses={self.misses})"
+        )
+
+    def load(self, version: Optional[str]):
+        """Sorted keys, matching field arrays, and date ranges.
+
+        Empty for another version.  The ranges map each date-relative
+        column to ``(low, high)`` arrays aligned with the keys.
+        """
+        empty = np.empty(0, dtype=np.uint64), {}, {}
+        if version is None or not os.path.exists(self.file_name):
+            return empty
+        payload = joblib.load(self.file_name)
+        if payload.get("version") != version or "ranges" not in payload:
+            logger.info(f"Discarding prediction cache {self.file_name}: model changed")
+            return empty
+        return payload["keys"], payload["fields"], payload["ranges"]
+
+    def save(self, version: str, keys, fields: Dict[str, np.ndarray], ranges):
+        """Write *fields* and *ranges* sorted by *keys*, first row per key."""
+        directory = os.path.dirname(self.file_name)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        sorted_keys, first_rows = np.unique(keys, return_index=True)
+        joblib.dump(
+            {
+                "version": version,
+                "keys": sorted_keys,
+                "fields": {
+                    field: values[first_rows] for field, values in fields.items()
+                },
+                "ranges": {
+                    column: (low[first_rows], high[first_rows])
+                    for column, (low, high) in ranges.items()
+                },
+            },
+            self.file_name,
+        )
+
+    def prediction_columns(
+        self,
+        predictor,
+        requests: List[GraffitiServiceRequest],
+        features: pandas.DataFrame,
+        feature_matrix: FeatureMatrix,
+    ) -> Dict[str, np.ndarray]:
+        """The ``enrichment_columns`` fields of every request, as object arrays.
+
+        *features* supplies ``times_reported`` and ``times_cleaned``
+        and *feature_matrix* the model inputs, both row-aligned with
+        *requests*.
+        """
+        times_reported = features["times_reported"].to_numpy()
+        times_cleaned = features["times_cleaned"].to_numpy()
+        version = predictor.version
+        date_columns = [
+            column
+            for column in DATE_RELATIVE_COLUMNS
+            if column in feature_matrix.columns
+        ]
+        date_values = {
+            column: feature_matrix.values[
+                :, feature_matrix.columns.index(column)
+            ].astype(np.float64)
+            for column in date_columns
+        }
+        keys = prediction_keys(feature_matrix, requests, times_reported)
+        cached_keys, cached_fields, cached_ranges = self.load(version)
+
+        if len(cached_keys):
+            cached_rows = np.minimum(
+                np.searchsorted(cached_keys, keys), len(cached_keys) - 1
+            )
+            hit = cached_keys[cached_rows] == keys
+            for column, values in date_values.items():
+                low, high = cached_ranges[column]
+                # NaN bounds or values compare False, so never hit.
+                hit &= (low[cached_rows] < values) & (values <= high[cached_rows])
+        else:
+            cached_rows = np.zeros(len(keys), dtype=np.int64)
+            hit = np.zeros(len(keys), dtype=bool)
+        hit_positions = np.flatnonzero(hit)
+        miss_positions = np.flatnonzero(~hit)
+
+        fields = {
+            field: np.empty(len(requests), dtype=object) for field in cached_fields
+        }
+        for field, values in cached_fields.items():
+            fields[field][hit_positions] = values[cached_rows[hit_positions]]
+        ranges = {
+            column: (np.empty(len(requests)), np.empty(len(requests)))
+            for column in date_columns
+        }
+        for column, (low, high) in ranges.items():
+            cached_low, cached_high = cached_ranges.get(column, (low, high))
+            low[hit_positions] = cached_low[cached_rows[hit_positions]]
+            high[hit_positions] = cached_high[cached_rows[hit_positions]]
+        if len(miss_positions):
+            miss_matrix = FeatureMatrix(
+                feature_matrix.rows(miss_positions), feature_matrix.columns
+            )
+            predictions = predictor.predict(miss_matrix)
+            computed = predictor.enrichment_columns(
+                [requests[position] for position in miss_positions],
+                *predictions,
+                times_reported=times_reported[miss_positions],
+                times_cleaned=times_cleaned[miss_positions],
+            )
+            for field, values in computed.items():
+                column = fields.setdefault(field, np.empty(len(requests), dtype=object))
+                column[miss_positions] = values
+            if version is not None:
+                for column, (low, high) in ranges.items():
+                    low[miss_positions], high[miss_positions] = predictor.split_range(
+                        miss_matrix, column
+                    )
+
+        self.hits += len(hit_positions)
+        self.misses += len(miss_positions)
+        logger.info(
+            f"Prediction cache hits: {len(hit_positions)}, "
+            f"misses: {len(miss_positions)}"
+        )
+
+        if version is not None:
+            # This run's rows go first so they win over stale cached
+            # rows with the same key but an outgrown date range.
+            self.save(
+                version,
+                np.concatenate([keys, cached_keys]),
+                {
+                    field: np.concatenate(
+                        [values, cached_fields.get(field, np.empty(0, dtype=object))]
+                    )
+                    for field, values in fields.items()
+                },
+                {
+                    column: tuple(
+                        np.concatenate([current, cached])
+                        for current, cached in zip(
+                            (low, high),
+                            cached_ranges.get(column, (np.empty(0), np.empty(0))),
+                        )
+                    )
+                    for column, (low, high) in ranges.items()
+                },
+            )
+        return fields
@@ -4,25 +4,91 @@ Graffiti Service Request Model
 Represents a single graffiti service request and provides methods to extract features.
 """
 
-from typing import List, Dict, Any
+import datetime
+import hashlib
+import json
+import sys
+from typing import List, Dict, Any, Optional
 import pandas
-from graffiti_data_pipeline.config import (
-    GRAFFITI_CLEANED_STATUS,
-    GRAFFITI_COMPLETE_STATUSES,
-    NYC_BOROUGHS,
+from graffiti_data_pipeline.config import NYC_BOROUGHS
+from graffiti_data_pipeline.locations import resolve_locations
+from graffiti_data_pipeline.prediction.timeline import (
+    RECENT_REPORT_WINDOWS,
+    AddressIndex,
+    timeline_at,
 )
 
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+# Record field holding the fingerprint of the data the stored predictions
+# were made from.
+SOURCE_FINGERPRINT_FIELD = "prediction_source"
+
+
+def to_epoch_day(value) -> int:
+    """Days since 1970-01-01 for a date string; any time of day is dropped.
+
+    ISO dates take a fast path; anything else is parsed by pandas.  The
+    day is the one written in the string, whatever its UTC offset.
+    """
+    try:
+        return datetime.date.fromisoformat(value).toordinal() - _EPOCH_ORDINAL
+    except (TypeError, ValueError):
+        timestamp = pandas.to_datetime(value)
+    if timestamp is None or pandas.isna(timestamp):
+        raise ValueError(f"Invalid date: {value!r}")
+    return timestamp.date().toordinal() - _EPOCH_ORDINAL
+
+
+def today_epoch_day() -> int:
+    """Days since 1970-01-01 for the current local date."""
+    return datetime.date.today().toordinal() - _EPOCH_ORDINAL
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
 
 class GraffitiServiceRequest:
+    """A service request with its dates parsed once into epoch days.
+
+    ``created`` and ``last_updated`` keep the original strings; the
+    getters work on the integer ``created_day`` and
+    ``last_updated_day`` so no date is parsed more than once.
+    Addresses and statuses are interned, since a handful of values
+    repeat across many requests.
+
+    History features group requests by ``location_id``, which starts
+    as the address; :func:`assign_location_ids` points spelling
+    variants of one address at the same location.
+    """
+
+    __slots__ = (
+        "record",
+        "address",
+        "location_id",
+        "last_updated",
+        "created",
+        "status",
+        "latitude",
+        "longitude",
+        "unique_key",
+        "created_day",
+        "last_updated_day",
+    )
+
     def __init__(self, record: Dict[str, Any]):
         self.record = record
-        self.address = record.get("address", "")
+        self.address = _intern(record.get("address", ""))
+        self.location_id = self.address
         self.last_updated = record.get("last_updated", "1970-01-01")
         self.created = record.get("created", "1970-01-01")
-        self.status = record.get("status", "unknown")
+        self.status = _intern(record.get("status", "unknown"))
         self.latitude = record.get("latitude", 0.0)
         self.longitude = record.get("longitude", 0.0)
         self.unique_key = record.get("unique_key", self.address)
+        self.created_day = to_epoch_day(self.created)
+        self.last_updated_day = to_epoch_day(self.last_updated)
 
     def __repr__(self) -> str:
         return (
@@ -30,125 +96,119 @@ class GraffitiServiceRequest:
             f"status={self.status!r}, created={self.created!r})"
         )
 
+    def source_fingerprint(self) -> str:
+        """Short hash of the fields the features are computed from."""
+        source = json.dumps(
+            [
+                self.address,
+                self.created,
+                self.last_updated,
+                self.status,
+                self.latitude,
+                self.longitude,
+                self.unique_key,
+            ],
+            default=str,
+        )
+        return hashlib.blake2b(source.encode(), digest_size=8).hexdigest()
+
     def get_borough(self) -> str:
+        """Borough named in the address text, "unknown" if none is.
+
+        When several appear, as in "12 QUEENS BLVD, Brooklyn", the last
+        one wins, since addresses end with their borough.
+        """
         address_lower = self.address.lower()
-        for borough in NYC_BOROUGHS:
-            if borough in address_lower:
-                return borough
-        return "unknown"
+        named = [borough for borough in NYC_BOROUGHS if borough in address_lower]
+        if not named:
+            return "unknown"
+        return max(named, key=address_lower.rfind)
 
     def get_last_tag_date(self) -> pandas.Timestamp:
-        return pandas.to_datetime(self.last_updated)
+        return pandas.Timestamp(self.last_updated_day, unit="D")
 
     def get_created_tag_date(self) -> pandas.Timestamp:
-        return pandas.to_datetime(self.created)
+        return pandas.Timestamp(self.created_day, unit="D")
 
-    def get_days_since_last_tag(self) -> int:
-        return (pandas.Timestamp.now() - self.get_last_tag_date()).days
+    def get_days_since_last_tag(self, reference_day: Optional[int] = None) -> int:
+        """Days from the last update to *reference_day* (default today)."""
+        if reference_day is None:
+            reference_day = today_epoch_day()
+        return reference_day - self.last_updated_day
 
     def get_response_time_days(self) -> int:
-        return (self.get_last_tag_date() - self.get_created_tag_date()).days
+        return self.last_updated_day - self.created_day
 
     def get_created_day_of_week(self) -> int:
         """Day of week the report was created (0=Monday, 6=Sunday)."""
-        return self.get_created_tag_date().dayofweek
+        # 1970-01-01 was a Thursday.
+        return (self.created_day + 3) % 7
 
     def get_created_month(self) -> int:
         """Month the report was created (1-12)."""
-        return self.get_created_tag_date().month
+        return datetime.date.fromordinal(self.created_day + _EPOCH_ORDINAL).month
 
-    def get_times_cleaned(
-        self, address_index: Dict[str, List["GraffitiServiceRequest"]]
-    ) -> int:
+    def get_times_cleaned(self, address_index: AddressIndex) -> int:
         """Count how many times this address was actually cleaned.
 
         Only counts requests with the specific cleaned status, not other
         complete statuses like 'No graffiti on property'.
         """
-        same_address = address_index.get(self.address, [])
-        return sum(1 for req in same_address if req.status == GRAFFITI_CLEANED_STATUS)
+        return timeline_at(address_index, self.location_id).cleaned_count
 
-    def get_resolution_velocity(
-        self, address_index: Dict[str, List["GraffitiServiceRequest"]]
-    ) -> Any:
+    def get_resolution_velocity(self, address_index: AddressIndex) -> Any:
         """Average days to resolve past completed requests at this address.
 
         Returns the mean resolution time (created→last_updated) across
         completed requests whose completion date is *before* this
         request's created date.  ``None`` if there is no prior history.
         """
-        created_date = self.get_created_tag_date()
-        same_address = address_index.get(self.address, [])
-        past_completed = [
-            req
-            for req in same_address
-            if req.status in GRAFFITI_COMPLETE_STATUSES
-            and pandas.to_datetime(req.last_updated) < created_date
-        ]
-        if not past_completed:
+        timeline = timeline_at(address_index, self.location_id)
+        past_count, total_days = timeline.completions_before(self.created_day)
+        if not past_count:
             return None
-        total_days = sum(
-            (
-                pandas.to_datetime(req.last_updated) - pandas.to_datetime(req.created)
-            ).days
-            for req in past_completed
+        return round(total_days / past_count)
+
+    def get_recent_report_count(self, address_index: AddressIndex, days: int) -> int:
+        """Reports at this address created in the *days* before this one."""
+        timeline = timeline_at(address_index, self.location_id)
+        return timeline.reports_between(self.created_day - days, self.created_day)
+
+    def get_decayed_report_rate(self, address_index: AddressIndex) -> float:
+        """Exponentially decayed rate of earlier reports at this address."""
+        return timeline_at(address_index, self.location_id).decayed_report_rate(
+            self.created_day
         )
-        return round(total_days / len(past_completed))
 
-    def get_recurrence_window(
-        self, address_index: Dict[str, List["GraffitiServiceRequest"]]
-    ) -> Any:
+    def get_recurrence_window(self, address_index: AddressIndex) -> Any:
         """Days until the next report at this address, or None.
 
         Unlike the binary ``tagged_again``, this gives a continuous
         target the regressor can learn from.
         """
-        created_date = self.get_created_tag_date()
-        same_address = address_index.get(self.address, [])
-        later_reports = [
-            req
-            for req in same_address
-            if pandas.to_datetime(req.created) > created_date
-        ]
-        if later_reports:
-            next_report = min(
-                later_reports, key=lambda x: pandas.to_datetime(x.created)
-            )
-            return (pandas.to_datetime(next_report.created) - created_date).days
-        return None
-
-    def get_resolution_time(
-        self, address_index: Dict[str, List["GraffitiServiceRequest"]]
-    ) -> Any:
+        timeline = timeline_at(address_index, self.location_id)
+        next_day = timeline.next_report_after(self.created_day)
+        if next_day is None:
+            return None
+        return next_day - self.created_day
+
+    def get_resolution_time(self, address_index: AddressIndex) -> Any:
         """Days from created to the first complete status at this address.
 
         Returns None if no request at this address has reached a
         complete status yet.
         """
-        same_address = address_index.get(self.address, [])
-        completed = [
-            req
-            for req in same_address
-            if req.status in GRAFFITI_COMPLETE_STATUSES
-            and pandas.to_datetime(req.last_updated) >= self.get_created_tag_date()
-        ]
-        if completed:
-            earliest = min(completed, key=lambda x: pandas.to_datetime(x.last_updated))
-            days = (
-                pandas.to_datetime(earliest.last_updated) - self.get_created_tag_date()
-            ).days
-            return max(days, 0)
-        return None
-
-    def get_tag_count_at_location(
-        self, address_index: Dict[str, List["GraffitiServiceRequest"]]
-    ) -> int:
+        timeline = timeline_at(address_index, self.location_id)
+        completion_day = timeline.first_completion_on_or_after(self.created_day)
+        if completion_day is None:
+            return None
+        return max(completion_day - self.created_day, 0)
+
+    def get_tag_count_at_location(self, address_index: AddressIndex) -> int:
         """Count requests at this address using a pre-built index."""
-        return len(address_index.get(self.address, []))
+        return len(address_index.get(self.location_id, []))
 
-    def get_tagged_again(
-        self, address_index: Dict[str, List["GraffitiServiceRequest"]]
-    ) -> int:
+    def get_tagged_again(self, address_index: AddressIndex) -> int:
         return 1 if self.get_tag_count_at_location(address_index) > 1 else 0
 
     def get_status_code(self, status_categories: Dict[str, int]) -> int:
@@ -160,31 +220,30 @@ class GraffitiServiceRequest:
         """Return 1 if the status contains any of the cleaned keywords."""
         return int(any(keyword in self.status for keyword in cleaned_keywords))
 
-    def get_time_to_next_update(
-        self, address_index: Dict[str, List["GraffitiServiceRequest"]]
-    ) -> Any:
+    def get_time_to_next_update(self, address_index: AddressIndex) -> Any:
         """Days until the next request at this address, or None."""
-        last_tag_date = self.get_last_tag_date()
-        same_address_requests = address_index.get(self.address, [])
-        next_updates = [
-            req
-            for req in same_address_requests
-            if pandas.to_datetime(req.created) > last_tag_date
-        ]
-        if next_updates:
-            next_update = min(next_updates, key=lambda x: pandas.to_datetime(x.created))
-            return (pandas.to_datetime(next_update.created) - last_tag_date).days
-        return None
+        timeline = timeline_at(address_index, self.location_id)
+        next_day = timeline.next_report_after(self.last_updated_day)
+        if next_day is None:
+            return None
+        return next_day - self.last_updated_day
 
     def to_feature_dict(
         self,
         status_categories: Dict[str, int],
         cleaned_keywords: List[str],
-        address_index: Dict[str, List["GraffitiServiceRequest"]],
+        address_index: AddressIndex,
+        reference_day: Optional[int] = None,
     ) -> Dict[str, Any]:
-        """Build a feature dictionary using a pre-built address index."""
+        """Build a feature dictionary using a pre-built address index.
+
+        Date-relative features are measured against *reference_day*
+        (epoch days, default today).
+        """
+        # Resolve the timeline once so every getter shares it.
+        address_index = {self.location_id: timeline_at(address_index, self.location_id)}
         return {
-            "days_since_last_tag": self.get_days_since_last_tag(),
+            "days_since_last_tag": self.get_days_since_last_tag(reference_day),
             "borough": self.get_borough(),
             "total_tags": self.get_tag_count_at_location(address_index),
             "response_time": self.get_response_time_days(),
@@ -193,6 +252,13 @@ class GraffitiServiceRequest:
             "times_reported": self.get_tag_count_at_location(address_index),
             "times_cleaned": self.get_times_cleaned(address_index),
             "resolution_velocity": self.get_resolution_velocity(address_index),
+            **{
+                f"reports_last_{days}d": self.get_recent_report_count(
+                    address_index, days
+                )
+                for days in RECENT_REPORT_WINDOWS
+            },
+            "decayed_report_rate": self.get_decayed_report_rate(address_index),
             "latitude": self.latitude,
             "longitude": self.longitude,
             "status_code": self.get_status_code(status_categories),
@@ -203,3 +269,19 @@ class GraffitiServiceRequest:
             "resolution_time": self.get_resolution_time(address_index),
             "index": self.unique_key,
         }
+
+
+def assign_location_ids(requests: List[GraffitiServiceRequest]):
+    """Give requests at spelling variants of one address the same location_id.
+
+    Modifies *requests* in place: each request's ``location_id`` is
+    overwritten and nothing is returned.  See
+    :func:`graffiti_data_pipeline.locations.resolve_locations`;
+    coordinates, where present, let variants in different words merge.
+    """
+    location_ids = resolve_locations(
+        [request.address for request in requests],
+        [(request.latitude, request.longitude) for request in requests],
+    )
+    for request, location_id in zip(requests, location_ids):
+        request.location_id = _intern(location_id)
@@ -0,0 +1,359 @@
+"""
+Local Inference Server
+
+Serves the packed prediction model over HTTP for ad-hoc scoring.  The
+model is loaded once, and concurrent requests are collected into
+micro-batches so each batch makes a single ``predict`` call.
+
+Usage::
+
+    python -m graffiti_data_pipeline.prediction.server --port 8765
+
+    curl -d '{"rows": [{"borough": 1, "total_tags": 3}]}' localhost:8765/predict
+    curl localhost:8765/metrics
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+import urllib.request
+from collections import deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from graffiti_data_pipeline.config import (
+    GRAFFITI_PACKED_MODEL_FILE,
+    INFERENCE_BATCH_WAIT_MS,
+    INFERENCE_MAX_BATCH_ROWS,
+    INFERENCE_SERVER_PORT,
+)
+from graffiti_data_pipeline.logger import get_logger
+from graffiti_data_pipeline.prediction.features import (
+    MODEL_FEATURE_COLUMNS,
+    FeatureMatrix,
+)
+from graffiti_data_pipeline.prediction.model import PredictionResult
+from graffiti_data_pipeline.prediction.predict import load_packed_model
+
+logger = get_logger(__name__)
+
+# Latencies kept for the percentiles reported by /metrics.
+LATENCY_WINDOW = 10_000
+
+
+def feature_rows(rows: List[Dict[str, object]]) -> np.ndarray:
+    """Float32 model inputs for JSON rows keyed by feature column.
+
+    Columns a row leaves out, or sets to null, are missing values.
+    Raises ``ValueError`` for a column the model does not use.
+    """
+    values = np.full((len(rows), len(MODEL_FEATURE_COLUMNS)), np.nan, np.float32)
+    for position, row in enumerate(rows):
+        unknown = set(row) - set(MODEL_FEATURE_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown feature columns {sorted(unknown)}")
+        for column_index, column in enumerate(MODEL_FEATURE_COLUMNS):
+            if row.get(column) is not None:
+                values[position, column_index] = row[column]
+    return values
+
+
+class LatencyMetrics:
+    """Request latencies and batch sizes, safe to update from any thread."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(requests={self.requests}, batches={self.batches})"
+        )
+
+    def record_batch(self, latencies: List[float]):
+        with self._lock:
+            self.latencies.extend(latencies)
+            self.requests += len(latencies)
+            self.batches += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        """Counts plus latency percentiles in milliseconds over the window."""
+        with self._lock:
+            latencies = np.array(self.latencies) * 1000
+            requests, batches = self.requests, self.batches
+        summary = {
+            "requests": requests,
+            "batches": batches,
+            "mean_requests_per_batch": requests / batches if batches else 0.0,
+        }
+        for name, percentile in [("p50", 50), ("p95", 95), ("p99", 99)]:
+            summary[f"{name}_ms"] = (
+                float(np.percentile(latencies, percentile)) if len(latencies) else 0.0
+            )
+        summary["max_ms"] = float(latencies.max()) if len(latencies) else 0.0
+        return summary
+
+
+@dataclass
+class PendingRequest:
+    """One client request waiting for its batch to be predicted."""
+
+    inputs: np.ndarray
+    submitted: float = field(default_factory=time.perf_counter)
+    done: threading.Event = field(default_factory=threading.Event)
+    predictions: Optional[List[Dict[str, object]]] = None
+    error: Optional[Exception] = None
+    latency: float = 0.0
+
+
+class MicroBatcher:
+    """Collects concurrent requests into one ``predict`` call per batch.
+
+    A single worker thread takes the first waiting request, then keeps
+    collecting until *max_batch_rows* rows are queued or *max_wait_ms*
+    has passed, predicts the stacked rows at once, and hands each
+    request its slice.  A lone request therefore waits at most
+    *max_wait_ms* longer than an unbatched call.
+    """
+
+    def __init__(
+        self,
+        model,
+        max_batch_rows: int = INFERENCE_MAX_BATCH_ROWS,
+        max_wait_ms: float = INFERENCE_BATCH_WAIT_MS,
+    ):
+        self.model = model
+        self.max_batch_rows = max_batch_rows
+        self.max_wait_ms = max_wait_ms
+        self.metrics = LatencyMetrics()
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(max_batch_rows={self.max_batch_rows}, "
+            f"max_wait_ms={self.max_wait_ms})"
+        )
+
+    def start(self):
+        self._worker.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._worker.join()
+
+    def submit(self, inputs: np.ndarray) -> PendingRequest:
+        """Queue *inputs* and block until their predictions are ready."""
+        pending = PendingRequest(inputs)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending
+
+    def _collect(self) -> List[PendingRequest]:
+        batch = [self._queue.get(timeout=0.1)]
+        rows = len(batch[0].inputs)
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while rows < self.max_batch_rows:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(pending)
+            rows += len(pending.inputs)
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                batch = self._collect()
+            except queue.Empty:
+                continue
+            self._predict(batch)
+
+    def _predict(self, batch: List[PendingRequest]):
+        try:
+            predictions = self.model.predict(
+                FeatureMatrix(
+                    np.concatenate([pending.inputs for pending in batch]),
+                    MODEL_FEATURE_COLUMNS,
+                )
+            )
+        except Exception as exc:
+            logger.exception("Batch prediction failed")
+            for pending in batch:
+                pending.error = exc
+                pending.done.set()
+            return
+        # Per-row dicts; unfitted regressors give None for every row.
+        rows = [
+            dict(zip(PredictionResult._fields, values))
+            for values in zip(
+                *(
+                    [None if value is None else float(value) for value in column]
+                    for column in predictions
+                )
+            )
+        ]
+        finished = time.perf_counter()
+        end = 0
+        for pending in batch:
+            start, end = end, end + len(pending.inputs)
+            pending.predictions = rows[start:end]
+            pending.latency = finished - pending.submitted
+        # Recorded before anyone is woken, so /metrics includes the batch.
+        self.metrics.record_batch([pending.latency for pending in batch])
+        for pending in batch:
+            pending.done.set()
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """``POST /predict`` scores rows; ``GET /metrics`` reports latencies."""
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        self._send_json(200, self.server.batcher.metrics.snapshot())
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            inputs = feature_rows(body["rows"])
+        except (KeyError, TypeError, ValueError) as exc:
+            self._send_json(400, {"error": str(exc)})
+            return
+        try:
+            pending = self.server.batcher.submit(inputs)
+        except Exception as exc:
+            self._send_json(500, {"error": str(exc)})
+            return
+        self._send_json(
+            200,
+            {
+                "predictions": pending.predictions,
+                "latency_ms": pending.latency * 1000,
+            },
+        )
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class InferenceServer(ThreadingHTTPServer):
+    """HTTP server answering each request on its own thread via *batcher*.
+
+    Usage::
+
+        server = InferenceServer(("127.0.0.1", 8765), MicroBatcher(model))
+        server.serve_forever()
+    """
+
+    daemon_threads = True
+    # Bursts of concurrent clients overflow the default backlog of 5.
+    request_queue_size = 128
+
+    def __init__(self, address, batcher: MicroBatcher):
+        super().__init__(address, InferenceRequestHandler)
+        self.batcher = batcher
+
+    def __repr__(self):
+        host, port = self.server_address[:2]
+        return f"{type(self).__name__}(address={host}:{port}, batcher={self.batcher})"
+
+    def serve_forever(self, poll_interval: float = 0.5):
+        self.batcher.start()
+        try:
+            super().serve_forever(poll_interval)
+        finally:
+            self.batcher.stop()
+
+
+class InferenceClient:
+    """Minimal client for a running :class:`InferenceServer`.
+
+    Usage::
+
+        client = InferenceClient("http://127.0.0.1:8765")
+        predictions = client.predict([{"borough": 1, "total_tags": 3}])
+    """
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def __repr__(self):
+        return f"{type(self).__name__}(url={self.url!r})"
+
+    def predict(self, rows: List[Dict[str, object]]) -> List[Dict[str, object]]:
+        """Prediction dicts for feature *rows*, in the same order."""
+        request = urllib.request.Request(
+            f"{self.url}/predict",
+            data=json.dumps({"rows": rows}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.load(response)["predictions"]
+
+    def metrics(self) -> Dict[str, object]:
+        with urllib.request.urlopen(
+            f"{self.url}/metrics", timeout=self.timeout
+        ) as response:
+            return json.load(response)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve graffiti predictions from the packed model over HTTP."
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=INFERENCE_SERVER_PORT)
+    parser.add_argument(
+        "--model-path",
+        type=str,
+        default=GRAFFITI_PACKED_MODEL_FILE,
+        help="Path of the packed model written by a training run",
+    )
+    parser.add_argument("--max-batch-rows", type=int, default=INFERENCE_MAX_BATCH_ROWS)
+    parser.add_argument("--max-wait-ms", type=float, default=INFERENCE_BATCH_WAIT_MS)
+    args = parser.parse_args(argv)
+
+    model = load_packed_model(args.model_path)
+    server = InferenceServer(
+        (args.host, args.port),
+        MicroBatcher(model, args.max_batch_rows, args.max_wait_ms),
+    )
+    logger.info(f"Serving {model} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
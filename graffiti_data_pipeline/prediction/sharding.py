@@ -0,0 +1,300 @@
+"""
+Per-Borough Model Sharding
+
+Trains one model set per borough next to a global model, and routes
+every prediction to its borough's shard.
+"""
+
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+import joblib
+import numpy as np
+
+from graffiti_data_pipeline.config import (
+    MODEL_N_JOBS,
+    MODEL_SHARD_MIN_ROWS,
+    MODEL_WARM_START_TREES,
+)
+from graffiti_data_pipeline.logger import get_logger
+from graffiti_data_pipeline.prediction.features import BOROUGH_CODEBOOK, FeatureMatrix
+from graffiti_data_pipeline.prediction.inference import PackedPredictionModel
+from graffiti_data_pipeline.prediction.model import (
+    GraffitiPredictionModel,
+    PredictionEnricher,
+    PredictionResult,
+    TrainingTargets,
+    check_model_schema,
+    model_schema,
+    split_job_budget,
+)
+
+logger = get_logger(__name__)
+
+# Feature column holding the borough code each row is routed by.
+SHARD_COLUMN = "borough"
+
+
+def _train_member(features: FeatureMatrix, targets: TrainingTargets, rows, n_jobs):
+    """Train one member model; runs in a worker process when parallel."""
+    model = GraffitiPredictionModel(n_jobs=n_jobs)
+    model.train(features, targets, rows=rows)
+    return model
+
+
+def _take_rows(features: FeatureMatrix, targets: TrainingTargets, rows):
+    """Copies of just *rows*, small enough to send to a worker process."""
+    return (
+        FeatureMatrix(features.rows(rows), features.columns),
+        TrainingTargets(
+            *(values.iloc[rows].reset_index(drop=True) for values in targets)
+        ),
+    )
+
+
+class ShardedPredictionModel(PredictionEnricher):
+    """A model set per borough, falling back to a global one.
+
+    Recurrence and response times differ a lot between boroughs, and
+    a forest fitted on one borough's rows is smaller and shallower than
+    a global one.  :meth:`train` fits a global model on every row plus
+    one model per borough with at least *min_shard_rows* rows; with an
+    *n_jobs* budget above 1 they are trained side by side in a process
+    pool, each member getting its share of the budget.  :meth:`predict`
+    sends each row to its borough's shard, and rows of boroughs without
+    one to the global model.
+
+    Members are :class:`GraffitiPredictionModel` instances, or
+    :class:`PackedPredictionModel` instances after :meth:`packed`.
+
+    Usage::
+
+        model = ShardedPredictionModel(min_shard_rows=5000, n_jobs=4)
+        model.train(features, targets)
+        predictions = model.predict(features)
+    """
+
+    def __init__(
+        self,
+        min_shard_rows: int = MODEL_SHARD_MIN_ROWS,
+        n_jobs=MODEL_N_JOBS,
+        global_model=None,
+        shards: Optional[Dict[int, object]] = None,
+    ):
+        self.min_shard_rows = min_shard_rows
+        self.n_jobs = n_jobs
+        self.global_model = (
+            GraffitiPredictionModel(n_jobs=n_jobs)
+            if global_model is None
+            else global_model
+        )
+        self.shards = shards or {}
+
+    def __repr__(self):
+        boroughs = [BOROUGH_CODEBOOK[code] for code in sorted(self.shards)]
+        return (
+            f"{type(self).__name__}(min_shard_rows={self.min_shard_rows}, "
+            f"n_jobs={self.n_jobs}, shards={boroughs})"
+        )
+
+    @property
+    def min_train_size(self) -> int:
+        return self.global_model.min_train_size
+
+    @property
+    def tree_count(self) -> int:
+        """Trees in the largest fitted forest of any member."""
+        return max(
+            member.tree_count for member in [self.global_model, *self.shards.values()]
+        )
+
+    @property
+    def version(self) -> Optional[str]:
+        """Fingerprint of every member's version; None if one has none."""
+        members = [
+            self.global_model,
+            *(self.shards[code] for code in sorted(self.shards)),
+        ]
+        versions = [member.version for member in members]
+        if None in versions:
+            return None
+        return hashlib.sha1(repr([sorted(self.shards), versions]).encode()).hexdigest()
+
+    def unseen_rows(self, features, targets: TrainingTargets) -> np.ndarray:
+        """Boolean mask of rows the global model was not trained on."""
+        return self.global_model.unseen_rows(features, targets)
+
+    @staticmethod
+    def _shard_codes(matrix: FeatureMatrix) -> np.ndarray:
+        return matrix.values[:, matrix.columns.index(SHARD_COLUMN)].astype(np.int64)
+
+    def _shard_rows(self, matrix: FeatureMatrix, rows) -> Dict[int, np.ndarray]:
+        """Training rows per borough that has enough of them for a shard."""
+        positions = np.arange(len(matrix)) if rows is None else rows
+        codes = self._shard_codes(matrix)[positions]
+        shard_rows = {}
+        for code, count in zip(*np.unique(codes, return_counts=True)):
+            if count >= self.min_shard_rows:
+                shard_rows[int(code)] = positions[codes == code]
+        return shard_rows
+
+    def train(
+        self,
+        features,
+        targets: TrainingTargets,
+        rows: Optional[np.ndarray] = None,
+    ):
+        """Train the global model and every borough shard."""
+        matrix = FeatureMatrix.of(features)
+        shard_rows = self._shard_rows(matrix, rows)
+        jobs = [rows, *shard_rows.values()]
+        workers, member_jobs = split_job_budget(self.n_jobs, len(jobs))
+        if workers == 1:
+            members = [
+                _train_member(matrix, targets, job_rows, jobs_per_member)
+                for job_rows, jobs_per_member in zip(jobs, member_jobs)
+            ]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(
+                        _train_member,
+                        *(
+                            (matrix, targets)
+                            if job_rows is None
+                            else _take_rows(matrix, targets, job_rows)
+                        ),
+                        None,
+                        jobs_per_member,
+                    )
+                    for job_rows, jobs_per_member in zip(jobs, member_jobs)
+                ]
+                members = [future.result() for future in futures]
+        self.global_model, *shard_models = members
+        self.shards = dict(zip(shard_rows, shard_models))
+        logger.info(
+            "Trained borough shards for "
+            f"{[BOROUGH_CODEBOOK[code] for code in sorted(self.shards)]}"
+        )
+
+    def warm_start(
+        self,
+        features,
+        targets: TrainingTargets,
+        additional_trees: int = MODEL_WARM_START_TREES,
+        rows: Optional[np.ndarray] = None,
+    ):
+        """Warm-start the global model and each shard on its new rows.
+
+        A borough that grows past ``min_shard_rows`` only gets its own
+        shard at the next full training run.
+        """
+        matrix = FeatureMatrix.of(features)
+        self.global_model.warm_start(matrix, targets, additional_trees, rows=rows)
+        positions = np.arange(len(matrix)) if rows is None else rows
+        codes = self._shard_codes(matrix)[positions]
+        for code, shard in self.shards.items():
+            shard_rows = positions[codes == code]
+            if len(shard_rows) > shard.min_train_size:
+                shard.warm_start(matrix, targets, additional_trees, rows=shard_rows)
+
+    def _member_rows(self, matrix: FeatureMatrix):
+        """``(rows, member)`` for the global model and each shard with rows."""
+        codes = self._shard_codes(matrix)
+        routed = np.isin(codes, list(self.shards))
+        parts = [(np.flatnonzero(~routed), self.global_model)] + [
+            (np.flatnonzero(codes == code), shard)
+            for code, shard in self.shards.items()
+        ]
+        return [(part_rows, member) for part_rows, member in parts if len(part_rows)]
+
+    def predict(self, features) -> PredictionResult:
+        """Predict every row with its borough's shard or the global model."""
+        matrix = FeatureMatrix.of(features)
+        columns = [[] for _ in PredictionResult._fields]
+        for part_rows, member in self._member_rows(matrix):
+            predictions = member.predict(
+                FeatureMatrix(matrix.rows(part_rows), matrix.columns)
+            )
+            for column, values in zip(columns, predictions):
+                column.append((part_rows, values))
+        return PredictionResult(*(_scatter(column, len(matrix)) for column in columns))
+
+    def split_range(self, features, column: str):
+        """Per row, the values of *column* that keep its member's predictions."""
+        matrix = FeatureMatrix.of(features)
+        low = np.empty(len(matrix))
+        high = np.empty(len(matrix))
+        for part_rows, member in self._member_rows(matrix):
+            low[part_rows], high[part_rows] = member.split_range(
+                FeatureMatrix(matrix.rows(part_rows), matrix.columns), column
+            )
+        return low, high
+
+    def packed(self) -> "ShardedPredictionModel":
+        """The same shards with every member packed for NumPy-only use."""
+        return type(self)(
+            min_shard_rows=self.min_shard_rows,
+            n_jobs=self.n_jobs,
+            global_model=PackedPredictionModel.from_model(self.global_model),
+            shards={
+                code: PackedPredictionModel.from_model(shard)
+                for code, shard in self.shards.items()
+            },
+        )
+
+    def save(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        payload = {
+            **model_schema(),
+            "sharded": True,
+            "min_shard_rows": self.min_shard_rows,
+            "global_model": self.global_model.to_payload(),
+            "shards": {code: shard.to_payload() for code, shard in self.shards.items()},
+        }
+        joblib.dump(payload, path)
+        logger.info(f"Saved sharded prediction model to {path}")
+
+    @classmethod
+    def load(
+        cls, path: str, member_class=GraffitiPredictionModel, **member_options
+    ) -> "ShardedPredictionModel":
+        """Read a model written by :meth:`save`; ``ValueError`` if stale.
+
+        *member_class* is the class every member was saved from, e.g.
+        :class:`PackedPredictionModel` for a :meth:`packed` model.
+        """
+        payload = joblib.load(path)
+        check_model_schema(payload, path, sharded=True)
+        model = cls(
+            min_shard_rows=payload["min_shard_rows"],
+            global_model=member_class.from_payload(
+                payload["global_model"], path, **member_options
+            ),
+            shards={
+                code: member_class.from_payload(shard, path, **member_options)
+                for code, shard in payload["shards"].items()
+            },
+            **member_options,
+        )
+        logger.info(f"Loaded sharded prediction model from {path}")
+        return model
+
+
+def _scatter(parts, row_count: int):
+    """Join ``(rows, values)`` parts back into one column in row order.
+
+    Stays a float array unless some member could not predict, in which
+    case the column is a list holding ``None`` for those rows.
+    """
+    if all(isinstance(values, np.ndarray) for _, values in parts):
+        column = np.empty(row_count)
+    else:
+        column = np.empty(row_count, dtype=object)
+    for rows, values in parts:
+        column[rows] = values
+    return column if column.dtype != object else list(column)
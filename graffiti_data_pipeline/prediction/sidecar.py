@@ -0,0 +1,145 @@
+"""
+Predictions Sidecar
+
+Keeps prediction fields in a separate columnar JSON file keyed by
+service request, so prediction runs leave the lookups file alone, and
+joins them back onto the records for consumers of the merged view.
+
+Usage::
+
+    python -m graffiti_data_pipeline.prediction.sidecar --output merged.json
+"""
+
+import argparse
+import json
+import os
+from typing import Dict, List
+
+from graffiti_data_pipeline.config import (
+    GRAFFITI_LOOKUPS_FILE,
+    PREDICTIONS_SIDECAR_FILE,
+)
+from graffiti_data_pipeline.logger import get_logger
+from graffiti_data_pipeline.prediction.request import GraffitiServiceRequest
+from graffiti_data_pipeline.storages import JsonFile
+
+logger = get_logger(__name__)
+
+KEY_FIELD = "service_request"
+
+
+def record_key(record: Dict[str, object]) -> str:
+    """The sidecar key of a lookups record; its unique key if unfetched."""
+    if KEY_FIELD in record:
+        return record[KEY_FIELD]
+    return GraffitiServiceRequest(record).unique_key
+
+
+class PredictionSidecar:
+    """Prediction columns keyed by ``service_request``, stored as JSON.
+
+    The file holds one list per field plus the key list, so field names
+    are written once instead of once per record.  :meth:`update` merges
+    new rows into it and :meth:`join` gives the merged record view.
+
+    Usage::
+
+        sidecar = PredictionSidecar("public/graffiti-predictions.json")
+        sidecar.update(keys, columns, current_keys)
+        merged = sidecar.join(records)
+    """
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+
+    def __repr__(self):
+        return f"{type(self).__name__}(file_name={self.file_name!r})"
+
+    def load(self) -> Dict[str, Dict[str, object]]:
+        """Fields per key; empty if there is no sidecar yet."""
+        if not os.path.exists(self.file_name):
+            return {}
+        with open(self.file_name) as file:
+            columns = json.load(file)
+        keys = columns.pop(KEY_FIELD)
+        field_names = list(columns)
+        return {
+            key: dict(zip(field_names, values))
+            for key, values in zip(keys, zip(*columns.values()))
+        }
+
+    def save(self, rows: Dict[str, Dict[str, object]]):
+        """Write *rows* (fields per key) as one column per field.
+
+        Every field of any row gets a column; rows without it hold None.
+        """
+        directory = os.path.dirname(self.file_name)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        field_names = list(
+            dict.fromkeys(field for fields in rows.values() for field in fields)
+        )
+        columns = {
+            KEY_FIELD: list(rows),
+            **{
+                field: [fields.get(field) for fields in rows.values()]
+                for field in field_names
+            },
+        }
+        with open(self.file_name, "w") as file:
+            json.dump(columns, file, separators=(",", ":"))
+
+    def update(
+        self, keys: List[str], columns: Dict[str, list], current_keys: List[str]
+    ):
+        """Replace the rows of *keys* with *columns*, keep other rows.
+
+        Rows whose key is not in *current_keys* are dropped, so records
+        that left the lookups file leave the sidecar too.
+        """
+        rows = self.load()
+        field_names = list(columns)
+        for key, values in zip(keys, zip(*columns.values())):
+            rows[key] = dict(zip(field_names, values))
+        current = set(current_keys)
+        self.save({key: fields for key, fields in rows.items() if key in current})
+        logger.info(f"Wrote predictions for {len(keys)} records to {self.file_name}")
+
+    def join(self, records: List[Dict[str, object]]) -> List[Dict[str, object]]:
+        """Copies of *records* with their prediction fields merged in.
+
+        Records without sidecar predictions are copied unchanged.
+        """
+        rows = self.load()
+        return [{**record, **rows.get(record_key(record), {})} for record in records]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Join the predictions sidecar onto the graffiti lookups."
+    )
+    parser.add_argument(
+        "--file-path",
+        type=str,
+        default=GRAFFITI_LOOKUPS_FILE,
+        help="Path of the graffiti lookups JSON file",
+    )
+    parser.add_argument(
+        "--sidecar-path",
+        type=str,
+        default=PREDICTIONS_SIDECAR_FILE,
+        help="Path of the predictions sidecar",
+    )
+    parser.add_argument(
+        "--output", type=str, required=True, help="Path of the merged JSON file"
+    )
+    args = parser.parse_args(argv)
+
+    records = JsonFile(args.file_path, default_data=[]).load()
+    merged = PredictionSidecar(args.sidecar_path).join(records)
+    JsonFile(args.output).save(merged)
+    logger.info(f"Joined predictions onto {len(merged)} records in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Spatial Neighborhood Features
+
+Counts the reports around each request with a grid index over
+latitude and longitude, so no pairwise distance matrix is ever built.
+"""
+
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from graffiti_data_pipeline.prediction.request import (
+    GraffitiServiceRequest,
+    today_epoch_day,
+)
+
+EARTH_RADIUS_METERS = 6_371_008.8
+NEARBY_RADII_METERS = (100, 250, 500)
+# Recent reports and the cleaned ratio are counted within this radius.
+NEIGHBORHOOD_RADIUS_METERS = 250
+RECENT_NEARBY_DAYS = 90
+# Grid cells are this fraction of the largest radius; smaller cells
+# cover the search circle more tightly at the cost of more lookups.
+CELLS_PER_RADIUS = 2
+# Upper bound on (query, candidate) pairs compared at once, to cap memory use.
+MAX_PAIRS_PER_CHUNK = 1_000_000
+
+NEIGHBORHOOD_COLUMNS = [
+    *(f"nearby_reports_{radius}m" for radius in NEARBY_RADII_METERS),
+    "recent_nearby_reports",
+    "nearby_cleaned_ratio",
+]
+
+
+class ReportPoints(NamedTuple):
+    """Location, creation day, and cleaned flag of each report."""
+
+    latitude: np.ndarray
+    longitude: np.ndarray
+    created_day: np.ndarray
+    cleaned: np.ndarray
+
+    @classmethod
+    def from_requests(
+        cls, requests: List[GraffitiServiceRequest], cleaned_status_keywords: List[str]
+    ) -> "ReportPoints":
+        cleaned_by_status = {
+            status: any(keyword in status for keyword in cleaned_status_keywords)
+            for status in {request.status for request in requests}
+        }
+        return cls(
+            latitude=_coordinates(request.latitude for request in requests),
+            longitude=_coordinates(request.longitude for request in requests),
+            created_day=np.fromiter(
+                (request.created_day for request in requests), np.int64, len(requests)
+            ),
+            cleaned=np.fromiter(
+                (cleaned_by_status[request.status] for request in requests),
+                bool,
+                len(requests),
+            ),
+        )
+
+    @property
+    def located(self) -> np.ndarray:
+        """Reports with usable coordinates; 0, 0 means never geocoded."""
+        return (
+            np.isfinite(self.latitude)
+            & np.isfinite(self.longitude)
+            & ~((self.latitude == 0) & (self.longitude == 0))
+        )
+
+
+def _coordinates(values) -> np.ndarray:
+    return np.array([np.nan if value is None else value for value in values], float)
+
+
+class RadiusGrid:
+    """Weighted locations bucketed into a latitude/longitude grid.
+
+    Cells are sized so that every location within *radius_meters* of a
+    query lies in the ``2 * CELLS_PER_RADIUS + 1`` cell rows around it;
+    within each row the candidate cells are adjacent, so one pair of
+    ``searchsorted`` calls finds them.  Candidates are then checked
+    with the exact haversine distance.
+
+    Usage::
+
+        grid = RadiusGrid(latitude, longitude, weights, radius_meters=500)
+        sums = grid.weighted_counts(query_latitude, query_longitude, [100, 500])
+    """
+
+    def __init__(
+        self,
+        latitude: np.ndarray,
+        longitude: np.ndarray,
+        weights: np.ndarray,
+        radius_meters: float,
+    ):
+        self.radius_meters = radius_meters
+        self.reach = CELLS_PER_RADIUS
+        angle = radius_meters / EARTH_RADIUS_METERS
+        self.latitude_step = np.degrees(angle) / self.reach
+        # Longitude degrees shrink towards the poles, so size cells for
+        # the highest latitude any neighbor can have.
+        highest = np.radians(
+            min(np.abs(latitude).max(initial=0) + np.degrees(angle), 89.0)
+        )
+        longitude_span = 2 * np.arcsin(min(np.sin(angle / 2) / np.cos(highest), 1.0))
+        self.longitude_step = np.degrees(longitude_span) / self.reach
+
+        rows, columns = self._cells(latitude, longitude)
+        self.first_row = rows.min(initial=0) - self.reach
+        self.first_column = columns.min(initial=0) - self.reach
+        # Padding keeps a row's neighbor columns from wrapping into the next row.
+        self.width = columns.max(initial=0) - self.first_column + self.reach + 1
+        keys = self._keys(rows, columns)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.latitude = np.radians(latitude[order])
+        self.longitude = np.radians(longitude[order])
+        self.cos_latitude = np.cos(self.latitude)
+        self.weights = weights[order]
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(locations={len(self.keys)}, "
+            f"radius_meters={self.radius_meters})"
+        )
+
+    def _cells(self, latitude, longitude):
+        return (
+            np.floor(latitude / self.latitude_step).astype(np.int64),
+            np.floor(longitude / self.longitude_step).astype(np.int64),
+        )
+
+    def _keys(self, rows, columns):
+        return (rows - self.first_row) * self.width + (columns - self.first_column)
+
+    def _candidate_ranges(self, latitude, longitude):
+        """``(starts, stops)`` of candidate slices, one column per cell row."""
+        rows, columns = self._cells(latitude, longitude)
+        # Queries outside the indexed area clip to its padded border,
+        # which holds no locations.
+        rows = np.clip(rows, self.first_row + self.reach, None)
+        columns = np.clip(
+            columns,
+            self.first_column + self.reach,
+            self.first_column + self.width - self.reach - 1,
+        )
+        offsets = np.arange(-self.reach, self.reach + 1)
+        row_keys = self._keys(rows[:, None] + offsets, columns[:, None])
+        starts = np.searchsorted(self.keys, row_keys - self.reach, side="left")
+        stops = np.searchsorted(self.keys, row_keys + self.reach, side="right")
+        return starts, stops
+
+    def weighted_counts(
+        self, latitude: np.ndarray, longitude: np.ndarray, radii_meters
+    ) -> np.ndarray:
+        """Sum of weights within each radius of each query location.
+
+        Returns an array of shape ``(queries, radii, weight columns)``;
+        *radii_meters* must be ascending and at most the grid's
+        *radius_meters*.
+        """
+        starts, stops = self._candidate_ranges(latitude, longitude)
+        lengths = stops - starts
+        per_query = lengths.sum(axis=1)
+        thresholds = (
+            np.sin(np.asarray(radii_meters, float) / EARTH_RADIUS_METERS / 2) ** 2
+        )
+        radius_count = len(thresholds)
+        query_latitude = np.radians(latitude)
+        query_longitude = np.radians(longitude)
+        query_cos_latitude = np.cos(query_latitude)
+        weight_count = self.weights.shape[1]
+        # Per query, the weights at each distance band; bands past the
+        # last radius are dropped.
+        band_sums = np.zeros((len(latitude), radius_count + 1, weight_count))
+
+        chunk_ends = np.searchsorted(
+            np.cumsum(per_query),
+            np.arange(MAX_PAIRS_PER_CHUNK, per_query.sum(), MAX_PAIRS_PER_CHUNK),
+        )
+        bounds = np.unique(np.concatenate([[0], chunk_ends + 1, [len(latitude)]]))
+        for first, last in zip(bounds[:-1], np.minimum(bounds[1:], len(latitude))):
+            chunk_lengths = lengths[first:last].ravel()
+            total = chunk_lengths.sum()
+            if not total:
+                continue
+            queries = np.repeat(
+                np.repeat(np.arange(first, last), lengths.shape[1]), chunk_lengths
+            )
+            range_starts = np.cumsum(chunk_lengths) - chunk_lengths
+            candidates = np.arange(total) + np.repeat(
+                starts[first:last].ravel() - range_starts, chunk_lengths
+            )
+            half_angle = (
+                np.sin((self.latitude[candidates] - query_latitude[queries]) / 2) ** 2
+                + query_cos_latitude[queries]
+                * self.cos_latitude[candidates]
+                * np.sin((self.longitude[candidates] - query_longitude[queries]) / 2)
+                ** 2
+            )
+            bands = np.searchsorted(thresholds, half_angle)
+            slots = (queries - first) * (radius_count + 1) + bands
+            for weight_index in range(weight_count):
+                band_sums[first:last, :, weight_index] = np.bincount(
+                    slots,
+                    weights=self.weights[candidates, weight_index],
+                    minlength=(last - first) * (radius_count + 1),
+                ).reshape(last - first, radius_count + 1)
+        return np.cumsum(band_sums[:, :radius_count], axis=1)
+
+
+def neighborhood_features(
+    queries: ReportPoints,
+    reports: ReportPoints,
+    reference_day: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """:data:`NEIGHBORHOOD_COLUMNS` for each of *queries* among *reports*.
+
+    Every query must itself be one of *reports*; it is left out of its
+    own counts.  ``nearby_reports_{r}m`` counts reports within ``r``
+    meters, ``recent_nearby_reports`` those within
+    :data:`NEIGHBORHOOD_RADIUS_METERS` created in the last
+    :data:`RECENT_NEARBY_DAYS` days before *reference_day* (default
+    today), and ``nearby_cleaned_ratio`` the share of reports within
+    that radius that were cleaned.  Queries without coordinates, and
+    ratios with no nearby reports, are NaN.
+
+    Reports at the same location are indexed once with their counts
+    as weights, so the cost depends on distinct locations.
+    """
+    if reference_day is None:
+        reference_day = today_epoch_day()
+    located = reports.located
+    age = reference_day - reports.created_day[located]
+    recent = (age >= 0) & (age < RECENT_NEARBY_DAYS)
+    # Distinct locations, found by sorting each point as one complex number.
+    locations, location_of = np.unique(
+        reports.latitude[located] + 1j * reports.longitude[located],
+        return_inverse=True,
+    )
+    location_weights = np.column_stack(
+        [
+            np.bincount(location_of, minlength=len(locations)),
+            np.bincount(location_of, weights=recent, minlength=len(locations)),
+            np.bincount(
+                location_of, weights=reports.cleaned[located], minlength=len(locations)
+            ),
+        ]
+    ).astype(float)
+    grid = RadiusGrid(
+        locations.real, locations.imag, location_weights, max(NEARBY_RADII_METERS)
+    )
+
+    query_located = queries.located
+    query_locations, query_location_of = np.unique(
+        queries.latitude[query_located] + 1j * queries.longitude[query_located],
+        return_inverse=True,
+    )
+    radii = sorted({*NEARBY_RADII_METERS, NEIGHBORHOOD_RADIUS_METERS})
+    sums = grid.weighted_counts(query_locations.real, query_locations.imag, radii)
+    sums = sums[query_location_of]
+
+    # Leave each query out of its own counts.
+    query_age = reference_day - queries.created_day[query_located]
+    own_weights = np.column_stack(
+        [
+            np.ones(len(query_age)),
+            (query_age >= 0) & (query_age < RECENT_NEARBY_DAYS),
+            queries.cleaned[query_located],
+        ]
+    )
+    sums -= own_weights[:, None, :]
+
+    neighborhood = radii.index(NEIGHBORHOOD_RADIUS_METERS)
+    nearby = sums[:, neighborhood, 0]
+    located_columns = {
+        **{
+            f"nearby_reports_{radius}m": sums[:, radii.index(radius), 0]
+            for radius in NEARBY_RADII_METERS
+        },
+        "recent_nearby_reports": sums[:, neighborhood, 1],
+        "nearby_cleaned_ratio": np.divide(
+            sums[:, neighborhood, 2],
+            nearby,
+            out=np.full(len(nearby), np.nan),
+            where=nearby > 0,
+        ),
+    }
+    columns = {}
+    for column, values in located_columns.items():
+        columns[column] = np.full(len(queries.latitude), np.nan)
+        columns[column][query_located] = values
+    return columns
@@ -0,0 +1,128 @@
+"""
+Spatial Feature Benchmark
+
+Times ``neighborhood_features`` on random reports spread over New York
+City at growing sizes, to show how the grid index scales.
+
+Usage::
+
+    python -m graffiti_data_pipeline.prediction.spatial_benchmark --sizes 1000000
+"""
+
+import argparse
+import time
+from typing import List, NamedTuple
+
+import numpy as np
+
+from graffiti_data_pipeline.logger import get_logger
+from graffiti_data_pipeline.prediction.spatial import (
+    ReportPoints,
+    neighborhood_features,
+)
+
+logger = get_logger(__name__)
+
+# Latitude and longitude bounds of the five boroughs.
+NYC_BOUNDS = ((40.50, 40.91), (-74.25, -73.70))
+REFERENCE_DAY = 20_000
+
+
+class SpatialBenchmarkReport(NamedTuple):
+    """Time to compute the neighborhood columns of *points* reports."""
+
+    points: int
+    locations: int
+    seconds: float
+    points_per_second: float
+    mean_nearby_500m: float
+
+
+def random_points(
+    count: int, reports_per_location: float = 4.0, seed: int = 0
+) -> ReportPoints:
+    """*count* reports over NYC, sharing locations as repeat reports do."""
+    generator = np.random.default_rng(seed)
+    location_count = max(1, int(count / reports_per_location))
+    (south, north), (west, east) = NYC_BOUNDS
+    latitude = generator.uniform(south, north, location_count)
+    longitude = generator.uniform(west, east, location_count)
+    location_of = generator.integers(0, location_count, count)
+    return ReportPoints(
+        latitude=latitude[location_of],
+        longitude=longitude[location_of],
+        created_day=REFERENCE_DAY - generator.integers(0, 730, count),
+        cleaned=generator.random(count) < 0.4,
+    )
+
+
+def benchmark_neighborhood(
+    sizes: List[int], reports_per_location: float = 4.0, seed: int = 0
+) -> List[SpatialBenchmarkReport]:
+    """One report per size, each on freshly generated points."""
+    reports = []
+    for size in sizes:
+        points = random_points(size, reports_per_location, seed)
+        started = time.perf_counter()
+        columns = neighborhood_features(points, points, REFERENCE_DAY)
+        seconds = time.perf_counter() - started
+        reports.append(
+            SpatialBenchmarkReport(
+                points=size,
+                locations=len(np.unique(points.latitude + 1j * points.longitude)),
+                seconds=seconds,
+                points_per_second=size / seconds,
+                mean_nearby_500m=float(columns["nearby_reports_500m"].mean()),
+            )
+        )
+    return reports
+
+
+def format_report(reports: List[SpatialBenchmarkReport]) -> str:
+    """Render reports as a fixed-width table, one row per size."""
+    rows = [SpatialBenchmarkReport._fields] + [
+        (
+            str(report.points),
+            str(report.locations),
+            f"{report.seconds:.3f}",
+            f"{report.points_per_second:.0f}",
+            f"{report.mean_nearby_500m:.1f}",
+        )
+        for report in reports
+    ]
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    return "\n".join(
+        "  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip()
+        for row in rows
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the spatial neighborhood features."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10_000, 100_000, 1_000_000],
+        help="Numbers of reports to benchmark",
+    )
+    parser.add_argument(
+        "--reports-per-location",
+        type=float,
+        default=4.0,
+        help="Average number of reports sharing one location",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = format_report(
+        benchmark_neighborhood(args.sizes, args.reports_per_location, args.seed)
+    )
+    logger.info(f"Neighborhood feature benchmark:\n{report}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Address Timelines
+
+Keeps the requests at each address pre-sorted by created day and by
+completion day so temporal questions are answered by ``searchsorted``,
+for one address or every row at once.
+"""
+
+import math
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas
+
+from graffiti_data_pipeline.config import (
+    GRAFFITI_CLEANED_STATUS,
+    GRAFFITI_COMPLETE_STATUSES,
+)
+
+# Earlier reports at the same address are counted over these many days
+# before each report.
+RECENT_REPORT_WINDOWS = (30, 90, 365)
+# Every earlier report adds to the report rate with a weight halving
+# over this many days.
+REPORT_RATE_HALF_LIFE_DAYS = 90
+REPORT_RATE_DECAY = math.log(2) / REPORT_RATE_HALF_LIFE_DAYS
+
+
+class GroupTimelines:
+    """Sorted histories of many addresses, queried for many rows at once.
+
+    *groups* numbers each request's address from 0.  Every day is
+    replaced by its rank among all days, and the key
+    ``group * span + rank`` keeps each address's events contiguous and
+    time-ordered, so one ``searchsorted`` over the sorted keys answers
+    a question for every row at once, in O(log n) per row.  Prefix
+    sums over completions hold their resolution days, and per-address
+    running sums over reports hold their decay weights.
+
+    Every query takes row-aligned arrays of groups and days.  Pass
+    *group_count* to query groups that have no requests.
+    """
+
+    def __init__(
+        self, groups, created, last_updated, completed, cleaned, group_count=None
+    ):
+        groups = np.asarray(groups, np.int64)
+        created = np.asarray(created, np.int64)
+        last_updated = np.asarray(last_updated, np.int64)
+        completed = np.asarray(completed, bool)
+        if group_count is None:
+            group_count = int(groups.max()) + 1 if len(groups) else 0
+
+        self.times = np.unique(np.concatenate([created, last_updated]))
+        self.span = len(self.times) + 1
+        # Rank of every day from the first to one past the last, so
+        # days are ranked by indexing rather than by searching.
+        self._first_time = int(self.times[0]) if len(self.times) else 0
+        last_time = int(self.times[-1]) if len(self.times) else -1
+        self._ranks = np.searchsorted(
+            self.times, np.arange(self._first_time, last_time + 2)
+        )
+        self.report_counts = np.bincount(groups, minlength=group_count)
+        self.cleaned_counts = np.bincount(
+            groups, weights=np.asarray(cleaned, float), minlength=group_count
+        ).astype(np.int64)
+
+        created_keys = self._keys(groups, created, "left")
+        created_order = np.argsort(created_keys, kind="stable")
+        self._created_keys = created_keys[created_order]
+        self._created_days = created[created_order]
+        # Where each group's events start in the sorted arrays, with
+        # the end as a last entry, so group g spans [g]:[g + 1].
+        self._created_offsets = np.searchsorted(
+            self._created_keys, np.arange(group_count + 1) * self.span
+        )
+        self._first_days = (
+            self._created_days[np.minimum(self._created_offsets[:-1], len(created) - 1)]
+            if len(created)
+            else np.zeros(group_count, np.int64)
+        )
+        # Weights are relative to each address's first report, so they
+        # stay finite; summing per address keeps other addresses out.
+        created_groups = groups[created_order]
+        weights = np.exp(
+            REPORT_RATE_DECAY * (self._created_days - self._first_days[created_groups])
+        )
+        self._decay_through = (
+            pandas.Series(weights).groupby(created_groups).cumsum().to_numpy()
+        )
+
+        completion_keys = self._keys(groups, last_updated, "left")[completed]
+        completion_order = np.argsort(completion_keys, kind="stable")
+        self._completion_keys = completion_keys[completion_order]
+        self._completion_days = last_updated[completed][completion_order]
+        self._completion_offsets = np.searchsorted(
+            self._completion_keys, np.arange(group_count + 1) * self.span
+        )
+        self._resolution_prefix = np.concatenate(
+            [[0], np.cumsum((last_updated - created)[completed][completion_order])]
+        )
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(groups={len(self.report_counts)}, "
+            f"reports={len(self._created_days)}, "
+            f"completions={len(self._completion_days)})"
+        )
+
+    @classmethod
+    def from_requests(cls, requests, groups, group_count=None) -> "GroupTimelines":
+        """Timelines of *requests*, at the addresses numbered by *groups*."""
+        return cls(
+            groups,
+            [request.created_day for request in requests],
+            [request.last_updated_day for request in requests],
+            [request.status in GRAFFITI_COMPLETE_STATUSES for request in requests],
+            [request.status == GRAFFITI_CLEANED_STATUS for request in requests],
+            group_count,
+        )
+
+    def _keys(self, groups, days, side):
+        """Keys sorting before every event on or after (``"left"``) or
+        strictly after (``"right"``) each of *days* in its group."""
+        offsets = np.asarray(days, np.int64) - self._first_time
+        if side == "right":
+            offsets = offsets + 1
+        ranks = self._ranks[np.clip(offsets, 0, len(self._ranks) - 1)]
+        return np.asarray(groups, np.int64) * self.span + ranks
+
+    def _first_event(self, sorted_keys, sorted_days, offsets, groups, days, side):
+        """Day of each group's first event at or after *days*, and whether
+        there is one (the day is arbitrary where there is not)."""
+        groups = np.asarray(groups, np.int64)
+        positions = np.searchsorted(sorted_keys, self._keys(groups, days, side))
+        found = positions < offsets[groups + 1]
+        if not len(sorted_days):
+            return np.zeros(len(positions), np.int64), found
+        return sorted_days[np.minimum(positions, len(sorted_days) - 1)], found
+
+    def next_report_after(self, groups, days):
+        """Created day of the first report strictly after each of *days*."""
+        return self._first_event(
+            self._created_keys,
+            self._created_days,
+            self._created_offsets,
+            groups,
+            days,
+            "right",
+        )
+
+    def first_completion_on_or_after(self, groups, days):
+        """Completion day of the first completion on or after each of *days*."""
+        return self._first_event(
+            self._completion_keys,
+            self._completion_days,
+            self._completion_offsets,
+            groups,
+            days,
+            "left",
+        )
+
+    def completions_before(self, groups, days):
+        """Count and total resolution days of completions strictly before *days*."""
+        positions = np.searchsorted(
+            self._completion_keys, self._keys(groups, days, "left")
+        )
+        starts = self._completion_offsets[np.asarray(groups, np.int64)]
+        return (
+            positions - starts,
+            self._resolution_prefix[positions] - self._resolution_prefix[starts],
+        )
+
+    def reports_between(self, groups, start_days, end_days):
+        """Number of reports created in ``[start_days, end_days)``."""
+        return np.searchsorted(
+            self._created_keys, self._keys(groups, end_days, "left")
+        ) - np.searchsorted(self._created_keys, self._keys(groups, start_days, "left"))
+
+    def decayed_report_rate(self, groups, days):
+        """Reports per day before each of *days*, each weighted down by its age.
+
+        A report ``a`` days old counts ``exp(-REPORT_RATE_DECAY * a)``,
+        and the sum is scaled by ``REPORT_RATE_DECAY`` so a steady rate
+        of reports converges to that rate.
+        """
+        groups = np.asarray(groups, np.int64)
+        days = np.asarray(days, np.int64)
+        positions = np.searchsorted(
+            self._created_keys, self._keys(groups, days, "left")
+        )
+        earlier = positions > self._created_offsets[groups]
+        if not len(self._decay_through):
+            return np.zeros(len(days))
+        weights_before = np.where(
+            earlier, self._decay_through[np.maximum(positions - 1, 0)], 0.0
+        )
+        first_days = self._first_days[groups] if len(self._first_days) else days
+        return (
+            REPORT_RATE_DECAY
+            * np.exp(-REPORT_RATE_DECAY * (days - first_days))
+            * weights_before
+        )
+
+
+class AddressTimeline:
+    """Sorted history of the service requests at a single address.
+
+    A one-address :class:`GroupTimelines`, so the row-wise getters ask
+    exactly the questions the vectorized features do, one day at a
+    time.  Iterating and ``len()`` behave like the plain request list.
+    """
+
+    __slots__ = ("requests", "_timelines")
+
+    _GROUP = np.zeros(1, np.int64)
+
+    def __init__(self, requests):
+        self.requests = list(requests)
+        self._timelines = GroupTimelines.from_requests(
+            self.requests, np.zeros(len(self.requests), np.int64), group_count=1
+        )
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(requests={len(self.requests)}, "
+            f"completions={len(self._timelines._completion_days)})"
+        )
+
+    def __len__(self):
+        return len(self.requests)
+
+    def __iter__(self):
+        return iter(self.requests)
+
+    @property
+    def cleaned_count(self) -> int:
+        """Number of requests that reached the cleaned status."""
+        return int(self._timelines.cleaned_counts.sum())
+
+    def next_report_after(self, day: int) -> Optional[int]:
+        """Created day of the first report strictly after *day*, or None."""
+        days, found = self._timelines.next_report_after(self._GROUP, [day])
+        return int(days[0]) if found[0] else None
+
+    def first_completion_on_or_after(self, day: int) -> Optional[int]:
+        """Completion day of the first completion on or after *day*, or None."""
+        days, found = self._timelines.first_completion_on_or_after(self._GROUP, [day])
+        return int(days[0]) if found[0] else None
+
+    def completions_before(self, day: int) -> Tuple[int, int]:
+        """Count and total resolution days of completions strictly before *day*."""
+        counts, totals = self._timelines.completions_before(self._GROUP, [day])
+        return int(counts[0]), int(totals[0])
+
+    def reports_between(self, start_day: int, end_day: int) -> int:
+        """Number of reports created in ``[start_day, end_day)``."""
+        return int(
+            self._timelines.reports_between(self._GROUP, [start_day], [end_day])[0]
+        )
+
+    def decayed_report_rate(self, day: int) -> float:
+        """Exponentially decayed rate of reports before *day*.
+
+        See :meth:`GroupTimelines.decayed_report_rate`.
+        """
+        return float(self._timelines.decayed_report_rate(self._GROUP, [day])[0])
+
+
+AddressIndex = Dict[str, AddressTimeline]
+
+
+def timeline_at(address_index, address) -> AddressTimeline:
+    """Timeline for *address*, building one if the index holds a plain list."""
+    entry = address_index.get(address, ())
+    if isinstance(entry, AddressTimeline):
+        return entry
+    return AddressTimeline(entry)
@@ -1,4 +1,5 @@
 from graffiti_data_pipeline.storages.json import JsonFile
+from graffiti_data_pipeline.storages.json_lines import JsonLinesFile
 from graffiti_data_pipeline.storages.google_sheets import GoogleSheet
 
-__all__ = ["JsonFile", "GoogleSheet"]
+__all__ = ["JsonFile", "JsonLinesFile", "GoogleSheet"]
@@ -0,0 +1,47 @@
+import json
+import os
+
+from graffiti_data_pipeline.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class JsonLinesFile:
+    """Append-only store with one JSON document per line.
+
+    Each :meth:`append` is flushed to disk immediately, so the file
+    survives an interrupted run and can be read back with :meth:`load`.
+    """
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+
+    def __repr__(self):
+        return f"{type(self).__name__}(file_name={self.file_name!r})"
+
+    def load(self):
+        if not os.path.exists(self.file_name):
+            return []
+
+        documents = []
+        with open(self.file_name) as file:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    documents.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A run killed mid-write leaves a truncated last line.
+                    logger.warning(
+                        f"Skipping unreadable line {line_number} in {self.file_name}"
+                    )
+        return documents
+
+    def append(self, document):
+        with open(self.file_name, "a") as file:
+            file.write(json.dumps(document) + "\n")
+            file.flush()
+
+    def clear(self):
+        if os.path.exists(self.file_name):
+            os.remove(self.file_name)
@@ -0,0 +1,227 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pytest
+
+from graffiti_data_pipeline.fetch.fetcher import ServiceRequestFetcher
+from graffiti_data_pipeline.storages import JsonLinesFile
+
+RECORD_HTML = """
+<div class="txtBox">
+  <table class="withBorder">
+    <tr><td>Service Request</td><td>G{id}</td></tr>
+    <tr><td>Address</td><td>{id} MAIN ST</td></tr>
+    <tr><td>Created</td><td>01/02/2026</td></tr>
+    <tr><td>Last Updated</td><td>01/03/2026</td></tr>
+    <tr><td>Status</td><td>Site to be cleaned.</td></tr>
+  </table>
+</div>
+"""
+
+
+class Stand311Handler(BaseHTTPRequestHandler):
+    """Serves lookup pages in the format of the NYC 311 site."""
+
+    def do_GET(self):
+        service_request_id = parse_qs(urlparse(self.path).query)["sr"][0]
+        self.server.hits.append(service_request_id)
+        failures_left = self.server.failures.get(service_request_id, 0)
+        if failures_left:
+            self.server.failures[service_request_id] = failures_left - 1
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = RECORD_HTML.format(id=service_request_id).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in_311():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Stand311Handler)
+    server.hits = []
+    server.failures = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    return JsonLinesFile(str(tmp_path / "checkpoint.jsonl"))
+
+
+async def no_sleep(seconds):
+    pass
+
+
+def make_fetcher(server, checkpoint, **kwargs):
+    host, port = server.server_address
+    fetcher = ServiceRequestFetcher.from_config(
+        checkpoint,
+        url=f"http://{host}:{port}/lookup?sr=",
+        backoff_seconds=0,
+        **kwargs,
+    )
+    return fetcher
+
+
+class TestServiceRequestFetcherAgainstStandIn311:
+    def test_fetches_all_records(self, stand_in_311, checkpoint):
+        fetcher = make_fetcher(stand_in_311, checkpoint, concurrency=3)
+
+        result = asyncio.run(fetcher.fetch_all(["G1", "G2", "G3", "G4"]))
+
+        assert list(result.records) == ["G1", "G2", "G3", "G4"]
+        assert result.records["G2"]["address"] == "2 MAIN ST"
+        assert result.records["G2"]["created"] == "2026-01-02"
+        assert result.failed_ids == []
+
+    def test_retries_server_errors(self, stand_in_311, checkpoint):
+        stand_in_311.failures["1"] = 2
+        fetcher = make_fetcher(stand_in_311, checkpoint, max_retries=3)
+
+        result = asyncio.run(fetcher.fetch_all(["G1"]))
+
+        assert "G1" in result.records
+        assert stand_in_311.hits.count("1") == 3
+
+    def test_gives_up_after_max_retries(self, stand_in_311, checkpoint):
+        stand_in_311.failures["1"] = 10
+        fetcher = make_fetcher(stand_in_311, checkpoint, max_retries=2)
+
+        result = asyncio.run(fetcher.fetch_all(["G1", "G2"]))
+
+        assert result.failed_ids == ["G1"]
+        assert list(result.records) == ["G2"]
+        assert stand_in_311.hits.count("1") == 3
+
+    def test_writes_each_record_to_checkpoint(self, stand_in_311, checkpoint):
+        fetcher = make_fetcher(stand_in_311, checkpoint)
+
+        asyncio.run(fetcher.fetch_all(["G1", "G2"]))
+
+        saved_ids = sorted(entry["id"] for entry in checkpoint.load())
+        assert saved_ids == ["G1", "G2"]
+
+    def test_resumes_from_checkpoint(self, stand_in_311, checkpoint):
+        checkpoint.append({"id": "G1", "record": {"service_request": "G1"}})
+        fetcher = make_fetcher(stand_in_311, checkpoint)
+
+        result = asyncio.run(fetcher.fetch_all(["G1", "G2"]))
+
+        assert stand_in_311.hits == ["2"]
+        assert result.records["G1"] == {"service_request": "G1"}
+
+
+class TestServiceRequestFetcher:
+    def test_rejects_non_positive_concurrency(self, checkpoint):
+        with pytest.raises(ValueError):
+            ServiceRequestFetcher(pytest.fail, checkpoint, concurrency=0)
+
+    def test_limits_lookups_in_flight(self, checkpoint):
+        in_flight = 0
+        peak_in_flight = 0
+
+        async def lookup_fn(service_request_id):
+            nonlocal in_flight, peak_in_flight
+            in_flight += 1
+            peak_in_flight = max(peak_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return {"service_request": service_request_id}
+
+        fetcher = ServiceRequestFetcher(lookup_fn, checkpoint, concurrency=2)
+        ids = [f"G{number}" for number in range(10)]
+
+        result = asyncio.run(fetcher.fetch_all(ids))
+
+        assert len(result.records) == 10
+        assert peak_in_flight == 2
+
+    def test_backs_off_exponentially(self, checkpoint):
+        delays = []
+
+        async def lookup_fn(service_request_id):
+            raise httpx.ConnectError("refused")
+
+        async def record_sleep(seconds):
+            delays.append(seconds)
+
+        fetcher = ServiceRequestFetcher(
+            lookup_fn,
+            checkpoint,
+            max_retries=3,
+            backoff_seconds=0.5,
+            sleep_fn=record_sleep,
+        )
+
+        result = asyncio.run(fetcher.fetch_all(["G1"]))
+
+        assert delays == [0.5, 1.0, 2.0]
+        assert result.failed_ids == ["G1"]
+
+    def test_does_not_retry_unparseable_records(self, checkpoint):
+        calls = []
+
+        async def lookup_fn(service_request_id):
+            calls.append(service_request_id)
+            raise TypeError("missing fields")
+
+        fetcher = ServiceRequestFetcher(lookup_fn, checkpoint, sleep_fn=no_sleep)
+
+        result = asyncio.run(fetcher.fetch_all(["G1"]))
+
+        assert calls == ["G1"]
+        assert result.failed_ids == ["G1"]
+
+    def test_retries_empty_responses(self, checkpoint):
+        responses = [{}, {"service_request": "G1"}]
+
+        async def lookup_fn(service_request_id):
+            return responses.pop(0)
+
+        fetcher = ServiceRequestFetcher(lookup_fn, checkpoint, sleep_fn=no_sleep)
+
+        result = asyncio.run(fetcher.fetch_all(["G1"]))
+
+        assert result.records == {"G1": {"service_request": "G1"}}
+
+    def test_closes_client_after_run(self, checkpoint):
+        closed = []
+
+        async def lookup_fn(service_request_id):
+            return {"service_request": service_request_id}
+
+        async def close_fn():
+            closed.append(True)
+
+        fetcher = ServiceRequestFetcher(lookup_fn, checkpoint, close_fn=close_fn)
+
+        asyncio.run(fetcher.fetch_all(["G1"]))
+
+        assert closed == [True]
+
+    def test_deduplicates_ids(self, checkpoint):
+        calls = []
+
+        async def lookup_fn(service_request_id):
+            calls.append(service_request_id)
+            return {"service_request": service_request_id}
+
+        fetcher = ServiceRequestFetcher(lookup_fn, checkpoint)
+
+        asyncio.run(fetcher.fetch_all(["G1", "G1", "G2"]))
+
+        assert sorted(calls) == ["G1", "G2"]
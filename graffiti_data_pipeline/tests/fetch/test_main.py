@@ -0,0 +1,57 @@
+from unittest.mock import patch
+
+from graffiti_data_pipeline.fetch.__main__ import main, merge_with_previous
+from graffiti_data_pipeline.fetch.fetcher import FetchResult
+from graffiti_data_pipeline.storages import JsonFile, JsonLinesFile
+
+
+class TestMergeWithPrevious:
+    def test_orders_records_by_requested_ids(self):
+        result = FetchResult(
+            {"G2": {"service_request": "G2"}, "G1": {"service_request": "G1"}}, []
+        )
+
+        merged = merge_with_previous(["G1", "G2"], result, [])
+
+        assert merged == [{"service_request": "G1"}, {"service_request": "G2"}]
+
+    def test_keeps_previous_record_for_failed_id(self):
+        previous = [{"service_request": "G1", "status": "old"}]
+        result = FetchResult({}, ["G1"])
+
+        merged = merge_with_previous(["G1"], result, previous)
+
+        assert merged == previous
+
+    def test_drops_failed_id_without_previous_record(self):
+        result = FetchResult({}, ["G1"])
+
+        assert merge_with_previous(["G1"], result, []) == []
+
+
+class TestMain:
+    @patch("graffiti_data_pipeline.fetch.__main__.ServiceRequestFetcher")
+    def test_saves_records_and_clears_checkpoint(self, mock_fetcher_cls, tmp_path):
+        lookups_path = str(tmp_path / "lookups.json")
+        checkpoint_path = str(tmp_path / "checkpoint.jsonl")
+        JsonLinesFile(checkpoint_path).append({"id": "G1", "record": {}})
+        fetcher = mock_fetcher_cls.from_config.return_value
+
+        async def fetch_all(service_request_ids):
+            return FetchResult({"G1": {"service_request": "G1"}}, [])
+
+        fetcher.fetch_all.side_effect = fetch_all
+
+        main(
+            [
+                "--ids",
+                "G1, ,",
+                "--file-path",
+                lookups_path,
+                "--checkpoint-path",
+                checkpoint_path,
+            ]
+        )
+
+        assert JsonFile(lookups_path).load() == [{"service_request": "G1"}]
+        assert JsonLinesFile(checkpoint_path).load() == []
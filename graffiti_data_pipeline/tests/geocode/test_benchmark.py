@@ -0,0 +1,176 @@
+from unittest.mock import patch
+
+import pytest
+from geopy.exc import GeocoderRateLimited, GeocoderUnavailable
+from geopy.extra.rate_limiter import RateLimiter
+
+from graffiti_data_pipeline.geocode import benchmark
+from graffiti_data_pipeline.geocode.benchmark import (
+    SimulatedGeocodingService,
+    VirtualClock,
+    VirtualRateLimiter,
+    benchmark_geocoding,
+    format_report,
+    service_requests,
+    warm_cache,
+)
+
+
+def run(count=200, cache_warmth=0.0, duplicate_ratio=0.0, **options):
+    options = {"failure_rate": 0.0, "max_requests_per_second": 0.0, **options}
+    return benchmark_geocoding(count, cache_warmth, duplicate_ratio, **options)
+
+
+class TestSimulatedGeocodingService:
+    def test_latency_advances_the_virtual_clock(self):
+        clock = VirtualClock()
+        service = SimulatedGeocodingService(
+            clock, failure_rate=0.0, max_requests_per_second=0.0, not_found_rate=0.0
+        )
+
+        location = service.geocode("123 MAIN ST, NY, USA")
+
+        assert clock.now == pytest.approx(service.busy_seconds)
+        assert clock.now > 0
+        assert location == service.geocode("123 MAIN ST, NY, USA")
+        assert location == service.coordinates_for("123 MAIN ST, NY, USA")
+
+    def test_calls_faster_than_the_rate_limit_get_a_429(self):
+        service = SimulatedGeocodingService(
+            VirtualClock(), failure_rate=0.0, max_requests_per_second=1.0
+        )
+        service.geocode("1 MAIN ST")
+
+        with pytest.raises(GeocoderRateLimited):
+            service.geocode("2 MAIN ST")
+        assert service.rate_limited == 1
+
+    def test_fails_at_the_failure_rate(self):
+        service = SimulatedGeocodingService(
+            VirtualClock(), failure_rate=1.0, max_requests_per_second=0.0
+        )
+
+        with pytest.raises(GeocoderUnavailable):
+            service.geocode("1 MAIN ST")
+
+
+class TestVirtualRateLimiter:
+    def test_sleeps_on_the_virtual_clock(self):
+        clock = VirtualClock()
+        limiter = VirtualRateLimiter(
+            lambda query: query, clock, min_delay_seconds=2.0, max_retries=0
+        )
+
+        with patch("time.sleep", pytest.fail):
+            results = [limiter(query) for query in ["first", "second", "third"]]
+
+        assert results == ["first", "second", "third"]
+        assert limiter.sleep_seconds == pytest.approx(4.0)
+        assert clock.now == pytest.approx(4.0)
+
+    def test_installed_geopy_has_the_overridden_hooks(self):
+        for name in benchmark.RATE_LIMITER_HOOKS:
+            assert callable(getattr(RateLimiter, name, None))
+
+    def test_refuses_a_geopy_without_the_hooks(self):
+        with patch.object(benchmark, "RATE_LIMITER_HOOKS", ("_clock", "_missing")):
+            with pytest.raises(RuntimeError, match="_missing"):
+                VirtualRateLimiter(lambda query: query, VirtualClock())
+
+    def test_retries_after_a_429(self):
+        clock = VirtualClock()
+        service = SimulatedGeocodingService(
+            clock, failure_rate=0.0, max_requests_per_second=0.5, not_found_rate=0.0
+        )
+        limiter = VirtualRateLimiter(
+            service.geocode,
+            clock,
+            min_delay_seconds=1.0,
+            max_retries=2,
+            error_wait_seconds=2.0,
+        )
+
+        assert limiter("1 MAIN ST") is not None
+        assert limiter("2 MAIN ST") is not None
+        assert service.rate_limited == 1
+        assert service.calls == 3
+
+
+class TestWorkload:
+    def test_duplicates_repeat_earlier_addresses(self):
+        records = service_requests(500, duplicate_ratio=0.8)
+
+        distinct = {record["address"] for record in records}
+        assert len(records) == 500
+        assert len(distinct) < 250
+        assert any(" STREET," in address for address in distinct)
+
+    def test_warm_cache_holds_a_share_of_the_addresses(self):
+        records = service_requests(500, duplicate_ratio=0.0)
+
+        cache = warm_cache(records, cache_warmth=0.5)
+
+        assert 150 < len(cache) < 350
+        assert set(cache) <= {record["address"] for record in records}
+
+
+class TestBenchmarkGeocoding:
+    def test_cold_cache_queries_every_address(self):
+        report = run(min_delay_seconds=1.0)
+
+        assert report.requests == 200
+        assert report.service_calls == 200
+        assert report.reused_share == 0.0
+        assert report.sleep_seconds > 0
+        # At least the minimum delay between each pair of calls.
+        assert report.requests / report.addresses_per_second >= 199.0
+
+    def test_warm_cache_answers_without_the_service(self):
+        report = run(cache_warmth=1.0)
+
+        assert report.service_calls == 0
+        assert report.geocoded == report.requests
+        assert report.reused_share == 1.0
+
+    def test_duplicates_reduce_service_calls(self):
+        unique = run()
+        duplicated = run(duplicate_ratio=0.8)
+
+        assert duplicated.service_calls < unique.service_calls / 2
+        assert duplicated.addresses_per_second > unique.addresses_per_second
+
+    def test_shorter_delay_raises_throughput_until_rate_limited(self):
+        reports = [
+            run(min_delay_seconds=delay, max_requests_per_second=1.0)
+            for delay in (2.0, 1.0, 0.1)
+        ]
+
+        assert reports[1].addresses_per_second > reports[0].addresses_per_second
+        assert reports[0].rate_limited == 0
+        assert reports[2].rate_limited > 0
+
+
+class TestMain:
+    def test_reports_every_scenario(self):
+        report = benchmark.main(
+            [
+                "--requests",
+                "50",
+                "--cache-warmth",
+                "0",
+                "0.5",
+                "--duplicate-ratio",
+                "0.2",
+            ]
+        )
+
+        lines = report.splitlines()
+        assert lines[0].split()[:3] == ["cache_warmth", "duplicate_ratio", "requests"]
+        assert len(lines) == 3
+
+    def test_format_report_aligns_columns(self):
+        text = format_report([run(count=20), run(count=20, cache_warmth=1.0)])
+
+        header, *rows = text.splitlines()
+        assert "addresses_per_second" in header
+        assert all(row.split()[2] == "20" for row in rows)
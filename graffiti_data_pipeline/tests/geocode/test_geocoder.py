@@ -63,6 +63,18 @@ class TestGeocoderGeocode:
         call_args = geocode_fn.call_args[0][0]
         assert "3RD STREET" in call_args
 
+    def test_from_config_exposes_the_rate_limiter(self):
+        geolocator = Mock()
+        rate_limiter = Mock()
+
+        geocoder = Geocoder.from_config(
+            geolocator=geolocator, rate_limiter=rate_limiter, min_delay_seconds=2.0
+        )
+
+        assert geocoder.geocode_fn is rate_limiter.return_value
+        assert rate_limiter.call_args.args == (geolocator.geocode,)
+        assert rate_limiter.call_args.kwargs["min_delay_seconds"] == 2.0
+
 
 class TestGeocodeServiceRequests:
     def test_returns_false_for_empty_list(self):
@@ -172,3 +184,57 @@ class TestGeocodeServiceRequests:
 
         assert result is False
         assert geocoder.cache["123 MAIN ST"] == existing_coords
+
+    def test_geocodes_spelling_variants_once(self):
+        location = Mock(latitude=40.7128, longitude=-74.0060)
+        geocode_fn = Mock(return_value=location)
+        geocoder = Geocoder(geocode_fn)
+        requests = [
+            {"address": "123 MAIN ST"},
+            {"address": "123 MAIN STREET"},
+            {"address": "123 Main St."},
+        ]
+
+        geocode_service_requests(requests, geocoder)
+
+        geocode_fn.assert_called_once()
+        assert all(request["latitude"] == 40.7128 for request in requests)
+
+    def test_reuses_coordinates_of_another_variant(self):
+        geocode_fn = Mock()
+        geocoder = Geocoder(geocode_fn, cache={"123 MAIN ST": (40.0, -73.0)})
+        requests = [
+            {"address": "123 MAIN STREET"},
+            {"address": "123 MAIN ST", "latitude": 40.0, "longitude": -73.0},
+        ]
+
+        geocode_service_requests(requests, geocoder)
+
+        geocode_fn.assert_not_called()
+        assert (requests[0]["latitude"], requests[0]["longitude"]) == (40.0, -73.0)
+
+    def test_similar_street_without_coordinates_is_geocoded_itself(self):
+        geocode_fn = Mock(return_value=Mock(latitude=41.0, longitude=-74.0))
+        geocoder = Geocoder(geocode_fn)
+        requests = [
+            {"address": "123 MAIN ST", "latitude": 40.0, "longitude": -73.0},
+            {"address": "123 MAINE ST"},
+        ]
+
+        geocode_service_requests(requests, geocoder)
+
+        geocode_fn.assert_called_once()
+        assert (requests[1]["latitude"], requests[1]["longitude"]) == (41.0, -74.0)
+
+    def test_ignores_variants_with_empty_coordinates(self):
+        geocode_fn = Mock(return_value=Mock(latitude=41.0, longitude=-74.0))
+        geocoder = Geocoder(geocode_fn)
+        requests = [
+            {"address": "123 MAIN STREET", "latitude": None, "longitude": None},
+            {"address": "123 MAIN ST"},
+        ]
+
+        geocode_service_requests(requests, geocoder)
+
+        geocode_fn.assert_called_once()
+        assert (requests[1]["latitude"], requests[1]["longitude"]) == (41.0, -74.0)
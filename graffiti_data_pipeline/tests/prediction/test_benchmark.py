@@ -0,0 +1,154 @@
+from unittest.mock import patch
+
+import pytest
+
+from graffiti_data_pipeline.config import NYC_BOROUGHS
+from graffiti_data_pipeline.locations import resolve_locations
+from graffiti_data_pipeline.prediction import benchmark
+from graffiti_data_pipeline.prediction.benchmark import (
+    BenchmarkResult,
+    Regression,
+    compare_to_baseline,
+    format_report,
+    hardware_profile,
+    load_baseline,
+    save_baseline,
+    spelling_variant,
+    synthetic_records,
+)
+
+
+class TestSyntheticRecords:
+    def test_is_seeded(self):
+        assert synthetic_records(200, seed=3) == synthetic_records(200, seed=3)
+        assert synthetic_records(200, seed=3) != synthetic_records(200, seed=4)
+
+    def test_records_look_like_lookups(self):
+        records = synthetic_records(3000)
+
+        addresses = [record["address"] for record in records]
+        assert len(set(addresses)) < len(records) / 2
+        assert all(
+            address.rsplit(", ", 1)[1].lower() in NYC_BOROUGHS for address in addresses
+        )
+        assert {record["status"] for record in records} >= set(benchmark.STATUS_SHARES)
+        assert all(record["last_updated"] >= record["created"] for record in records)
+        located = [record for record in records if "latitude" in record]
+        assert 0.9 * len(records) < len(located) < len(records)
+        assert all(40.3 < record["latitude"] < 41.1 for record in located)
+
+    def test_spelling_variants_resolve_to_their_address(self):
+        records = synthetic_records(3000)
+
+        addresses = [record["address"] for record in records]
+        respelled = [
+            address
+            for address in addresses
+            if "." in address or "STREET" in address or "AVENUE" in address
+        ]
+        assert len(respelled) > 0.1 * len(records)
+        assert len(set(resolve_locations(addresses))) < len(set(addresses))
+
+    @pytest.mark.parametrize(
+        "style, expected",
+        [(0, "12 EAST 3 STREET, Queens"), (1, "12 E 3 St., Queens")],
+    )
+    def test_spelling_variant_styles(self, style, expected):
+        assert spelling_variant("12 E 3 ST, Queens", style) == expected
+
+
+class TestBenchmarkSize:
+    def test_times_every_stage(self):
+        results = benchmark.run_benchmarks([300])
+
+        stages = [result.stage for result in results]
+        assert stages[:2] == ["assign_location_ids", "extract_features"]
+        assert "train_recurrence_classifier" in stages
+        assert stages[-2:] == ["predict", "enrich_requests"]
+        assert all(result.rows == 300 and result.seconds > 0 for result in results)
+        assert all(result.peak_megabytes >= 0 for result in results)
+
+    def test_memory_tracing_is_optional(self):
+        with patch.object(benchmark, "benchmark_size", return_value=[]) as run:
+            benchmark.run_benchmarks([20, 10], trace_memory=False)
+
+        assert [call.args[0] for call in run.call_args_list] == [10, 20]
+
+
+class TestBaseline:
+    def test_round_trips_through_json(self, tmp_path):
+        results = [BenchmarkResult("predict", 1000, 0.5, 1.25)]
+        path = str(tmp_path / "baseline" / "results.json")
+
+        save_baseline(results, path)
+
+        assert load_baseline(path) == results
+        assert load_baseline(str(tmp_path / "missing.json")) == []
+
+    def test_baseline_from_other_hardware_is_not_compared(self, tmp_path):
+        results = [BenchmarkResult("predict", 1000, 0.5, 1.25)]
+        path = str(tmp_path / "results.json")
+        other = {**hardware_profile(), "processor": "Another CPU"}
+
+        save_baseline(results, path, hardware=other)
+
+        assert load_baseline(path) == []
+        assert load_baseline(path, hardware=other) == results
+
+    @pytest.mark.parametrize(
+        "current, expected",
+        [
+            (BenchmarkResult("predict", 1000, 1.4, 10.0), []),
+            (
+                BenchmarkResult("predict", 1000, 2.0, 10.0),
+                [Regression("predict", 1000, "seconds", 1.0, 2.0)],
+            ),
+            (
+                BenchmarkResult("predict", 1000, 1.0, 40.0),
+                [Regression("predict", 1000, "peak_megabytes", 10.0, 40.0)],
+            ),
+            (BenchmarkResult("predict", 1000, 1.0, None), []),
+            (BenchmarkResult("predict", 5000, 9.0, 90.0), []),
+        ],
+    )
+    def test_compare_flags_slower_stages(self, current, expected):
+        baseline = [BenchmarkResult("predict", 1000, 1.0, 10.0)]
+
+        assert compare_to_baseline([current], baseline) == expected
+
+    def test_small_timings_have_slack(self):
+        baseline = [BenchmarkResult("predict", 1000, 0.001, None)]
+        current = [BenchmarkResult("predict", 1000, 0.01, None)]
+
+        assert compare_to_baseline(current, baseline) == []
+
+    def test_format_report_shows_baseline_seconds(self):
+        report = format_report(
+            [
+                BenchmarkResult("predict", 1000, 0.5, 1.25),
+                BenchmarkResult("predict", 2000, 1.5, None),
+            ],
+            [BenchmarkResult("predict", 1000, 0.25, 1.0)],
+        )
+
+        header, first, second = report.splitlines()
+        assert first.split() == ["predict", "1000", "0.500", "1.2", "0.250"]
+        assert second.split() == ["predict", "2000", "1.500", "n/a", "n/a"]
+
+
+class TestMain:
+    def test_saves_then_compares_baseline(self, tmp_path):
+        path = str(tmp_path / "baseline.json")
+        fast = [BenchmarkResult("predict", 100, 0.1, 1.0)]
+        slow = [BenchmarkResult("predict", 100, 1.0, 1.0)]
+
+        with patch.object(benchmark, "run_benchmarks", return_value=fast):
+            benchmark.main(
+                ["--sizes", "100", "--baseline-path", path, "--save-baseline"]
+            )
+            benchmark.main(["--sizes", "100", "--baseline-path", path])
+        with patch.object(benchmark, "run_benchmarks", return_value=slow):
+            with pytest.raises(SystemExit):
+                benchmark.main(["--sizes", "100", "--baseline-path", path])
+
+        assert load_baseline(path) == fast
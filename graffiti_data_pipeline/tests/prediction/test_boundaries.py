@@ -0,0 +1,182 @@
+import json
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from graffiti_data_pipeline.prediction import boundaries
+from graffiti_data_pipeline.prediction.boundaries import (
+    OUTSIDE,
+    BoundaryIndex,
+    load_boundary_index,
+)
+from graffiti_data_pipeline.storages import JsonFile
+
+SQUARE = np.array([[0, 0], [4, 0], [4, 4], [0, 4], [0, 0]], float)
+HOLE = np.array([[1, 1], [2, 1], [2, 2], [1, 2]], float)
+ISLAND = np.array([[6, 0], [8, 0], [7, 3]], float)
+
+
+def wobbly_ring(center_x, center_y, radius, vertices, seed):
+    generator = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    radii = radius * (1 + 0.3 * np.sin(5 * angles) + 0.05 * generator.random(vertices))
+    return np.column_stack(
+        [center_x + radii * np.cos(angles), center_y + radii * np.sin(angles)]
+    )
+
+
+def brute_force_locate(x, y, areas):
+    """Even-odd ray casting of every point against every edge."""
+    located = np.full(len(x), OUTSIDE)
+    for area, rings in enumerate(areas):
+        inside = np.zeros(len(x), dtype=bool)
+        for ring in rings:
+            x1, y1 = ring[:, 0][None, :], ring[:, 1][None, :]
+            x2, y2 = np.roll(x1, -1, axis=1), np.roll(y1, -1, axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                crosses = ((y1 > y[:, None]) != (y2 > y[:, None])) & (
+                    x[:, None] < x1 + (y[:, None] - y1) * (x2 - x1) / (y2 - y1)
+                )
+            inside ^= crosses.sum(axis=1) % 2 == 1
+        located[inside] = area
+    return located
+
+
+def write_geojson(path, features):
+    with open(path, "w") as file:
+        json.dump({"type": "FeatureCollection", "features": features}, file)
+
+
+class TestBoundaryIndex:
+    def test_holes_and_multi_polygons(self):
+        index = BoundaryIndex(["donut", "islands"], [[SQUARE, HOLE], [ISLAND]])
+
+        located = index.locate(
+            [0.5, 1.5, 3.5, 7.0, 5.0, np.nan], [0.5, 1.5, 3.5, 1.0, 1.0, 1.0]
+        )
+
+        assert list(located) == [0, OUTSIDE, 0, 1, OUTSIDE, OUTSIDE]
+
+    @pytest.mark.parametrize("grid_size", [4, 32])
+    def test_matches_brute_force(self, grid_size):
+        areas = [
+            [wobbly_ring(0, 0, 1.0, 400, seed=1), wobbly_ring(0, 0, 0.3, 50, seed=2)],
+            [wobbly_ring(2.5, 0.5, 1.0, 300, seed=3)],
+        ]
+        generator = np.random.default_rng(4)
+        x = generator.uniform(-1.6, 4.0, 3000)
+        y = generator.uniform(-1.6, 2.0, 3000)
+
+        index = BoundaryIndex(["west", "east"], areas, grid_size=grid_size)
+
+        np.testing.assert_array_equal(
+            index.locate(x, y), brute_force_locate(x, y, areas)
+        )
+
+    def test_small_chunks_match_brute_force(self):
+        areas = [[wobbly_ring(0, 0, 1.0, 400, seed=1)]]
+        generator = np.random.default_rng(5)
+        x, y = generator.uniform(-1.5, 1.5, (2, 500))
+        index = BoundaryIndex(["blob"], areas, grid_size=8)
+
+        with patch.object(boundaries, "MAX_PAIRS_PER_CHUNK", 20):
+            located = index.locate(x, y)
+
+        np.testing.assert_array_equal(located, brute_force_locate(x, y, areas))
+
+    def test_names_from_geojson(self, tmp_path):
+        path = str(tmp_path / "areas.geojson")
+        write_geojson(
+            path,
+            [
+                {
+                    "type": "Feature",
+                    "properties": {"name": "Donut"},
+                    "geometry": {
+                        "type": "Polygon",
+                        "coordinates": [SQUARE.tolist(), HOLE.tolist()],
+                    },
+                },
+                {
+                    "type": "Feature",
+                    "properties": {"name": "Islands"},
+                    "geometry": {
+                        "type": "MultiPolygon",
+                        "coordinates": [
+                            [ISLAND.tolist()],
+                            [(ISLAND + [0, 5]).tolist()],
+                        ],
+                    },
+                },
+                {
+                    "type": "Feature",
+                    "properties": {"name": "Landmark"},
+                    "geometry": {"type": "Point", "coordinates": [1, 1]},
+                },
+            ],
+        )
+
+        index = BoundaryIndex.from_geojson(path, "name")
+
+        assert index.names([0.5, 7.0, 7.0, 1.5], [0.5, 1.0, 6.0, 1.5]) == [
+            "Donut",
+            "Islands",
+            "Islands",
+            None,
+        ]
+
+
+class TestLoadBoundaryIndex:
+    def test_missing_file_has_no_index(self, tmp_path):
+        assert load_boundary_index(str(tmp_path / "missing.geojson"), "name") is None
+
+    def test_index_is_reused_until_the_file_changes(self, tmp_path):
+        path = str(tmp_path / "areas.geojson")
+        feature = {
+            "type": "Feature",
+            "properties": {"name": "Square"},
+            "geometry": {"type": "Polygon", "coordinates": [SQUARE.tolist()]},
+        }
+        write_geojson(path, [feature])
+
+        first = load_boundary_index(path, "name")
+
+        assert load_boundary_index(path, "name") is first
+
+
+class TestMain:
+    def test_writes_area_names_into_records(self, tmp_path):
+        boundaries_path = str(tmp_path / "areas.geojson")
+        lookups_path = str(tmp_path / "lookups.json")
+        write_geojson(
+            boundaries_path,
+            [
+                {
+                    "type": "Feature",
+                    "properties": {"ntaname": "Square"},
+                    "geometry": {"type": "Polygon", "coordinates": [SQUARE.tolist()]},
+                }
+            ],
+        )
+        JsonFile(lookups_path).save(
+            [
+                {"address": "1 A ST", "longitude": 1.0, "latitude": 1.0},
+                {"address": "2 B ST", "longitude": 9.0, "latitude": 9.0},
+                {"address": "3 C ST"},
+            ]
+        )
+
+        boundaries.main(
+            [
+                "--file-path",
+                lookups_path,
+                "--boundaries-path",
+                boundaries_path,
+                "--name-property",
+                "ntaname",
+            ]
+        )
+
+        records = JsonFile(lookups_path).load()
+        assert [record["neighborhood"] for record in records] == ["Square", None, None]
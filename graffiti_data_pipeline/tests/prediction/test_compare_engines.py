@@ -0,0 +1,93 @@
+from unittest.mock import patch
+
+import pandas
+
+from graffiti_data_pipeline.prediction import compare_engines
+from graffiti_data_pipeline.prediction.compare_engines import (
+    EngineReport,
+    format_report,
+)
+from graffiti_data_pipeline.prediction.model import TrainingTargets
+
+
+def build_training_data(row_count=60):
+    features = pandas.DataFrame(
+        {
+            "total_tags": [1 + number % 4 for number in range(row_count)],
+            "response_time": [number % 30 for number in range(row_count)],
+            "latitude": [40.5 + number / 100 for number in range(row_count)],
+        }
+    )
+    targets = TrainingTargets(
+        recurrence=pandas.Series([int(number % 4 > 0) for number in range(row_count)]),
+        cleaning=pandas.Series([number % 2 for number in range(row_count)]),
+        time_to_next_update=pandas.Series(
+            [float(number % 30) for number in range(row_count)]
+        ),
+        recurrence_window=pandas.Series(
+            [None if number % 2 else float(number) for number in range(row_count)]
+        ),
+        resolution_time=pandas.Series([None] * row_count, dtype=float),
+    )
+    return features, targets
+
+
+class TestCompareEngines:
+    def test_reports_every_engine(self):
+        features, targets = build_training_data()
+
+        reports = compare_engines.compare_engines(features, targets)
+
+        assert [report.engine for report in reports] == [
+            "random_forest",
+            "hist_gradient_boosting",
+        ]
+        for report in reports:
+            assert report.train_seconds > 0
+            assert report.predict_seconds > 0
+            assert 0 <= report.recurrence_accuracy <= 1
+            assert report.time_to_next_update_mae >= 0
+
+    def test_untrained_regressor_has_no_error(self):
+        features, targets = build_training_data()
+
+        reports = compare_engines.compare_engines(
+            features, targets, engines=["random_forest"]
+        )
+
+        assert reports[0].resolution_time_mae is None
+
+    def test_format_report_aligns_columns(self):
+        report = EngineReport("random_forest", 1.5, 0.25, 0.9, 0.8, 2.0, None, 3.0)
+
+        lines = format_report([report]).splitlines()
+
+        assert lines[0].startswith("engine")
+        assert lines[1].split() == [
+            "random_forest",
+            "1.500",
+            "0.250",
+            "0.900",
+            "0.800",
+            "2.000",
+            "n/a",
+            "3.000",
+        ]
+
+    @patch("graffiti_data_pipeline.prediction.compare_engines.JsonFile")
+    def test_main_compares_lookups(self, mock_jsonfile):
+        mock_jsonfile.return_value.load.return_value = [
+            {
+                "address": f"{number % 9} MAIN ST, Queens",
+                "created": f"2026-01-{1 + number % 28:02d}",
+                "last_updated": f"2026-02-{1 + number % 28:02d}",
+                "status": "Cleaned" if number % 3 else "Open",
+                "unique_key": f"request-{number}",
+            }
+            for number in range(60)
+        ]
+
+        report = compare_engines.main(["--engines", "hist_gradient_boosting"])
+
+        assert "hist_gradient_boosting" in report
+        assert "random_forest" not in report
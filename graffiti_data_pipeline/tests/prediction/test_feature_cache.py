@@ -0,0 +1,120 @@
+import pandas
+import pytest
+
+from graffiti_data_pipeline.config import (
+    GRAFFITI_CLEANED_STATUS,
+    GRAFFITI_SITE_TO_BE_CLEANED_STATUS,
+)
+from graffiti_data_pipeline.prediction.feature_cache import FeatureCache
+from graffiti_data_pipeline.prediction.features import extract_features
+from graffiti_data_pipeline.prediction.request import GraffitiServiceRequest
+
+KEYWORDS = [GRAFFITI_CLEANED_STATUS]
+REFERENCE_DAY = 20_500
+
+
+def build_records():
+    statuses = ["Open", GRAFFITI_CLEANED_STATUS, GRAFFITI_SITE_TO_BE_CLEANED_STATUS]
+    addresses = ["10 ELM ST, Bronx", "5 OAK AVE, Brooklyn", "7 PINE RD, Queens"]
+    return [
+        {
+            "address": addresses[number % len(addresses)],
+            "created": f"2025-01-{1 + number:02d}",
+            "last_updated": f"2025-02-{1 + number:02d}",
+            "status": statuses[(number * 2) % len(statuses)],
+            "latitude": 40.5 + number / 1000,
+            "longitude": -74.0 + number / 1000,
+            "unique_key": f"key-{number}",
+        }
+        for number in range(24)
+    ]
+
+
+def build_requests(records):
+    return [GraffitiServiceRequest(record) for record in records]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return FeatureCache(str(tmp_path / "feature-cache.joblib"))
+
+
+class TestFeatureCache:
+    def test_cold_cache_matches_extract_features(self, cache):
+        requests = build_requests(build_records())
+
+        actual = cache.extract(requests, KEYWORDS, REFERENCE_DAY)
+
+        expected = extract_features(requests, KEYWORDS, REFERENCE_DAY)
+        pandas.testing.assert_frame_equal(actual, expected)
+        assert cache.computed_rows == len(requests)
+
+    def test_unchanged_requests_reuse_every_row(self, cache):
+        requests = build_requests(build_records())
+        cache.extract(requests, KEYWORDS, REFERENCE_DAY)
+
+        warm_cache = FeatureCache(cache.file_name)
+        actual = warm_cache.extract(requests, KEYWORDS, REFERENCE_DAY)
+
+        expected = extract_features(requests, KEYWORDS, REFERENCE_DAY)
+        pandas.testing.assert_frame_equal(actual, expected)
+        assert warm_cache.reused_rows == len(requests)
+        assert warm_cache.computed_rows == 0
+
+    def test_only_changed_address_is_recomputed(self, cache):
+        records = build_records()
+        cache.extract(build_requests(records), KEYWORDS, REFERENCE_DAY)
+        records[0]["status"] = GRAFFITI_CLEANED_STATUS
+        requests = build_requests(records)
+
+        warm_cache = FeatureCache(cache.file_name)
+        actual = warm_cache.extract(requests, KEYWORDS, REFERENCE_DAY)
+
+        expected = extract_features(requests, KEYWORDS, REFERENCE_DAY)
+        pandas.testing.assert_frame_equal(actual, expected)
+        changed_address_rows = sum(
+            1 for record in records if record["address"] == records[0]["address"]
+        )
+        assert warm_cache.computed_rows == changed_address_rows
+
+    def test_reordered_requests_reuse_every_row(self, cache):
+        records = build_records()
+        cache.extract(build_requests(records), KEYWORDS, REFERENCE_DAY)
+        requests = build_requests(records[::-1])
+
+        warm_cache = FeatureCache(cache.file_name)
+        actual = warm_cache.extract(requests, KEYWORDS, REFERENCE_DAY)
+
+        expected = extract_features(requests, KEYWORDS, REFERENCE_DAY)
+        pandas.testing.assert_frame_equal(actual, expected)
+        assert warm_cache.computed_rows == 0
+
+    def test_later_reference_day_only_moves_date_relative_columns(self, cache):
+        requests = build_requests(build_records())
+        first = cache.extract(requests, KEYWORDS, REFERENCE_DAY)
+
+        later = FeatureCache(cache.file_name).extract(
+            requests, KEYWORDS, REFERENCE_DAY + 7
+        )
+
+        assert list(later["days_since_last_tag"]) == [
+            days + 7 for days in first["days_since_last_tag"]
+        ]
+        pandas.testing.assert_frame_equal(
+            later.drop(columns="days_since_last_tag"),
+            first.drop(columns="days_since_last_tag"),
+        )
+
+    def test_other_keywords_discard_cache(self, cache):
+        requests = build_requests(build_records())
+        cache.extract(requests, KEYWORDS, REFERENCE_DAY)
+
+        warm_cache = FeatureCache(cache.file_name)
+        actual = warm_cache.extract(requests, ["Open"], REFERENCE_DAY)
+
+        expected = extract_features(requests, ["Open"], REFERENCE_DAY)
+        pandas.testing.assert_frame_equal(actual, expected)
+        assert warm_cache.reused_rows == 0
+
+    def test_empty_requests(self, cache):
+        assert cache.extract([], KEYWORDS, REFERENCE_DAY).empty
@@ -1,6 +1,30 @@
+import json
+from unittest.mock import patch
+
+import numpy as np
+import pandas
 import pytest
-from graffiti_data_pipeline.prediction.features import extract_features
-from graffiti_data_pipeline.prediction.request import GraffitiServiceRequest
+from graffiti_data_pipeline.config import (
+    GRAFFITI_CLEANED_STATUS,
+    GRAFFITI_COMPLETE_STATUSES,
+    GRAFFITI_SITE_TO_BE_CLEANED_STATUS,
+)
+from graffiti_data_pipeline.prediction import features as features_module
+from graffiti_data_pipeline.prediction.features import (
+    BOROUGH_CODEBOOK,
+    OTHER_STATUS_CODE,
+    STATUS_CODEBOOK,
+    FeatureMatrix,
+    _build_address_index,
+    _build_status_categories,
+    borough_codes,
+    extract_features,
+    extract_request_features,
+)
+from graffiti_data_pipeline.prediction.request import (
+    GraffitiServiceRequest,
+    assign_location_ids,
+)
 
 
 class TestExtractFeatures:
@@ -107,3 +131,363 @@ class TestExtractFeatures:
     def test_extract_features_invalid_type(self):
         with pytest.raises(Exception):
             extract_features([123], ["cleaned"])
+
+
+def build_reference_features(requests, cleaned_status_keywords):
+    """Feature frame built one request at a time via to_feature_dict."""
+    status_categories = _build_status_categories(requests)
+    address_index = _build_address_index(requests)
+    features = pandas.DataFrame(
+        [
+            request.to_feature_dict(
+                status_categories, cleaned_status_keywords, address_index
+            )
+            for request in requests
+        ]
+    )
+    features["borough"] = pandas.Categorical(
+        features["borough"], categories=BOROUGH_CODEBOOK
+    ).codes
+    features["resolution_velocity"] = features["resolution_velocity"].fillna(-1)
+    return features
+
+
+class TestExtractFeaturesParity:
+    @pytest.fixture(autouse=True)
+    def no_borough_boundaries(self, tmp_path):
+        # to_feature_dict reads boroughs from the address text only.
+        with patch(
+            "graffiti_data_pipeline.prediction.features.BOROUGH_BOUNDARIES_FILE",
+            str(tmp_path / "missing.geojson"),
+        ):
+            yield
+
+    @pytest.fixture
+    def history_requests(self):
+        statuses = [
+            "Open",
+            GRAFFITI_CLEANED_STATUS,
+            GRAFFITI_SITE_TO_BE_CLEANED_STATUS,
+            "Cleaning crew dispatched. No graffiti on property.",
+            "CityOwnedIneligible",
+        ]
+        addresses = [
+            "10 ELM ST, Bronx",
+            "5 OAK AVE, Brooklyn",
+            "7 PINE RD, Queens",
+            "1 BROADWAY, Manhattan",
+            "99 BAY ST, Staten Island",
+            "3 NOWHERE LN",
+        ]
+        records = []
+        for number in range(120):
+            created_day = (number * 37) % 200
+            response_days = (number * 11) % 45
+            records.append(
+                {
+                    "address": addresses[(number * 7) % len(addresses)],
+                    "created": str(
+                        pandas.Timestamp("2025-01-01")
+                        + pandas.Timedelta(days=created_day)
+                    )[:10],
+                    "last_updated": str(
+                        pandas.Timestamp("2025-01-01")
+                        + pandas.Timedelta(days=created_day + response_days)
+                    )[:10],
+                    "status": statuses[(number * 3) % len(statuses)],
+                    "latitude": 40.5 + number / 1000,
+                    "longitude": -74.0 + number / 1000,
+                    "unique_key": f"key-{number}",
+                }
+            )
+        return [GraffitiServiceRequest(record) for record in records]
+
+    def test_matches_per_request_features(self, history_requests):
+        keywords = [GRAFFITI_CLEANED_STATUS]
+        expected = build_reference_features(history_requests, keywords)
+
+        actual = extract_request_features(history_requests, keywords)
+
+        pandas.testing.assert_frame_equal(actual, expected)
+
+    def test_matches_per_request_features_for_single_request(self):
+        request = GraffitiServiceRequest({"address": "789 UNKNOWN"})
+        expected = build_reference_features([request], ["cleaned"])
+
+        actual = extract_request_features([request], ["cleaned"])
+
+        pandas.testing.assert_frame_equal(actual, expected)
+
+    def test_matches_per_request_features_for_same_day_reports(self):
+        records = [
+            {
+                "address": "8 ASH LN, Bronx",
+                "created": "2026-01-01",
+                "last_updated": "2026-01-01",
+                "status": GRAFFITI_COMPLETE_STATUSES[0],
+            },
+            {
+                "address": "8 ASH LN, Bronx",
+                "created": "2026-01-01",
+                "last_updated": "2026-01-03",
+                "status": GRAFFITI_CLEANED_STATUS,
+            },
+            {
+                "address": "8 ASH LN, Bronx",
+                "created": "2026-01-03",
+                "last_updated": "2026-01-09",
+                "status": "Open",
+            },
+        ]
+        requests = [GraffitiServiceRequest(record) for record in records]
+        keywords = [GRAFFITI_CLEANED_STATUS]
+        expected = build_reference_features(requests, keywords)
+
+        actual = extract_request_features(requests, keywords)
+
+        pandas.testing.assert_frame_equal(actual, expected)
+
+    def test_parallel_partitions_match_serial(self, history_requests):
+        keywords = [GRAFFITI_CLEANED_STATUS]
+        expected = extract_features(history_requests, keywords, workers=1)
+
+        actual = extract_features(
+            history_requests, keywords, workers=3, parallel_min_requests=0
+        )
+
+        pandas.testing.assert_frame_equal(actual, expected)
+
+    def test_small_input_falls_back_to_serial(self, history_requests):
+        with patch(
+            "graffiti_data_pipeline.prediction.features._partitioned_address_history",
+            pytest.fail,
+        ):
+            extract_features(
+                history_requests,
+                [GRAFFITI_CLEANED_STATUS],
+                workers=4,
+                parallel_min_requests=len(history_requests) + 1,
+            )
+
+
+class TestRecentReportFeatures:
+    def test_windows_count_earlier_reports_at_the_address(self):
+        created_days = ["2025-01-01", "2025-09-15", "2025-12-01", "2025-12-20"]
+        requests = [
+            GraffitiServiceRequest(
+                {"address": "8 ASH LN, Bronx", "created": day, "last_updated": day}
+            )
+            for day in created_days
+        ] + [
+            GraffitiServiceRequest(
+                {
+                    "address": "9 ASH LN",
+                    "created": "2025-12-19",
+                    "last_updated": "2025-12-19",
+                }
+            )
+        ]
+
+        features = extract_features(requests, ["cleaned"])
+
+        assert list(features["reports_last_30d"]) == [0, 0, 0, 1, 0]
+        assert list(features["reports_last_90d"]) == [0, 0, 1, 1, 0]
+        assert list(features["reports_last_365d"]) == [0, 1, 2, 3, 0]
+        rates = features["decayed_report_rate"].to_numpy()
+        assert rates[0] == 0.0 and rates[4] == 0.0
+        assert rates[3] > rates[2] > rates[1] > 0
+
+    def test_parallel_partitions_match_serial(self):
+        requests = [
+            GraffitiServiceRequest(
+                {
+                    "address": f"{number % 9} ELM ST",
+                    "created": str(
+                        pandas.Timestamp("2025-01-01")
+                        + pandas.Timedelta(days=number * 13)
+                    )[:10],
+                }
+            )
+            for number in range(60)
+        ]
+        keywords = ["cleaned"]
+
+        expected = extract_features(requests, keywords, workers=1)
+        actual = extract_features(
+            requests, keywords, workers=2, parallel_min_requests=0
+        )
+
+        pandas.testing.assert_frame_equal(actual, expected)
+
+
+class TestLocationIds:
+    @pytest.fixture
+    def requests(self):
+        return [
+            GraffitiServiceRequest(
+                {"address": address, "created": created, "last_updated": created}
+            )
+            for address, created in [
+                ("8 ASH LN, Bronx", "2025-01-01"),
+                ("8 Ash Lane, Bronx", "2025-02-01"),
+                ("9 ASH LN, Bronx", "2025-03-01"),
+            ]
+        ]
+
+    def test_history_is_grouped_by_location(self, requests):
+        assign_location_ids(requests)
+
+        features = extract_features(requests, ["cleaned"])
+
+        assert list(features["total_tags"]) == [2, 2, 1]
+        assert list(features["reports_last_90d"]) == [0, 1, 0]
+
+    def test_matches_to_feature_dict(self, requests):
+        assign_location_ids(requests)
+        keywords = ["cleaned"]
+        address_index = _build_address_index(requests)
+        expected = pandas.DataFrame(
+            [
+                request.to_feature_dict(
+                    _build_status_categories(requests), keywords, address_index
+                )
+                for request in requests
+            ]
+        )
+
+        features = extract_request_features(requests, keywords)
+
+        for column in ["total_tags", "time_to_next_update"]:
+            pandas.testing.assert_series_equal(
+                features[column], expected[column], check_dtype=False
+            )
+
+
+class TestFeatureCodebooks:
+    def test_borough_codes_do_not_depend_on_boroughs_present(self):
+        queens_only = GraffitiServiceRequest({"address": "7 PINE RD, Queens"})
+        features = extract_features([queens_only], ["cleaned"])
+        assert features["borough"].iloc[0] == BOROUGH_CODEBOOK.index("queens")
+
+    def test_status_codes_do_not_depend_on_statuses_present(self):
+        request = GraffitiServiceRequest(
+            {"address": "1 A ST", "status": GRAFFITI_CLEANED_STATUS}
+        )
+        features = extract_features([request], ["cleaned"])
+        assert features["status_code"].iloc[0] == STATUS_CODEBOOK.index(
+            GRAFFITI_CLEANED_STATUS
+        )
+
+    def test_unknown_statuses_share_other_code(self):
+        requests = [
+            GraffitiServiceRequest({"address": "1 A ST", "status": "Open"}),
+            GraffitiServiceRequest({"address": "1 A ST", "status": "Pending"}),
+        ]
+        features = extract_features(requests, ["cleaned"])
+        assert list(features["status_code"]) == [OTHER_STATUS_CODE] * 2
+
+
+class TestBoroughBoundaries:
+    @pytest.fixture
+    def queens_boundaries(self, tmp_path):
+        path = tmp_path / "boroughs.geojson"
+        square = [[-73.9, 40.7], [-73.7, 40.7], [-73.7, 40.8], [-73.9, 40.8]]
+        path.write_text(
+            json.dumps(
+                {
+                    "type": "FeatureCollection",
+                    "features": [
+                        {
+                            "type": "Feature",
+                            "properties": {"boro_name": "Queens"},
+                            "geometry": {"type": "Polygon", "coordinates": [square]},
+                        }
+                    ],
+                }
+            )
+        )
+        with patch(
+            "graffiti_data_pipeline.prediction.features.BOROUGH_BOUNDARIES_FILE",
+            str(path),
+        ):
+            yield
+
+    def test_coordinates_decide_the_borough(self, queens_boundaries):
+        requests = [
+            GraffitiServiceRequest(
+                {"address": "12 BROOKLYN AVE", "latitude": 40.75, "longitude": -73.8}
+            ),
+            GraffitiServiceRequest({"address": "3 ELM ST, Bronx"}),
+            GraffitiServiceRequest(
+                {"address": "4 OAK ST", "latitude": 40.6, "longitude": -74.1}
+            ),
+        ]
+
+        codes = borough_codes(requests)
+
+        assert [BOROUGH_CODEBOOK[code] for code in codes] == [
+            "queens",
+            "bronx",
+            "unknown",
+        ]
+
+    def test_missing_file_warns_and_reads_the_address(self, tmp_path):
+        requests = [GraffitiServiceRequest({"address": "3 ELM ST, Bronx"})]
+
+        with patch(
+            "graffiti_data_pipeline.prediction.features.BOROUGH_BOUNDARIES_FILE",
+            str(tmp_path / "missing.geojson"),
+        ), patch.object(features_module.logger, "warning") as warning:
+            codes = borough_codes(requests)
+
+        assert BOROUGH_CODEBOOK[codes[0]] == "bronx"
+        warning.assert_called_once()
+
+    def test_boundaries_file_does_not_warn(self, queens_boundaries):
+        requests = [GraffitiServiceRequest({"address": "3 ELM ST, Bronx"})]
+
+        with patch.object(features_module.logger, "warning") as warning:
+            borough_codes(requests)
+
+        warning.assert_not_called()
+
+    def test_address_uses_its_first_request(self, queens_boundaries):
+        requests = [
+            GraffitiServiceRequest(
+                {"address": "5 PINE RD", "latitude": 40.75, "longitude": -73.8}
+            ),
+            GraffitiServiceRequest({"address": "5 PINE RD"}),
+        ]
+
+        features = extract_features(requests, ["cleaned"])
+
+        assert list(features["borough"]) == [BOROUGH_CODEBOOK.index("queens")] * 2
+
+
+class TestReferenceDay:
+    def test_days_since_last_tag_is_measured_from_reference_day(self):
+        request = GraffitiServiceRequest({"last_updated": "1970-01-11"})
+        features = extract_features([request], ["cleaned"], reference_day=15)
+        assert features["days_since_last_tag"].iloc[0] == 5
+
+
+class TestFeatureMatrix:
+    def test_frame_becomes_contiguous_float32(self):
+        frame = pandas.DataFrame({"total_tags": [1, 2], "latitude": [40.5, 40.6]})
+
+        matrix = FeatureMatrix.of(frame)
+
+        assert matrix.values.dtype == np.float32
+        assert matrix.values.flags.c_contiguous
+        assert matrix.columns == ["total_tags", "latitude"]
+        assert len(matrix) == 2
+
+    def test_matrix_is_passed_through(self):
+        matrix = FeatureMatrix.of(pandas.DataFrame({"total_tags": [1, 2]}))
+        assert FeatureMatrix.of(matrix) is matrix
+
+    def test_all_rows_share_the_matrix(self):
+        matrix = FeatureMatrix.of(pandas.DataFrame({"total_tags": [1, 2, 3]}))
+
+        assert matrix.rows(None) is matrix.values
+        np.testing.assert_array_equal(matrix.rows(np.array([0, 2])), [[1], [3]])
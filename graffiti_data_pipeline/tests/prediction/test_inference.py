@@ -0,0 +1,156 @@
+from unittest.mock import patch
+
+import numpy as np
+import pandas
+import pytest
+
+from graffiti_data_pipeline.prediction.inference import PackedPredictionModel
+from graffiti_data_pipeline.prediction.model import (
+    GraffitiPredictionModel,
+    TrainingTargets,
+)
+
+
+def build_training_data(row_count=80):
+    features = pandas.DataFrame(
+        {
+            "days_since_last_tag": [number % 17 for number in range(row_count)],
+            "total_tags": [1 + number % 4 for number in range(row_count)],
+            "response_time": [
+                np.nan if number % 7 == 0 else float(number % 30)
+                for number in range(row_count)
+            ],
+            "latitude": [40.5 + number / 1000 for number in range(row_count)],
+        }
+    )
+    targets = TrainingTargets(
+        recurrence=pandas.Series([int(number % 4 > 0) for number in range(row_count)]),
+        cleaning=pandas.Series([number % 3 == 0 for number in range(row_count)]),
+        time_to_next_update=pandas.Series(
+            [float(number % 30) for number in range(row_count)]
+        ),
+        recurrence_window=pandas.Series(
+            [None if number % 3 else float(number) for number in range(row_count)]
+        ),
+        resolution_time=pandas.Series([None] * row_count, dtype=float),
+    )
+    return features, targets
+
+
+def assert_same_predictions(expected, actual):
+    for expected_values, actual_values in zip(expected, actual):
+        np.testing.assert_allclose(
+            np.asarray(actual_values, dtype=float),
+            np.asarray(expected_values, dtype=float),
+        )
+
+
+class TestPackedPredictionModel:
+    @pytest.mark.parametrize(
+        "engine, multi_output",
+        [
+            ("random_forest", False),
+            ("random_forest", True),
+            ("hist_gradient_boosting", False),
+        ],
+    )
+    def test_matches_source_model(self, engine, multi_output):
+        features, targets = build_training_data()
+        model = GraffitiPredictionModel(engine=engine, multi_output=multi_output)
+        model.train(features, targets)
+
+        packed = PackedPredictionModel.from_model(model)
+
+        assert_same_predictions(model.predict(features), packed.predict(features))
+
+    def test_missing_values_follow_fitted_branches(self):
+        features, targets = build_training_data()
+        model = GraffitiPredictionModel(engine="hist_gradient_boosting")
+        model.train(features, targets)
+        unseen = features.assign(total_tags=np.nan, latitude=np.nan)
+
+        packed = PackedPredictionModel.from_model(model)
+
+        assert_same_predictions(model.predict(unseen), packed.predict(unseen))
+
+    @pytest.mark.parametrize("engine", ["random_forest", "hist_gradient_boosting"])
+    def test_split_range_matches_source_model(self, engine):
+        features, targets = build_training_data()
+        model = GraffitiPredictionModel(engine=engine)
+        model.train(features, targets)
+
+        packed = PackedPredictionModel.from_model(model)
+
+        np.testing.assert_array_equal(
+            packed.split_range(features, "response_time"),
+            model.split_range(features, "response_time"),
+        )
+
+    def test_values_within_split_range_predict_the_same(self):
+        features, targets = build_training_data()
+        model = GraffitiPredictionModel()
+        model.train(features, targets)
+        packed = PackedPredictionModel.from_model(model)
+
+        low, high = packed.split_range(features, "days_since_last_tag")
+
+        assert (low < features["days_since_last_tag"]).all()
+        assert (features["days_since_last_tag"] <= high).all()
+        at_high = features.assign(days_since_last_tag=np.minimum(high, 1000))
+        assert_same_predictions(packed.predict(features), packed.predict(at_high))
+
+    def test_missing_values_have_an_empty_split_range(self):
+        features, targets = build_training_data()
+        model = GraffitiPredictionModel()
+        model.train(features, targets)
+
+        low, high = PackedPredictionModel.from_model(model).split_range(
+            features, "response_time"
+        )
+
+        missing = features["response_time"].isna().to_numpy()
+        assert np.isnan(low[missing]).all() and np.isnan(high[missing]).all()
+        assert not np.isnan(low[~missing]).any()
+
+    def test_unfitted_regressor_predicts_none(self):
+        features, targets = build_training_data()
+        model = GraffitiPredictionModel()
+        model.train(features, targets)
+
+        predictions = PackedPredictionModel.from_model(model).predict(features)
+
+        assert predictions.resolution_time_predictions == [None] * len(features)
+
+    def test_single_class_classifier(self):
+        features, targets = build_training_data()
+        targets = targets._replace(cleaning=pandas.Series([1] * len(features)))
+        model = GraffitiPredictionModel(engine="hist_gradient_boosting")
+        model.train(features, targets)
+
+        predictions = PackedPredictionModel.from_model(model).predict(features)
+
+        assert (predictions.cleaning_probabilities == 1).all()
+
+    def test_save_and_load_round_trip(self, tmp_path):
+        features, targets = build_training_data()
+        model = GraffitiPredictionModel()
+        model.train(features, targets)
+        path = str(tmp_path / "nested" / "model.packed.joblib")
+
+        PackedPredictionModel.from_model(model).save(path)
+        loaded = PackedPredictionModel.load(path)
+
+        assert_same_predictions(model.predict(features), loaded.predict(features))
+
+    def test_load_rejects_other_schema_version(self, tmp_path):
+        features, targets = build_training_data()
+        model = GraffitiPredictionModel()
+        model.train(features, targets)
+        path = str(tmp_path / "model.packed.joblib")
+        PackedPredictionModel.from_model(model).save(path)
+
+        with patch(
+            "graffiti_data_pipeline.prediction.model.FEATURE_SCHEMA_VERSION", -1
+        ):
+            with pytest.raises(ValueError, match="feature_schema_version"):
+                PackedPredictionModel.load(path)
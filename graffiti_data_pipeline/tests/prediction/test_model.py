@@ -1,7 +1,28 @@
+from unittest.mock import patch
+
+import numpy as np
 import pytest
 import pandas
 
-from graffiti_data_pipeline.prediction.model import GraffitiPredictionModel
+from graffiti_data_pipeline.prediction.engines import (
+    ADAPTIVE_TREE_STEP,
+    ENGINES,
+    N_ESTIMATORS,
+    RandomForestEngine,
+)
+from graffiti_data_pipeline.config import (
+    GRAFFITI_CLEANED_STATUS,
+    GRAFFITI_SITE_TO_BE_CLEANED_STATUS,
+    MODEL_MAX_TREES,
+)
+from graffiti_data_pipeline.prediction.features import FeatureMatrix
+from graffiti_data_pipeline.prediction.model import (
+    GraffitiPredictionModel,
+    TrainingTargets,
+    _is_valid_day_count,
+    split_job_budget,
+    stratified_rows,
+)
 
 
 class DummyRequest:
@@ -209,3 +230,556 @@ class TestGraffitiPredictionModel:
         # invalid date
         date = model.compute_predicted_time_to_next_update("invalid-date", 5)
         assert date == "Unknown"
+
+
+@pytest.fixture
+def training_data():
+    row_count = 40
+    features = pandas.DataFrame(
+        {
+            "days_since_last_tag": [number % 17 for number in range(row_count)],
+            "borough": [number % 5 for number in range(row_count)],
+            "total_tags": [1 + number % 3 for number in range(row_count)],
+            "latitude": [40.5 + number / 100 for number in range(row_count)],
+            "longitude": [-74.0 + number / 100 for number in range(row_count)],
+        }
+    )
+    targets = TrainingTargets(
+        recurrence=pandas.Series([number % 2 for number in range(row_count)]),
+        cleaning=pandas.Series([number % 3 == 0 for number in range(row_count)]),
+        time_to_next_update=pandas.Series(
+            [float(number) for number in range(row_count)]
+        ),
+        recurrence_window=pandas.Series(
+            [None if number % 3 else float(number) for number in range(row_count)]
+        ),
+        resolution_time=pandas.Series(
+            [float(number % 9) for number in range(row_count)]
+        ),
+    )
+    return features, targets
+
+
+class TestSplitJobBudget:
+    def test_single_job_runs_models_one_at_a_time(self):
+        assert split_job_budget(1) == (1, [1, 1, 1, 1, 1])
+
+    def test_budget_covers_models_before_trees(self):
+        assert split_job_budget(4) == (4, [1, 1, 1, 1, 1])
+
+    def test_remaining_cores_go_to_trees(self):
+        assert split_job_budget(15) == (5, [3, 3, 3, 3, 3])
+
+    def test_spare_cores_go_to_the_first_models(self):
+        assert split_job_budget(8) == (5, [2, 2, 2, 1, 1])
+
+    def test_uses_the_whole_budget_without_oversubscribing(self):
+        for n_jobs in range(1, 33):
+            model_workers, tree_jobs = split_job_budget(n_jobs)
+            assert len(tree_jobs) == 5
+            if model_workers == 5:
+                assert sum(tree_jobs) == n_jobs
+            else:
+                assert model_workers == n_jobs
+                assert set(tree_jobs) == {1}
+
+    def test_splits_between_any_number_of_models(self):
+        assert split_job_budget(8, model_count=3) == (3, [3, 3, 2])
+
+    @patch("graffiti_data_pipeline.prediction.model.os.cpu_count", return_value=10)
+    def test_all_cores(self, mock_cpu_count):
+        assert split_job_budget(-1) == (5, [2, 2, 2, 2, 2])
+
+
+class TestParallelTraining:
+    def test_train_fits_all_five_models(self, training_data):
+        features, targets = training_data
+        model = GraffitiPredictionModel(n_jobs=4)
+
+        model.train(features, targets)
+
+        for estimator in [
+            model.recurrence_model,
+            model.cleaning_model,
+            model.time_regressor,
+            model.recurrence_window_regressor,
+            model.resolution_time_regressor,
+        ]:
+            assert hasattr(estimator, "estimators_")
+
+    def test_parallel_matches_serial(self, training_data):
+        features, targets = training_data
+        serial = GraffitiPredictionModel(n_jobs=1)
+        parallel = GraffitiPredictionModel(n_jobs=6)
+
+        serial.train(features, targets)
+        parallel.train(features, targets)
+
+        for expected, actual in zip(
+            serial.predict(features), parallel.predict(features)
+        ):
+            np.testing.assert_allclose(actual, expected)
+
+
+def shifted(training_data, offset):
+    """The fixture rows with every feature moved, i.e. rows never seen."""
+    features, targets = training_data
+    return features + offset, targets
+
+
+class TestPersistence:
+    def test_save_and_load_round_trip(self, training_data, tmp_path):
+        features, targets = training_data
+        model = GraffitiPredictionModel()
+        model.train(features, targets)
+        path = str(tmp_path / "nested" / "model.joblib")
+
+        model.save(path)
+        loaded = GraffitiPredictionModel.load(path)
+
+        for expected, actual in zip(model.predict(features), loaded.predict(features)):
+            np.testing.assert_allclose(actual, expected)
+        assert not loaded.unseen_rows(features, targets).any()
+
+    def test_load_rejects_other_schema_version(self, training_data, tmp_path):
+        features, targets = training_data
+        model = GraffitiPredictionModel()
+        model.train(features, targets)
+        path = str(tmp_path / "model.joblib")
+        model.save(path)
+
+        with patch(
+            "graffiti_data_pipeline.prediction.model.FEATURE_SCHEMA_VERSION", -1
+        ):
+            with pytest.raises(ValueError, match="feature_schema_version"):
+                GraffitiPredictionModel.load(path)
+
+    def test_load_rejects_other_codebook(self, training_data, tmp_path):
+        features, targets = training_data
+        model = GraffitiPredictionModel()
+        model.train(features, targets)
+        path = str(tmp_path / "model.joblib")
+        model.save(path)
+
+        with patch(
+            "graffiti_data_pipeline.prediction.model.BOROUGH_CODEBOOK", ["brooklyn"]
+        ):
+            with pytest.raises(ValueError, match="borough_codebook"):
+                GraffitiPredictionModel.load(path)
+
+
+class TestWarmStart:
+    def test_unseen_rows_ignore_date_relative_columns(self, training_data):
+        features, targets = training_data
+        model = GraffitiPredictionModel()
+        model.train(features, targets)
+
+        next_day = features.assign(
+            days_since_last_tag=features["days_since_last_tag"] + 1
+        )
+
+        assert not model.unseen_rows(next_day, targets).any()
+
+    def test_changed_targets_count_as_unseen(self, training_data):
+        features, targets = training_data
+        model = GraffitiPredictionModel()
+        model.train(features, targets)
+
+        changed = targets._replace(recurrence=1 - targets.recurrence)
+
+        assert model.unseen_rows(features, changed).all()
+
+    def test_adds_trees_and_keeps_existing_ones(self, training_data):
+        features, targets = training_data
+        model = GraffitiPredictionModel()
+        model.train(features, targets)
+        original_trees = list(model.time_regressor.estimators_)
+
+        new_features, new_targets = shifted(training_data, 100)
+        model.warm_start(new_features, new_targets, additional_trees=5)
+
+        assert len(model.time_regressor.estimators_) == N_ESTIMATORS + 5
+        assert model.time_regressor.estimators_[:N_ESTIMATORS] == original_trees
+        assert model.tree_count == N_ESTIMATORS + 5
+        assert not model.unseen_rows(features, targets).any()
+        assert not model.unseen_rows(new_features, new_targets).any()
+
+    def test_version_changes_with_every_fit(self, training_data):
+        features, targets = training_data
+        model = GraffitiPredictionModel()
+        model.train(features, targets)
+        retrained = GraffitiPredictionModel()
+        retrained.train(features, targets)
+        trained_version = model.version
+
+        model.warm_start(*shifted(training_data, 100), additional_trees=5)
+
+        assert retrained.version == trained_version
+        assert model.version != trained_version
+
+    def test_skips_classifier_when_classes_differ(self, training_data):
+        features, targets = training_data
+        model = GraffitiPredictionModel()
+        model.train(features, targets)
+
+        new_features, new_targets = shifted(training_data, 100)
+        single_class = new_targets._replace(
+            recurrence=pandas.Series([1] * len(new_features))
+        )
+        model.warm_start(new_features, single_class, additional_trees=5)
+
+        assert len(model.recurrence_model.estimators_) == N_ESTIMATORS
+        assert len(model.cleaning_model.estimators_) == N_ESTIMATORS + 5
+
+    def test_trains_models_that_were_never_fitted(self, training_data):
+        features, targets = training_data
+        model = GraffitiPredictionModel()
+        unlabelled = pandas.Series([None] * len(features), dtype=float)
+        model.train(features, targets._replace(resolution_time=unlabelled))
+        assert not hasattr(model.resolution_time_regressor, "estimators_")
+
+        new_features, new_targets = shifted(training_data, 100)
+        model.warm_start(new_features, new_targets, additional_trees=5)
+
+        assert len(model.resolution_time_regressor.estimators_) == N_ESTIMATORS
+
+
+class TestSharedFeatureMatrix:
+    def test_fully_labelled_regressor_fits_the_shared_matrix(self, training_data):
+        features, targets = training_data
+        model = GraffitiPredictionModel()
+        matrix = FeatureMatrix.of(features)
+
+        with patch.object(model.time_regressor, "fit") as fit:
+            model.train_time_regressor(matrix, targets.time_to_next_update)
+
+        assert fit.call_args.args[0] is matrix.values
+
+    def test_regressor_fits_only_labelled_rows(self, training_data):
+        features, targets = training_data
+        model = GraffitiPredictionModel()
+
+        with patch.object(model.recurrence_window_regressor, "fit") as fit:
+            model.train_recurrence_window_regressor(features, targets.recurrence_window)
+
+        fitted_features, fitted_targets = fit.call_args.args
+        labelled = targets.recurrence_window.notnull().to_numpy()
+        np.testing.assert_array_equal(
+            fitted_features, FeatureMatrix.of(features).values[labelled]
+        )
+        assert not np.isnan(fitted_targets).any()
+
+    def test_train_on_selected_rows(self, training_data):
+        features, targets = training_data
+        model = GraffitiPredictionModel()
+        rows = np.arange(0, len(features), 2)
+
+        model.train(features, targets, rows=rows)
+
+        assert model.unseen_rows(features, targets).sum() == len(features) - len(rows)
+
+
+class TestStratifiedRows:
+    def test_no_cap_keeps_every_row(self, training_data):
+        _, targets = training_data
+        assert stratified_rows(targets, 0) is None
+        assert stratified_rows(targets, len(targets.recurrence)) is None
+
+    def test_keeps_label_shares(self):
+        row_count = 1000
+        targets = TrainingTargets(
+            recurrence=pandas.Series(
+                [int(number % 10 == 0) for number in range(row_count)]
+            ),
+            cleaning=pandas.Series([number % 2 for number in range(row_count)]),
+            time_to_next_update=pandas.Series([1.0] * row_count),
+            recurrence_window=pandas.Series([1.0] * row_count),
+            resolution_time=pandas.Series([1.0] * row_count),
+        )
+
+        rows = stratified_rows(targets, 100)
+
+        assert len(rows) == 100
+        assert len(np.unique(rows)) == 100
+        assert (np.diff(rows) > 0).all()
+        assert targets.recurrence.iloc[rows].sum() == 10
+        assert targets.cleaning.iloc[rows].sum() == 50
+
+    def test_samples_within_given_rows(self, training_data):
+        _, targets = training_data
+        candidates = np.arange(10, 30)
+
+        rows = stratified_rows(targets, 5, rows=candidates)
+
+        assert len(rows) == 5
+        assert np.isin(rows, candidates).all()
+
+
+class TestAdaptiveSizing:
+    def test_forests_grow_in_steps_up_to_the_limit(self, training_data):
+        features, targets = training_data
+        model = GraffitiPredictionModel(adaptive=True)
+
+        model.train(features, targets)
+
+        for attribute in model.estimator_attributes:
+            forest = getattr(model, attribute)
+            if not model.engine.size(forest):
+                continue
+            assert model.engine.size(forest) % ADAPTIVE_TREE_STEP == 0
+            assert model.engine.size(forest) <= model.engine.max_trees
+            assert not forest.oob_score and not forest.warm_start
+
+    def test_stops_once_score_plateaus(self, training_data):
+        features, targets = training_data
+        engine = ENGINES["random_forest"]
+        forest = engine.classifier(n_jobs=1)
+
+        scores = engine.fit_adaptively(
+            forest, features, targets.recurrence, tolerance=1.0
+        )
+
+        assert len(scores) == 2
+        assert engine.size(forest) == 2 * ADAPTIVE_TREE_STEP
+
+    def test_stops_at_the_engine_tree_limit(self, training_data):
+        features, targets = training_data
+        engine = RandomForestEngine(max_trees=2 * ADAPTIVE_TREE_STEP)
+        forest = engine.classifier(n_jobs=1)
+
+        scores = engine.fit_adaptively(
+            forest, features, targets.recurrence, tolerance=-1.0
+        )
+
+        assert len(scores) == 2
+        assert engine.size(forest) == 2 * ADAPTIVE_TREE_STEP
+
+    def test_default_limit_is_the_model_tree_limit(self):
+        assert ENGINES["random_forest"].max_trees == MODEL_MAX_TREES
+
+    def test_classifiers_train_on_every_row(self, training_data):
+        features, targets = training_data
+        model = GraffitiPredictionModel(adaptive=True)
+        engine = model.engine
+
+        with patch.object(
+            engine, "fit_adaptively", wraps=engine.fit_adaptively
+        ) as fit_adaptively:
+            model.train_recurrence_classifier(features, targets.recurrence)
+
+        fitted_features = fit_adaptively.call_args.args[1]
+        assert len(fitted_features) == len(features)
+
+    def test_unsupported_engine_is_rejected(self):
+        with pytest.raises(ValueError, match="adaptive"):
+            GraffitiPredictionModel(engine="hist_gradient_boosting", adaptive=True)
+
+    def test_save_and_load_keep_mode(self, training_data, tmp_path):
+        features, targets = training_data
+        model = GraffitiPredictionModel(adaptive=True)
+        model.train(features, targets)
+        path = str(tmp_path / "model.joblib")
+
+        model.save(path)
+
+        assert GraffitiPredictionModel.load(path).adaptive
+
+
+class TestEngines:
+    def test_unknown_engine_is_rejected(self):
+        with pytest.raises(ValueError, match="Unknown model engine"):
+            GraffitiPredictionModel(engine="linear")
+
+    def test_hist_gradient_boosting_trains_and_predicts(self, training_data):
+        features, targets = training_data
+        model = GraffitiPredictionModel(engine="hist_gradient_boosting")
+
+        model.train(features, targets)
+        predictions = model.predict(features)
+
+        for values in predictions:
+            assert len(values) == len(features)
+        assert model.tree_count > 0
+
+    def test_hist_gradient_boosting_round_trip_and_warm_start(
+        self, training_data, tmp_path
+    ):
+        features, targets = training_data
+        model = GraffitiPredictionModel(engine="hist_gradient_boosting")
+        model.train(features, targets)
+        path = str(tmp_path / "model.joblib")
+        model.save(path)
+
+        loaded = GraffitiPredictionModel.load(path)
+        iterations = loaded.engine.size(loaded.time_regressor)
+        new_features, new_targets = shifted(training_data, 100)
+        loaded.warm_start(new_features, new_targets, additional_trees=5)
+
+        assert loaded.engine.name == "hist_gradient_boosting"
+        assert loaded.engine.size(loaded.time_regressor) == iterations + 5
+
+    def test_single_class_probabilities_for_every_engine(self, training_data):
+        features, targets = training_data
+        always = targets._replace(recurrence=pandas.Series([1] * len(features)))
+        for engine in ["random_forest", "hist_gradient_boosting"]:
+            model = GraffitiPredictionModel(engine=engine)
+            model.train(features, always)
+            np.testing.assert_array_equal(
+                model.predict(features).recurrence_probabilities, 1.0
+            )
+
+
+class TestMultiOutput:
+    def test_rejects_engine_without_multi_output(self):
+        with pytest.raises(ValueError, match="multi-output"):
+            GraffitiPredictionModel(engine="hist_gradient_boosting", multi_output=True)
+
+    def test_one_regressor_predicts_every_day_count(self, training_data):
+        features, targets = training_data
+        model = GraffitiPredictionModel(multi_output=True)
+
+        model.train(features, targets)
+        predictions = model.predict(features)
+
+        assert model.day_count_regressor.n_outputs_ == 3
+        assert not hasattr(model, "time_regressor")
+        for values in predictions[2:]:
+            assert len(values) == len(features)
+            assert all(value is not None for value in values)
+
+    def test_missing_targets_are_imputed_with_median(self, training_data):
+        features, targets = training_data
+        model = GraffitiPredictionModel(multi_output=True)
+
+        model.train(features, targets)
+
+        known_windows = targets.recurrence_window.dropna()
+        assert model.day_count_medians[1] == known_windows.median()
+        _, matrix = model._day_count_matrix(targets)
+        assert not np.isnan(matrix).any()
+
+    def test_target_never_seen_predicts_none(self, training_data):
+        features, targets = training_data
+        model = GraffitiPredictionModel(multi_output=True)
+        unlabelled = pandas.Series([None] * len(features), dtype=float)
+
+        model.train(features, targets._replace(resolution_time=unlabelled))
+        predictions = model.predict(features)
+
+        assert predictions.resolution_time_predictions == [None] * len(features)
+        assert predictions.time_predictions[0] is not None
+
+    def test_round_trip_and_warm_start(self, training_data, tmp_path):
+        features, targets = training_data
+        model = GraffitiPredictionModel(multi_output=True)
+        model.train(features, targets)
+        path = str(tmp_path / "model.joblib")
+        model.save(path)
+
+        loaded = GraffitiPredictionModel.load(path)
+        for expected, actual in zip(model.predict(features), loaded.predict(features)):
+            np.testing.assert_allclose(actual, expected)
+
+        new_features, new_targets = shifted(training_data, 100)
+        loaded.warm_start(new_features, new_targets, additional_trees=5)
+        assert len(loaded.day_count_regressor.estimators_) == N_ESTIMATORS + 5
+
+
+def reference_enrichment(
+    model,
+    requests,
+    recurrence_probabilities,
+    cleaning_probabilities,
+    time_predictions,
+    recurrence_window_predictions,
+    resolution_time_predictions,
+):
+    """Prediction fields built one request at a time with the scalar helpers."""
+    records = []
+    for index, request in enumerate(requests):
+        recurrence = float(recurrence_probabilities[index])
+        cleaning = float(cleaning_probabilities[index])
+        predicted_days = time_predictions[index]
+        record = {
+            "graffiti_likelihood": recurrence * 100,
+            "estimated_next_tag": model.compute_estimated_next_tag(
+                request.last_updated, recurrence
+            ),
+            "predicted_time_to_next_update": (
+                model.compute_predicted_time_to_next_update(
+                    request.last_updated, predicted_days
+                )
+            ),
+        }
+        for field, predictions in [
+            ("predicted_recurrence_days", recurrence_window_predictions),
+            ("predicted_resolution_days", resolution_time_predictions),
+        ]:
+            value = predictions[index]
+            record[field] = round(float(value)) if _is_valid_day_count(value) else None
+        record["times_reported"] = 0
+        record["times_cleaned"] = 0
+        if request.status == GRAFFITI_CLEANED_STATUS:
+            record["cleaning_likelihood"] = 100.0
+            record["predicted_cleaning_date"] = request.last_updated
+        elif request.status == GRAFFITI_SITE_TO_BE_CLEANED_STATUS:
+            record["cleaning_likelihood"] = 90.0
+            record["predicted_cleaning_date"] = "Unknown"
+        else:
+            record["cleaning_likelihood"] = cleaning * 100
+            record["predicted_cleaning_date"] = model.predict_cleaning_date(
+                request.last_updated, cleaning, predicted_days
+            )
+        records.append(record)
+    return records
+
+
+class TestVectorizedEnrichment:
+    def test_matches_scalar_helpers_on_edge_cases(self):
+        model = GraffitiPredictionModel()
+        last_updated = [
+            "2026-02-01",
+            "2026-2-1",
+            "9999-12-25",
+            "0999-01-01",
+            "2026-02-30",
+            "2026-02-01T10:00:00",
+            "",
+            "2024-02-29",
+        ]
+        statuses = ["Open", GRAFFITI_CLEANED_STATUS, GRAFFITI_SITE_TO_BE_CLEANED_STATUS]
+        probabilities = [0.0, 0.5, 0.51, 1.0, 0.3333, 1e-7, float("nan"), 0.9999]
+        day_counts = [None, 5.0, 2.5, 3.5, -1.0, float("inf"), 1e15, 0.4, 1e300]
+        requests, recurrence, cleaning, times, windows, resolutions = (
+            [],
+            [],
+            [],
+            [],
+            [],
+            [],
+        )
+        for number in range(216):
+            requests.append(
+                DummyRequest(
+                    last_updated=last_updated[number % len(last_updated)],
+                    status=statuses[number % len(statuses)],
+                )
+            )
+            recurrence.append(probabilities[number % len(probabilities)])
+            cleaning.append(probabilities[(number // 3) % len(probabilities)])
+            times.append(day_counts[number % len(day_counts)])
+            windows.append(day_counts[(number // 2) % len(day_counts)])
+            resolutions.append(day_counts[(number // 5) % len(day_counts)])
+        predictions = (recurrence, cleaning, times, windows, resolutions)
+
+        expected = reference_enrichment(model, requests, *predictions)
+        actual = model.enrich_requests(requests, *predictions)
+
+        for expected_record, actual_record in zip(expected, actual):
+            assert list(actual_record)[1:] == list(expected_record)
+            for field, value in expected_record.items():
+                assert type(actual_record[field]) is type(value)
+                if value != value:
+                    assert actual_record[field] != actual_record[field]
+                else:
+                    assert actual_record[field] == value, field
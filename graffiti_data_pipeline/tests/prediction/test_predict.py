@@ -1,8 +1,35 @@
+import json
+import subprocess
+import sys
+
 import pytest
 from unittest.mock import patch, MagicMock
 from graffiti_data_pipeline.prediction import predict
 
 
+@pytest.fixture(autouse=True)
+def model_file(tmp_path, monkeypatch):
+    """Keep the saved model and caches out of the working tree."""
+    path = str(tmp_path / "model.joblib")
+    monkeypatch.setattr(predict, "GRAFFITI_MODEL_FILE", path)
+    monkeypatch.setattr(
+        predict, "GRAFFITI_PACKED_MODEL_FILE", str(tmp_path / "model.packed.joblib")
+    )
+    monkeypatch.setattr(
+        predict, "FEATURE_CACHE_FILE", str(tmp_path / "feature-cache.joblib")
+    )
+    monkeypatch.setattr(
+        predict, "PREDICTION_CACHE_FILE", str(tmp_path / "prediction-cache.joblib")
+    )
+    monkeypatch.setattr(
+        predict, "PREDICTIONS_SIDECAR_FILE", str(tmp_path / "predictions.json")
+    )
+    monkeypatch.setattr(
+        predict, "PREDICTION_STORE_FILE", str(tmp_path / "prediction-store.json")
+    )
+    return path
+
+
 class TestPredictMain:
     @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
     @patch("graffiti_data_pipeline.prediction.predict.get_logger")
@@ -22,7 +49,7 @@ class TestPredictMain:
             }
         ]
         mock_cache.save.return_value = None
-        predict.main()
+        predict.main([])
         mock_cache.load.assert_called_once()
         mock_cache.save.assert_called_once()
 
@@ -35,7 +62,7 @@ class TestPredictMain:
         mock_cache.load.return_value = []
         mock_cache.save.return_value = None
         with pytest.raises(ValueError):
-            predict.main()
+            predict.main([])
         mock_cache.load.assert_called_once()
 
     @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
@@ -47,7 +74,7 @@ class TestPredictMain:
         mock_cache.load.return_value = [123]
         mock_cache.save.return_value = None
         with pytest.raises(Exception):
-            predict.main()
+            predict.main([])
 
     @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
     @patch("graffiti_data_pipeline.prediction.predict.get_logger")
@@ -68,7 +95,7 @@ class TestPredictMain:
         ]
         mock_cache.save.side_effect = Exception("Save failed")
         with pytest.raises(Exception):
-            predict.main()
+            predict.main([])
 
     @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
     @patch("graffiti_data_pipeline.prediction.predict.get_logger")
@@ -78,5 +105,266 @@ class TestPredictMain:
         mock_jsonfile.return_value = mock_cache
         mock_cache.load.return_value = [{"address": "no fields"}]
         mock_cache.save.return_value = None
-        predict.main()
+        predict.main([])
         mock_cache.save.assert_called_once()
+
+
+def lookup_records(count):
+    return [
+        {
+            "address": f"{number % 7} MAIN ST, Brooklyn",
+            "last_updated": f"2026-02-{1 + number % 28:02d}",
+            "created": f"2026-01-{1 + number % 28:02d}",
+            "status": "Cleaned" if number % 2 else "Open",
+            "latitude": 40.6 + number / 1000,
+            "longitude": -73.9 - number / 1000,
+            "unique_key": f"request-{number}",
+        }
+        for number in range(count)
+    ]
+
+
+class TestModelPersistence:
+    @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
+    def test_second_run_warm_starts_saved_model(self, mock_jsonfile, model_file):
+        mock_jsonfile.return_value.load.return_value = lookup_records(30)
+        predict.main([])
+        first_trees = predict.GraffitiPredictionModel.load(model_file).tree_count
+
+        mock_jsonfile.return_value.load.return_value = lookup_records(60)
+        predict.main([])
+
+        model = predict.GraffitiPredictionModel.load(model_file)
+        assert model.tree_count == first_trees + predict.MODEL_WARM_START_TREES
+
+    @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
+    def test_unchanged_data_skips_training(self, mock_jsonfile, model_file):
+        mock_jsonfile.return_value.load.side_effect = lambda: lookup_records(30)
+        predict.main([])
+
+        with patch.object(
+            predict.GraffitiPredictionModel, "train", pytest.fail
+        ), patch.object(predict.GraffitiPredictionModel, "warm_start", pytest.fail):
+            predict.main([])
+
+    @patch("graffiti_data_pipeline.prediction.predict.MODEL_MAX_TREES", 55)
+    @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
+    def test_retrains_when_forests_reach_limit(self, mock_jsonfile, model_file):
+        mock_jsonfile.return_value.load.return_value = lookup_records(30)
+        predict.main([])
+
+        mock_jsonfile.return_value.load.return_value = lookup_records(60)
+        predict.main([])
+
+        model = predict.GraffitiPredictionModel.load(model_file)
+        assert model.tree_count == 50
+
+    @patch("graffiti_data_pipeline.prediction.predict.MODEL_MAX_TRAINING_ROWS", 20)
+    @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
+    def test_training_rows_are_capped(self, mock_jsonfile, model_file):
+        records = lookup_records(60)
+        mock_jsonfile.return_value.load.return_value = records
+        predict.main([])
+
+        model = predict.GraffitiPredictionModel.load(model_file)
+        assert len(model.trained_row_hashes) == 20
+        assert all("graffiti_likelihood" in record for record in records)
+
+
+class TestShardedModel:
+    @patch("graffiti_data_pipeline.prediction.predict.MODEL_SHARDED", True)
+    @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
+    def test_predict_only_uses_packed_shards(self, mock_jsonfile, model_file):
+        records = lookup_records(30)
+        mock_jsonfile.return_value.load.return_value = records
+        predict.main([])
+        records[0]["status"] = "Cleaned"
+        records[0].pop("graffiti_likelihood")
+
+        with patch.object(predict.ShardedPredictionModel, "train", pytest.fail):
+            predict.main(["--predict-only"])
+
+        # Thirty Brooklyn rows are too few for a shard of their own.
+        assert predict.ShardedPredictionModel.load(model_file).shards == {}
+        assert "graffiti_likelihood" in records[0]
+
+    @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
+    def test_unsharded_file_is_discarded(self, mock_jsonfile, model_file):
+        mock_jsonfile.return_value.load.return_value = lookup_records(30)
+        predict.main([])
+
+        with patch.object(predict, "MODEL_SHARDED", True):
+            model = predict.load_or_create_model(model_file)
+
+        assert isinstance(model, predict.ShardedPredictionModel)
+        assert model.tree_count == 0
+
+
+class TestPredictionSidecar:
+    @patch("graffiti_data_pipeline.prediction.predict.PREDICTION_SIDECAR", True)
+    @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
+    def test_lookups_file_is_left_alone(self, mock_jsonfile):
+        records = lookup_records(30)
+        mock_jsonfile.return_value.load.return_value = records
+
+        predict.main([])
+
+        mock_jsonfile.return_value.save.assert_not_called()
+        assert all("graffiti_likelihood" not in record for record in records)
+        merged = predict.PredictionSidecar(predict.PREDICTIONS_SIDECAR_FILE).join(
+            records
+        )
+        assert all(
+            isinstance(record["graffiti_likelihood"], float) for record in merged
+        )
+
+    @patch("graffiti_data_pipeline.prediction.predict.PREDICTION_SIDECAR", True)
+    @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
+    def test_predict_only_reads_sidecar_fingerprints(self, mock_jsonfile):
+        records = lookup_records(30)
+        mock_jsonfile.return_value.load.return_value = records
+        predict.main([])
+        records[0]["status"] = "Cleaned"
+
+        with patch.object(
+            predict, "extract_features", wraps=predict.extract_features
+        ) as extract:
+            predict.main(["--predict-only"])
+
+        changed_address = records[0]["address"]
+        extracted = extract.call_args.args[0]
+        assert {request.address for request in extracted} == {changed_address}
+        sidecar = predict.PredictionSidecar(predict.PREDICTIONS_SIDECAR_FILE)
+        assert len(sidecar.load()) == len(records)
+
+
+class TestPredictOnly:
+    @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
+    def test_only_changed_addresses_are_predicted(self, mock_jsonfile):
+        records = lookup_records(30)
+        mock_jsonfile.return_value.load.return_value = records
+        predict.main([])
+        records[0]["status"] = "Cleaned"
+
+        with patch.object(predict.GraffitiPredictionModel, "train", pytest.fail):
+            with patch.object(
+                predict, "extract_features", wraps=predict.extract_features
+            ) as extract:
+                predict.main(["--predict-only"])
+
+        extracted = extract.call_args.args[0]
+        assert {request.address for request in extracted} == {records[0]["address"]}
+        assert len(extracted) == sum(
+            record["address"] == records[0]["address"] for record in records
+        )
+
+    @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
+    def test_freshly_fetched_records_keep_their_predictions(self, mock_jsonfile):
+        mock_jsonfile.return_value.load.return_value = lookup_records(30)
+        predict.main([])
+        previous = mock_jsonfile.return_value.load.return_value
+        # Fetch replaces every record with one holding only source fields.
+        records = lookup_records(30)
+        records[0]["status"] = "Cleaned"
+        mock_jsonfile.return_value.load.return_value = records
+
+        with patch.object(
+            predict, "extract_features", wraps=predict.extract_features
+        ) as extract:
+            predict.main(["--predict-only"])
+
+        changed_address = records[0]["address"]
+        extracted = extract.call_args.args[0]
+        assert {request.address for request in extracted} == {changed_address}
+        for record, old_record in zip(records, previous):
+            assert predict.SOURCE_FINGERPRINT_FIELD in record
+            if record["address"] != changed_address:
+                assert record == old_record
+
+    @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
+    def test_address_variants_are_predicted_together(self, mock_jsonfile):
+        records = lookup_records(30)
+        records[8]["address"] = "1 Main Street, Brooklyn"
+        mock_jsonfile.return_value.load.return_value = records
+        predict.main([])
+        records[1]["status"] = "Cleaned."
+
+        with patch.object(
+            predict, "extract_features", wraps=predict.extract_features
+        ) as extract:
+            predict.main(["--predict-only"])
+
+        extracted = {request.address for request in extract.call_args.args[0]}
+        assert records[8]["address"] in extracted
+        assert records[2]["address"] not in extracted
+
+    @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
+    def test_new_records_are_predicted(self, mock_jsonfile):
+        records = lookup_records(30)
+        mock_jsonfile.return_value.load.return_value = records
+        predict.main([])
+        new_record = {**records[0], "unique_key": "request-new"}
+        for field in ["graffiti_likelihood", predict.SOURCE_FINGERPRINT_FIELD]:
+            new_record.pop(field)
+        records.append(new_record)
+
+        predict.main(["--predict-only"])
+
+        assert "graffiti_likelihood" in new_record
+        mock_jsonfile.return_value.save.assert_called_with(records)
+
+    @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
+    def test_unchanged_records_skip_features(self, mock_jsonfile):
+        mock_jsonfile.return_value.load.return_value = lookup_records(30)
+        predict.main([])
+
+        with patch.object(predict, "extract_features", pytest.fail):
+            predict.main(["--predict-only"])
+
+    @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
+    def test_uses_packed_model(self, mock_jsonfile):
+        records = lookup_records(30)
+        mock_jsonfile.return_value.load.return_value = records
+        predict.main([])
+        records[0]["status"] = "Cleaned"
+        records[0].pop("graffiti_likelihood")
+
+        with patch.object(predict.GraffitiPredictionModel, "load", pytest.fail):
+            predict.main(["--predict-only"])
+
+        assert "graffiti_likelihood" in records[0]
+
+    def test_does_not_import_sklearn(self, tmp_path):
+        records = lookup_records(30)
+        requests = [predict.GraffitiServiceRequest(record) for record in records]
+        cache_path = str(tmp_path / "prediction-cache.joblib")
+        predict.train_and_predict(requests, 20500, predict.PredictionCache(cache_path))
+        records[0]["status"] = "Cleaned"
+        records_path = tmp_path / "records.json"
+        records_path.write_text(json.dumps(records))
+        script = (
+            "import json, sys\n"
+            "from graffiti_data_pipeline.prediction import predict\n"
+            f"predict.GRAFFITI_PACKED_MODEL_FILE = {predict.GRAFFITI_PACKED_MODEL_FILE!r}\n"
+            f"predict.PREDICTION_STORE_FILE = {predict.PREDICTION_STORE_FILE!r}\n"
+            f"cache = predict.PredictionCache({cache_path!r})\n"
+            f"records = json.load(open({str(records_path)!r}))\n"
+            "requests = [predict.GraffitiServiceRequest(record) for record in records]\n"
+            "assert predict.predict_changed(requests, 20500, cache)\n"
+            "print('sklearn' in sys.modules)\n"
+        )
+
+        result = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True
+        )
+
+        assert result.stdout.strip() == "False"
+
+    @patch("graffiti_data_pipeline.prediction.predict.JsonFile")
+    def test_falls_back_to_training_without_saved_model(self, mock_jsonfile):
+        records = lookup_records(30)
+        mock_jsonfile.return_value.load.return_value = records
+
+        predict.main(["--predict-only"])
+
+        assert all("graffiti_likelihood" in record for record in records)
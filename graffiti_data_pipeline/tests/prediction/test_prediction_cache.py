@@ -0,0 +1,169 @@
+import pytest
+
+from graffiti_data_pipeline.config import GRAFFITI_CLEANED_STATUS
+from graffiti_data_pipeline.prediction.features import (
+    MODEL_FEATURE_COLUMNS,
+    FeatureMatrix,
+    extract_features,
+)
+from graffiti_data_pipeline.prediction.inference import PackedPredictionModel
+from graffiti_data_pipeline.prediction.model import (
+    GraffitiPredictionModel,
+    TrainingTargets,
+)
+from graffiti_data_pipeline.prediction import predict
+from graffiti_data_pipeline.prediction.prediction_cache import PredictionCache
+from graffiti_data_pipeline.prediction.request import (
+    SOURCE_FINGERPRINT_FIELD,
+    GraffitiServiceRequest,
+)
+
+REFERENCE_DAY = 20_500
+
+
+def build_records(count=40):
+    return [
+        {
+            "address": f"{number % 9} MAIN ST, Queens",
+            "created": f"2025-01-{1 + number % 28:02d}",
+            "last_updated": f"2025-02-{1 + number % 28:02d}",
+            "status": GRAFFITI_CLEANED_STATUS if number % 2 else "Open",
+            "latitude": 40.6 + number / 1000,
+            "longitude": -73.9 - number / 1000,
+            "unique_key": f"request-{number}",
+        }
+        for number in range(count)
+    ]
+
+
+def prepare(records, reference_day=REFERENCE_DAY):
+    requests = [GraffitiServiceRequest(record) for record in records]
+    features = extract_features(requests, [GRAFFITI_CLEANED_STATUS], reference_day)
+    return requests, features, FeatureMatrix.of(features[MODEL_FEATURE_COLUMNS])
+
+
+@pytest.fixture(autouse=True)
+def records_mode(monkeypatch, tmp_path):
+    """Write the prediction fields into the records, not the sidecar."""
+    monkeypatch.setattr(predict, "PREDICTION_SIDECAR", False)
+    monkeypatch.setattr(
+        predict, "PREDICTION_STORE_FILE", str(tmp_path / "prediction-store.json")
+    )
+
+
+@pytest.fixture
+def trained_model():
+    _, features, matrix = prepare(build_records())
+    model = GraffitiPredictionModel()
+    model.train(matrix, TrainingTargets.from_features(features))
+    return model
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PredictionCache(str(tmp_path / "prediction-cache.joblib"))
+
+
+def enrich(model, cache, records, reference_day=REFERENCE_DAY):
+    requests, features, matrix = prepare(records, reference_day)
+    predict.enrich_with_predictions(model, requests, features, cache, matrix)
+
+
+def enrich_without_cache(model, records, reference_day=REFERENCE_DAY):
+    requests, features, matrix = prepare(records, reference_day)
+    model.enrich_requests(
+        requests,
+        *model.predict(matrix),
+        times_reported=features["times_reported"],
+        times_cleaned=features["times_cleaned"],
+    )
+    for request in requests:
+        request.record[SOURCE_FINGERPRINT_FIELD] = request.source_fingerprint()
+    return records
+
+
+class TestPredictionCache:
+    def test_cold_cache_matches_enrich_requests(self, trained_model, cache):
+        records = build_records()
+
+        enrich(trained_model, cache, records)
+
+        assert records == enrich_without_cache(trained_model, build_records())
+        assert (cache.hits, cache.misses) == (0, len(records))
+
+    def test_unchanged_rows_skip_the_model(self, trained_model, cache):
+        enrich(trained_model, cache, build_records())
+        records = build_records()
+
+        warm_cache = PredictionCache(cache.file_name)
+        with pytest.MonkeyPatch.context() as patcher:
+            patcher.setattr(trained_model, "predict", pytest.fail)
+            enrich(trained_model, warm_cache, records)
+
+        assert records == enrich_without_cache(trained_model, build_records())
+        assert (warm_cache.hits, warm_cache.misses) == (len(records), 0)
+
+    def test_only_changed_rows_are_predicted(self, trained_model, cache):
+        enrich(trained_model, cache, build_records())
+        records = build_records()
+        records[0]["last_updated"] = "2025-03-15"
+
+        warm_cache = PredictionCache(cache.file_name)
+        enrich(trained_model, warm_cache, records)
+
+        changed = build_records()
+        changed[0]["last_updated"] = "2025-03-15"
+        assert records == enrich_without_cache(trained_model, changed)
+        assert warm_cache.misses == 1
+
+    def test_subset_runs_keep_other_entries(self, trained_model, cache):
+        enrich(trained_model, cache, build_records())
+        enrich(trained_model, cache, build_records()[:5])
+
+        warm_cache = PredictionCache(cache.file_name)
+        enrich(trained_model, warm_cache, build_records())
+
+        assert warm_cache.misses == 0
+
+    def test_new_model_version_discards_entries(self, trained_model, cache):
+        enrich(trained_model, cache, build_records())
+        _, features, matrix = prepare(build_records(30))
+        other_model = GraffitiPredictionModel()
+        other_model.train(matrix, TrainingTargets.from_features(features))
+
+        warm_cache = PredictionCache(cache.file_name)
+        enrich(other_model, warm_cache, build_records())
+
+        assert warm_cache.hits == 0
+
+    def test_packed_model_shares_entries(self, trained_model, cache):
+        enrich(trained_model, cache, build_records())
+        packed = PackedPredictionModel.from_model(trained_model)
+
+        warm_cache = PredictionCache(cache.file_name)
+        enrich(packed, warm_cache, build_records())
+
+        assert warm_cache.misses == 0
+
+    def test_unversioned_model_is_not_cached(self, trained_model, cache):
+        packed = PackedPredictionModel.from_model(trained_model)
+        packed.version = None
+
+        enrich(packed, cache, build_records())
+        enrich(packed, cache, build_records())
+
+        assert cache.hits == 0
+
+    def test_next_day_hits_with_the_saved_model(self, trained_model, cache, tmp_path):
+        path = str(tmp_path / "model.packed.joblib")
+        PackedPredictionModel.from_model(trained_model).save(path)
+        enrich(PackedPredictionModel.load(path), cache, build_records())
+        records = build_records()
+
+        warm_cache = PredictionCache(cache.file_name)
+        enrich(PackedPredictionModel.load(path), warm_cache, records, REFERENCE_DAY + 1)
+
+        assert warm_cache.hits > 0
+        assert records == enrich_without_cache(
+            trained_model, build_records(), REFERENCE_DAY + 1
+        )
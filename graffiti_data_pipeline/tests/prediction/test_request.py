@@ -4,7 +4,33 @@ from graffiti_data_pipeline.config import (
     GRAFFITI_CLEANED_STATUS,
     GRAFFITI_COMPLETE_STATUSES,
 )
-from graffiti_data_pipeline.prediction.request import GraffitiServiceRequest
+from graffiti_data_pipeline.prediction.request import (
+    GraffitiServiceRequest,
+    to_epoch_day,
+)
+
+
+class TestToEpochDay:
+    def test_iso_date(self):
+        assert to_epoch_day("1970-01-01") == 0
+        assert to_epoch_day("2026-01-02") == 20455
+
+    def test_iso_datetime_drops_the_time_of_day(self):
+        assert to_epoch_day("2026-01-02T23:59:59") == 20455
+
+    def test_non_iso_date(self):
+        assert to_epoch_day("01/02/2026") == 20455
+
+    @pytest.mark.parametrize(
+        "value", ["2026-01-02T01:00:00+05:00", "2026-01-02T23:00:00-05:00"]
+    )
+    def test_keeps_the_local_day_of_an_offset(self, value):
+        assert to_epoch_day(value) == 20455
+
+    @pytest.mark.parametrize("value", [None, ""])
+    def test_rejects_missing_dates(self, value):
+        with pytest.raises(ValueError):
+            to_epoch_day(value)
 
 
 class TestGraffitiServiceRequest:
@@ -31,6 +57,10 @@ class TestGraffitiServiceRequest:
         request = GraffitiServiceRequest(sample_record)
         assert request.get_borough() == "manhattan"
 
+    def test_get_borough_prefers_the_last_borough_named(self):
+        request = GraffitiServiceRequest({"address": "12 QUEENS BLVD, Brooklyn"})
+        assert request.get_borough() == "brooklyn"
+
     def test_get_last_tag_date(self, sample_record):
         request = GraffitiServiceRequest(sample_record)
         assert isinstance(request.get_last_tag_date(), pandas.Timestamp)
@@ -322,3 +352,22 @@ class TestGraffitiServiceRequest:
         # First request created Jan 1; the only completion is Jan 20 (after Jan 1)
         # so there's no *past* history → None
         assert requests[0].get_resolution_velocity(address_index) is None
+
+    def test_source_fingerprint_ignores_prediction_fields(self):
+        record = {"address": "1 A ST", "created": "2026-01-01", "status": "Open"}
+        request = GraffitiServiceRequest(record)
+        fingerprint = request.source_fingerprint()
+        record["graffiti_likelihood"] = 42.0
+        assert GraffitiServiceRequest(record).source_fingerprint() == fingerprint
+
+    def test_source_fingerprint_changes_with_status(self):
+        record = {"address": "1 A ST", "created": "2026-01-01", "status": "Open"}
+        cleaned = {**record, "status": "Cleaned"}
+        assert (
+            GraffitiServiceRequest(record).source_fingerprint()
+            != GraffitiServiceRequest(cleaned).source_fingerprint()
+        )
+
+    def test_days_since_last_tag_uses_reference_day(self):
+        request = GraffitiServiceRequest({"last_updated": "1970-01-11"})
+        assert request.get_days_since_last_tag(reference_day=15) == 5
@@ -0,0 +1,141 @@
+import threading
+import urllib.error
+
+import numpy as np
+import pandas
+import pytest
+
+from graffiti_data_pipeline.prediction.features import (
+    MODEL_FEATURE_COLUMNS,
+    FeatureMatrix,
+)
+from graffiti_data_pipeline.prediction.inference import PackedPredictionModel
+from graffiti_data_pipeline.prediction.model import (
+    GraffitiPredictionModel,
+    TrainingTargets,
+)
+from graffiti_data_pipeline.prediction.server import (
+    InferenceClient,
+    InferenceServer,
+    MicroBatcher,
+    feature_rows,
+)
+
+
+def build_rows(row_count=60):
+    return [
+        {
+            "days_since_last_tag": number % 17,
+            "borough": number % 5,
+            "total_tags": 1 + number % 4,
+            "latitude": 40.5 + number / 1000,
+            "longitude": -74.0 + number / 1000,
+        }
+        for number in range(row_count)
+    ]
+
+
+@pytest.fixture(scope="module")
+def packed_model():
+    rows = build_rows()
+    features = pandas.DataFrame(rows).reindex(columns=MODEL_FEATURE_COLUMNS)
+    targets = TrainingTargets(
+        recurrence=pandas.Series([number % 2 for number in range(len(rows))]),
+        cleaning=pandas.Series([number % 3 == 0 for number in range(len(rows))]),
+        time_to_next_update=pandas.Series(
+            [float(number) for number in range(len(rows))]
+        ),
+        recurrence_window=pandas.Series(
+            [float(number % 9) for number in range(len(rows))]
+        ),
+        resolution_time=pandas.Series([None] * len(rows), dtype=float),
+    )
+    model = GraffitiPredictionModel()
+    model.train(features, targets)
+    return PackedPredictionModel.from_model(model)
+
+
+def start_server(model, **batcher_options):
+    server = InferenceServer(("127.0.0.1", 0), MicroBatcher(model, **batcher_options))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def client(packed_model):
+    server = start_server(packed_model, max_wait_ms=200)
+    host, port = server.server_address
+    yield InferenceClient(f"http://{host}:{port}")
+    server.shutdown()
+    server.server_close()
+
+
+class TestFeatureRows:
+    def test_missing_columns_are_nan(self):
+        values = feature_rows([{"borough": 2, "total_tags": None}])
+
+        assert values[0, MODEL_FEATURE_COLUMNS.index("borough")] == 2
+        assert np.isnan(values[0, MODEL_FEATURE_COLUMNS.index("total_tags")])
+
+    def test_unknown_columns_are_rejected(self):
+        with pytest.raises(ValueError, match="Unknown feature columns"):
+            feature_rows([{"graffiti_color": 1}])
+
+
+class TestInferenceServer:
+    def test_predictions_match_the_model(self, client, packed_model):
+        rows = build_rows(5)
+
+        predictions = client.predict(rows)
+
+        expected = packed_model.predict(
+            FeatureMatrix(feature_rows(rows), MODEL_FEATURE_COLUMNS)
+        )
+        np.testing.assert_allclose(
+            [row["recurrence_probabilities"] for row in predictions],
+            expected.recurrence_probabilities,
+            rtol=1e-6,
+        )
+        assert [row["resolution_time_predictions"] for row in predictions] == [None] * 5
+
+    def test_concurrent_requests_share_batches(self, client):
+        rows = build_rows(8)
+        results = [None] * len(rows)
+
+        def request(position):
+            results[position] = client.predict([rows[position]])
+
+        threads = [
+            threading.Thread(target=request, args=(position,))
+            for position in range(len(rows))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        metrics = client.metrics()
+        assert all(len(result) == 1 for result in results)
+        assert metrics["requests"] == len(rows)
+        assert metrics["batches"] < len(rows)
+        assert metrics["p50_ms"] > 0
+
+    def test_batches_stop_at_max_rows(self, packed_model):
+        server = start_server(packed_model, max_batch_rows=1, max_wait_ms=200)
+        host, port = server.server_address
+        client = InferenceClient(f"http://{host}:{port}")
+        try:
+            client.predict(build_rows(1))
+            client.predict(build_rows(1))
+
+            assert client.metrics()["batches"] == 2
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_bad_rows_get_a_client_error(self, client):
+        with pytest.raises(urllib.error.HTTPError) as error:
+            client.predict([{"graffiti_color": 1}])
+
+        assert error.value.code == 400
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas
+import pytest
+
+from graffiti_data_pipeline.prediction.inference import PackedPredictionModel
+from graffiti_data_pipeline.prediction.model import (
+    GraffitiPredictionModel,
+    TrainingTargets,
+)
+from graffiti_data_pipeline.prediction.sharding import ShardedPredictionModel
+
+# Borough codes 0 and 1 get shards; code 2 is too small and uses the global model.
+BOROUGH_ROWS = {0: 60, 1: 50, 2: 10}
+
+
+def build_training_data():
+    boroughs = np.repeat(list(BOROUGH_ROWS), list(BOROUGH_ROWS.values()))
+    row_count = len(boroughs)
+    features = pandas.DataFrame(
+        {
+            "days_since_last_tag": [number % 17 for number in range(row_count)],
+            "borough": boroughs,
+            "total_tags": [1 + number % 4 for number in range(row_count)],
+            "latitude": [40.5 + number / 1000 for number in range(row_count)],
+        }
+    )
+    targets = TrainingTargets(
+        recurrence=pandas.Series([int(number % 4 > 0) for number in range(row_count)]),
+        cleaning=pandas.Series([number % 3 == 0 for number in range(row_count)]),
+        time_to_next_update=pandas.Series(
+            [float(number % 30) for number in range(row_count)]
+        ),
+        recurrence_window=pandas.Series(
+            [None if number % 3 else float(number) for number in range(row_count)]
+        ),
+        resolution_time=pandas.Series([None] * row_count, dtype=float),
+    )
+    return features, targets
+
+
+def trained_model(**options):
+    features, targets = build_training_data()
+    model = ShardedPredictionModel(min_shard_rows=40, **options)
+    model.train(features, targets)
+    return model, features, targets
+
+
+def assert_same_predictions(expected, actual):
+    for expected_values, actual_values in zip(expected, actual):
+        np.testing.assert_allclose(
+            np.asarray(actual_values, dtype=float),
+            np.asarray(expected_values, dtype=float),
+        )
+
+
+class TestShardedPredictionModel:
+    def test_shards_only_large_boroughs(self):
+        model, _, _ = trained_model()
+
+        assert sorted(model.shards) == [0, 1]
+        assert len(model.global_model.trained_row_hashes) == sum(BOROUGH_ROWS.values())
+        assert len(model.shards[1].trained_row_hashes) == BOROUGH_ROWS[1]
+
+    def test_rows_are_routed_to_their_shard(self):
+        model, features, _ = trained_model()
+        rows = {
+            "shard": features.index[features["borough"] == 1],
+            "global": features.index[features["borough"] == 2],
+        }
+
+        predictions = model.predict(features)
+
+        for member, member_rows in [
+            (model.shards[1], rows["shard"]),
+            (model.global_model, rows["global"]),
+        ]:
+            expected = member.predict(features.loc[member_rows])
+            assert_same_predictions(
+                expected,
+                [np.asarray(values)[member_rows] for values in predictions],
+            )
+
+    def test_unfitted_member_predicts_none(self):
+        model, features, _ = trained_model()
+
+        predictions = model.predict(features)
+
+        assert predictions.resolution_time_predictions == [None] * len(features)
+        assert isinstance(predictions.time_predictions, np.ndarray)
+
+    def test_process_pool_matches_in_process_training(self):
+        serial, features, _ = trained_model(n_jobs=1)
+        parallel, _, _ = trained_model(n_jobs=2)
+
+        assert_same_predictions(serial.predict(features), parallel.predict(features))
+
+    def test_warm_start_grows_every_member(self):
+        model, features, targets = trained_model()
+        trees = model.shards[0].tree_count
+
+        model.warm_start(features, targets, additional_trees=5)
+
+        assert model.shards[0].tree_count == trees + 5
+        assert model.global_model.tree_count == trees + 5
+
+    def test_save_and_load_round_trip(self, tmp_path):
+        model, features, _ = trained_model()
+        path = str(tmp_path / "sharded.joblib")
+
+        model.save(path)
+        loaded = ShardedPredictionModel.load(path)
+
+        assert sorted(loaded.shards) == [0, 1]
+        assert_same_predictions(model.predict(features), loaded.predict(features))
+
+    def test_packed_matches_source_model(self, tmp_path):
+        model, features, _ = trained_model()
+        path = str(tmp_path / "sharded.packed.joblib")
+
+        model.packed().save(path)
+        packed = ShardedPredictionModel.load(path, member_class=PackedPredictionModel)
+
+        assert_same_predictions(model.predict(features), packed.predict(features))
+
+    def test_split_range_comes_from_each_rows_member(self):
+        model, features, _ = trained_model()
+        in_shard = (features["borough"] == 0).to_numpy()
+
+        low, high = model.split_range(features, "days_since_last_tag")
+
+        shard_low, shard_high = model.shards[0].split_range(
+            features[in_shard], "days_since_last_tag"
+        )
+        np.testing.assert_array_equal(low[in_shard], shard_low)
+        np.testing.assert_array_equal(high[in_shard], shard_high)
+        np.testing.assert_array_equal(
+            (low, high), model.packed().split_range(features, "days_since_last_tag")
+        )
+
+    def test_model_kinds_are_not_interchangeable(self, tmp_path):
+        model, features, targets = trained_model()
+        sharded_path = str(tmp_path / "sharded.joblib")
+        single_path = str(tmp_path / "single.joblib")
+        model.save(sharded_path)
+        single = GraffitiPredictionModel()
+        single.train(features, targets)
+        single.save(single_path)
+
+        with pytest.raises(ValueError, match="is sharded"):
+            GraffitiPredictionModel.load(sharded_path)
+        with pytest.raises(ValueError, match="is not sharded"):
+            ShardedPredictionModel.load(single_path)
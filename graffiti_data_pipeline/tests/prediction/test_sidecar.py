@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from graffiti_data_pipeline.prediction import sidecar as sidecar_module
+from graffiti_data_pipeline.prediction.sidecar import PredictionSidecar, record_key
+
+
+@pytest.fixture
+def sidecar(tmp_path):
+    return PredictionSidecar(str(tmp_path / "nested" / "predictions.json"))
+
+
+def build_records():
+    return [
+        {"service_request": f"G{number}", "address": f"{number} MAIN ST"}
+        for number in range(3)
+    ]
+
+
+class TestPredictionSidecar:
+    def test_writes_one_list_per_field(self, sidecar):
+        sidecar.update(
+            ["G0", "G1"],
+            {"graffiti_likelihood": [10.0, 20.0], "estimated_next_tag": ["a", "b"]},
+            ["G0", "G1"],
+        )
+
+        with open(sidecar.file_name) as file:
+            assert json.load(file) == {
+                "service_request": ["G0", "G1"],
+                "graffiti_likelihood": [10.0, 20.0],
+                "estimated_next_tag": ["a", "b"],
+            }
+
+    @pytest.mark.parametrize("first, second", [("a", "b"), ("b", "a")])
+    def test_rows_with_different_fields_keep_every_field(self, sidecar, first, second):
+        rows = {"a": {"x": 1}, "b": {"x": 2, "y": 3}}
+
+        sidecar.save({first: rows[first], second: rows[second]})
+
+        assert sidecar.load() == {"a": {"x": 1, "y": None}, "b": {"x": 2, "y": 3}}
+
+    def test_update_keeps_other_rows_and_drops_vanished_ones(self, sidecar):
+        sidecar.update(
+            ["G0", "G1", "G2"],
+            {"graffiti_likelihood": [1.0, 2.0, 3.0]},
+            ["G0", "G1", "G2"],
+        )
+
+        sidecar.update(["G1"], {"graffiti_likelihood": [5.0]}, ["G0", "G1"])
+
+        assert sidecar.load() == {
+            "G0": {"graffiti_likelihood": 1.0},
+            "G1": {"graffiti_likelihood": 5.0},
+        }
+
+    def test_join_merges_without_mutating_records(self, sidecar):
+        records = build_records()
+        sidecar.update(["G1"], {"graffiti_likelihood": [5.0]}, ["G0", "G1", "G2"])
+
+        merged = sidecar.join(records)
+
+        assert merged[1] == {**records[1], "graffiti_likelihood": 5.0}
+        assert merged[0] == records[0]
+        assert records == build_records()
+
+    def test_missing_sidecar_joins_nothing(self, sidecar):
+        assert sidecar.join(build_records()) == build_records()
+
+    def test_records_without_service_request_use_unique_key(self):
+        assert record_key({"unique_key": "key-1", "address": "1 MAIN ST"}) == "key-1"
+
+    def test_main_writes_merged_view(self, sidecar, tmp_path):
+        lookups_path = tmp_path / "lookups.json"
+        lookups_path.write_text(json.dumps(build_records()))
+        output_path = tmp_path / "merged.json"
+        sidecar.update(["G2"], {"graffiti_likelihood": [7.0]}, ["G2"])
+
+        sidecar_module.main(
+            [
+                "--file-path",
+                str(lookups_path),
+                "--sidecar-path",
+                sidecar.file_name,
+                "--output",
+                str(output_path),
+            ]
+        )
+
+        merged = json.loads(output_path.read_text())
+        assert merged[2]["graffiti_likelihood"] == 7.0
+        assert "graffiti_likelihood" not in merged[0]
@@ -0,0 +1,147 @@
+from unittest.mock import patch
+
+import numpy as np
+import pandas
+import pytest
+
+from graffiti_data_pipeline.config import GRAFFITI_CLEANED_STATUS
+from graffiti_data_pipeline.prediction.features import extract_features
+from graffiti_data_pipeline.prediction.request import GraffitiServiceRequest
+from graffiti_data_pipeline.prediction.spatial import (
+    EARTH_RADIUS_METERS,
+    NEARBY_RADII_METERS,
+    NEIGHBORHOOD_COLUMNS,
+    NEIGHBORHOOD_RADIUS_METERS,
+    RECENT_NEARBY_DAYS,
+    ReportPoints,
+    neighborhood_features,
+)
+
+REFERENCE_DAY = 20_000
+
+
+def build_points(count=300, seed=7):
+    generator = np.random.default_rng(seed)
+    # Roughly a 2km square, so every radius finds some neighbors.
+    latitude = 40.70 + generator.uniform(0, 0.018, count)
+    longitude = -74.00 + generator.uniform(0, 0.024, count)
+    # Repeat some locations, as with several reports at one address.
+    latitude[::5] = latitude[1::5][: len(latitude[::5])]
+    longitude[::5] = longitude[1::5][: len(longitude[::5])]
+    latitude[::31] = np.nan
+    return ReportPoints(
+        latitude=latitude,
+        longitude=longitude,
+        created_day=REFERENCE_DAY - generator.integers(0, 300, count),
+        cleaned=generator.random(count) < 0.4,
+    )
+
+
+def brute_force_features(points):
+    """Neighborhood columns from every pairwise haversine distance."""
+    latitude = np.radians(points.latitude)
+    longitude = np.radians(points.longitude)
+    half_angle = (
+        np.sin((latitude[:, None] - latitude[None, :]) / 2) ** 2
+        + np.cos(latitude[:, None])
+        * np.cos(latitude[None, :])
+        * np.sin((longitude[:, None] - longitude[None, :]) / 2) ** 2
+    )
+    distance = 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(half_angle))
+    np.fill_diagonal(distance, np.inf)
+    located = ~np.isnan(points.latitude)
+    recent = REFERENCE_DAY - points.created_day < RECENT_NEARBY_DAYS
+    columns = {}
+    for radius in NEARBY_RADII_METERS:
+        columns[f"nearby_reports_{radius}m"] = (distance <= radius).sum(axis=1)
+    within = distance <= NEIGHBORHOOD_RADIUS_METERS
+    nearby = within.sum(axis=1)
+    columns["recent_nearby_reports"] = (within & recent).sum(axis=1)
+    with np.errstate(invalid="ignore"):
+        columns["nearby_cleaned_ratio"] = (within & points.cleaned).sum(axis=1) / nearby
+    return {
+        column: np.where(located, values, np.nan) for column, values in columns.items()
+    }
+
+
+def assert_same_columns(expected, actual):
+    assert list(actual) == NEIGHBORHOOD_COLUMNS
+    for column in NEIGHBORHOOD_COLUMNS:
+        np.testing.assert_allclose(actual[column], expected[column], err_msg=column)
+
+
+def subset(points, rows):
+    return ReportPoints(*(values[rows] for values in points))
+
+
+class TestNeighborhoodFeatures:
+    def test_matches_brute_force(self):
+        points = build_points()
+
+        actual = neighborhood_features(points, points, REFERENCE_DAY)
+
+        assert_same_columns(brute_force_features(points), actual)
+
+    def test_small_chunks_match_brute_force(self):
+        points = build_points()
+
+        with patch("graffiti_data_pipeline.prediction.spatial.MAX_PAIRS_PER_CHUNK", 50):
+            actual = neighborhood_features(points, points, REFERENCE_DAY)
+
+        assert_same_columns(brute_force_features(points), actual)
+
+    def test_queries_are_counted_among_all_reports(self):
+        points = build_points()
+        rows = np.arange(0, len(points.latitude), 3)
+
+        actual = neighborhood_features(subset(points, rows), points, REFERENCE_DAY)
+
+        expected = brute_force_features(points)
+        assert_same_columns(
+            {column: values[rows] for column, values in expected.items()}, actual
+        )
+
+    def test_lone_report_has_no_neighbors(self):
+        points = ReportPoints(
+            latitude=np.array([40.7, 40.8, 0.0]),
+            longitude=np.array([-74.0, -73.9, 0.0]),
+            created_day=np.full(3, REFERENCE_DAY),
+            cleaned=np.array([True, False, True]),
+        )
+
+        actual = neighborhood_features(points, points, REFERENCE_DAY)
+
+        np.testing.assert_array_equal(actual["nearby_reports_500m"], [0, 0, np.nan])
+        assert np.isnan(actual["nearby_cleaned_ratio"]).all()
+
+
+class TestExtractNeighborhoodColumns:
+    @pytest.fixture
+    def requests(self):
+        return [
+            GraffitiServiceRequest(
+                {
+                    "address": f"{number % 7} ELM ST, Bronx",
+                    "created": f"2025-03-{1 + number:02d}",
+                    "last_updated": f"2025-04-{1 + number:02d}",
+                    "status": GRAFFITI_CLEANED_STATUS if number % 2 else "Open",
+                    "latitude": 40.85 + (number % 7) / 2000,
+                    "longitude": -73.90,
+                    "unique_key": f"key-{number}",
+                }
+            )
+            for number in range(20)
+        ]
+
+    def test_subset_uses_neighborhood_requests(self, requests):
+        keywords = [GRAFFITI_CLEANED_STATUS]
+        expected = extract_features(requests, keywords, REFERENCE_DAY)
+
+        actual = extract_features(
+            requests[:5], keywords, REFERENCE_DAY, neighborhood_requests=requests
+        )
+
+        pandas.testing.assert_frame_equal(
+            actual[NEIGHBORHOOD_COLUMNS], expected[NEIGHBORHOOD_COLUMNS].iloc[:5]
+        )
+        assert (actual["nearby_reports_500m"] == len(requests) - 1).all()
@@ -0,0 +1,30 @@
+from graffiti_data_pipeline.prediction import spatial_benchmark
+from graffiti_data_pipeline.prediction.spatial_benchmark import (
+    SpatialBenchmarkReport,
+    format_report,
+    random_points,
+)
+
+
+class TestSpatialBenchmark:
+    def test_points_share_locations_inside_nyc(self):
+        points = random_points(1000, reports_per_location=4.0)
+
+        (south, north), (west, east) = spatial_benchmark.NYC_BOUNDS
+        assert len(points.latitude) == 1000
+        assert ((points.latitude >= south) & (points.latitude <= north)).all()
+        assert ((points.longitude >= west) & (points.longitude <= east)).all()
+        assert len(set(zip(points.latitude, points.longitude))) <= 250
+
+    def test_reports_every_size(self):
+        reports = spatial_benchmark.benchmark_neighborhood([200, 400])
+
+        assert [report.points for report in reports] == [200, 400]
+        assert all(report.seconds > 0 for report in reports)
+
+    def test_format_report_has_one_row_per_size(self):
+        report = format_report([SpatialBenchmarkReport(1000, 250, 0.5, 2000.0, 3.25)])
+
+        header, row = report.splitlines()
+        assert header.split() == list(SpatialBenchmarkReport._fields)
+        assert row.split() == ["1000", "250", "0.500", "2000", "3.2"]
@@ -0,0 +1,179 @@
+import math
+
+import pytest
+
+from graffiti_data_pipeline.config import (
+    GRAFFITI_CLEANED_STATUS,
+    GRAFFITI_COMPLETE_STATUSES,
+)
+from graffiti_data_pipeline.prediction.features import _build_address_index
+from graffiti_data_pipeline.prediction.request import (
+    GraffitiServiceRequest,
+    to_epoch_day,
+)
+from graffiti_data_pipeline.prediction.timeline import (
+    REPORT_RATE_DECAY,
+    AddressTimeline,
+    GroupTimelines,
+    timeline_at,
+)
+
+
+def make_request(created, last_updated, status="Open"):
+    return GraffitiServiceRequest(
+        {
+            "address": "8 ASH LN, Bronx",
+            "created": created,
+            "last_updated": last_updated,
+            "status": status,
+        }
+    )
+
+
+class TestAddressTimeline:
+    @pytest.fixture
+    def timeline(self):
+        complete_status = GRAFFITI_COMPLETE_STATUSES[0]
+        return AddressTimeline(
+            [
+                make_request("2026-02-01", "2026-02-05"),
+                make_request("2026-01-05", "2026-01-25", GRAFFITI_CLEANED_STATUS),
+                make_request("2026-01-01", "2026-01-11", complete_status),
+            ]
+        )
+
+    def test_behaves_like_request_list(self, timeline):
+        assert len(timeline) == 3
+        assert len(list(timeline)) == 3
+
+    def test_cleaned_count(self, timeline):
+        assert timeline.cleaned_count == 1
+
+    def test_next_report_after_is_strictly_later(self, timeline):
+        assert timeline.next_report_after(to_epoch_day("2026-01-01")) == (
+            to_epoch_day("2026-01-05")
+        )
+
+    def test_next_report_after_last_report_is_none(self, timeline):
+        assert timeline.next_report_after(to_epoch_day("2026-02-01")) is None
+
+    def test_first_completion_on_or_after_includes_same_day(self, timeline):
+        day = to_epoch_day("2026-01-11")
+        assert timeline.first_completion_on_or_after(day) == day
+
+    def test_first_completion_after_all_completions_is_none(self, timeline):
+        assert timeline.first_completion_on_or_after(to_epoch_day("2026-03-01")) is (
+            None
+        )
+
+    def test_completions_before_uses_prefix_sums(self, timeline):
+        count, total_days = timeline.completions_before(to_epoch_day("2026-02-01"))
+        assert (count, total_days) == (2, 30)
+
+    def test_completions_before_excludes_same_day(self, timeline):
+        count, total_days = timeline.completions_before(to_epoch_day("2026-01-11"))
+        assert (count, total_days) == (0, 0)
+
+    def test_reports_between_is_half_open(self, timeline):
+        start = to_epoch_day("2026-01-01")
+        end = to_epoch_day("2026-02-01")
+        assert timeline.reports_between(start, end) == 2
+
+    def test_decayed_report_rate_weights_earlier_reports_by_age(self, timeline):
+        day = to_epoch_day("2026-02-01")
+        ages = [day - to_epoch_day("2026-01-05"), day - to_epoch_day("2026-01-01")]
+
+        rate = timeline.decayed_report_rate(day)
+
+        assert rate == pytest.approx(
+            REPORT_RATE_DECAY * sum(math.exp(-REPORT_RATE_DECAY * age) for age in ages)
+        )
+
+    def test_decayed_report_rate_excludes_same_day(self, timeline):
+        assert timeline.decayed_report_rate(to_epoch_day("2026-01-01")) == 0.0
+
+    def test_empty_timeline(self):
+        timeline = AddressTimeline([])
+        assert len(timeline) == 0
+        assert timeline.next_report_after(0) is None
+        assert timeline.first_completion_on_or_after(0) is None
+        assert timeline.completions_before(0) == (0, 0)
+        assert timeline.decayed_report_rate(0) == 0.0
+
+
+class TestGroupTimelines:
+    @pytest.fixture
+    def requests(self):
+        complete_status = GRAFFITI_COMPLETE_STATUSES[0]
+        return [
+            make_request("2026-01-01", "2026-01-11", complete_status),
+            make_request("2026-01-03", "2026-01-04", GRAFFITI_CLEANED_STATUS),
+            make_request("2026-01-05", "2026-01-25", GRAFFITI_CLEANED_STATUS),
+            make_request("2026-01-06", "2026-01-07", complete_status),
+            make_request("2026-02-01", "2026-02-05"),
+        ]
+
+    def test_keeps_groups_apart(self, requests):
+        timelines = GroupTimelines.from_requests(requests, [0, 1, 0, 1, 0])
+        created = [request.created_day for request in requests]
+
+        next_days, found = timelines.next_report_after([0, 1, 0, 1, 0], created)
+
+        assert list(found) == [True, True, True, False, False]
+        assert list(next_days[found]) == [
+            to_epoch_day("2026-01-05"),
+            to_epoch_day("2026-01-06"),
+            to_epoch_day("2026-02-01"),
+        ]
+        assert list(timelines.report_counts) == [3, 2]
+        assert list(timelines.cleaned_counts) == [1, 1]
+
+    def test_matches_each_address_timeline(self, requests):
+        groups = [0, 1, 0, 1, 0]
+        timelines = GroupTimelines.from_requests(requests, groups)
+        per_address = [
+            AddressTimeline(
+                [request for request, group in zip(requests, groups) if group == index]
+            )
+            for index in range(2)
+        ]
+        days = list(range(to_epoch_day("2025-12-31"), to_epoch_day("2026-02-03")))
+
+        for group, timeline in enumerate(per_address):
+            query_groups = [group] * len(days)
+            counts, totals = timelines.completions_before(query_groups, days)
+            rates = timelines.decayed_report_rate(query_groups, days)
+            for position, day in enumerate(days):
+                assert timeline.completions_before(day) == (
+                    counts[position],
+                    totals[position],
+                )
+                assert timeline.decayed_report_rate(day) == pytest.approx(
+                    rates[position]
+                )
+
+    def test_queries_groups_without_requests(self):
+        timelines = GroupTimelines.from_requests([], [], group_count=2)
+
+        days, found = timelines.first_completion_on_or_after([1], [0])
+
+        assert not found[0]
+        assert timelines.reports_between([1], [0], [10])[0] == 0
+
+
+class TestTimelineAt:
+    def test_returns_indexed_timeline(self):
+        request = make_request("2026-01-01", "2026-01-02")
+        address_index = _build_address_index([request])
+        assert timeline_at(address_index, request.address) is (
+            address_index[request.address]
+        )
+
+    def test_builds_timeline_from_request_list(self):
+        request = make_request("2026-01-01", "2026-01-02")
+        timeline = timeline_at({request.address: [request]}, request.address)
+        assert isinstance(timeline, AddressTimeline)
+        assert len(timeline) == 1
+
+    def test_missing_address_gives_empty_timeline(self):
+        assert len(timeline_at({}, "nowhere")) == 0
@@ -0,0 +1,29 @@
+from graffiti_data_pipeline.storages.json_lines import JsonLinesFile
+
+
+class TestJsonLinesFile:
+    def test_load_missing_file_returns_empty_list(self, tmp_path):
+        assert JsonLinesFile(str(tmp_path / "missing.jsonl")).load() == []
+
+    def test_append_and_load_round_trip(self, tmp_path):
+        store = JsonLinesFile(str(tmp_path / "data.jsonl"))
+        store.append({"a": 1})
+        store.append({"b": 2})
+
+        assert store.load() == [{"a": 1}, {"b": 2}]
+
+    def test_load_skips_truncated_line(self, tmp_path):
+        path = tmp_path / "data.jsonl"
+        path.write_text('{"a": 1}\n{"b": ')
+
+        assert JsonLinesFile(str(path)).load() == [{"a": 1}]
+
+    def test_clear_removes_file(self, tmp_path):
+        store = JsonLinesFile(str(tmp_path / "data.jsonl"))
+        store.append({"a": 1})
+        store.clear()
+
+        assert store.load() == []
+
+    def test_clear_missing_file_is_noop(self, tmp_path):
+        JsonLinesFile(str(tmp_path / "missing.jsonl")).clear()
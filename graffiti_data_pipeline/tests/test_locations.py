@@ -0,0 +1,146 @@
+from unittest.mock import patch
+
+import pytest
+
+from graffiti_data_pipeline.locations import (
+    ParsedAddress,
+    geohash,
+    parse_address,
+    resolve_locations,
+)
+
+
+class TestParseAddress:
+    def test_normalizes_street_words(self):
+        assert parse_address("10 East 3rd Street, Brooklyn") == ParsedAddress(
+            "10", ("E", "3", "ST"), "brooklyn"
+        )
+        assert parse_address("10 E THIRD ST., Brooklyn") == ParsedAddress(
+            "10", ("E", "3", "ST"), "brooklyn"
+        )
+
+    def test_keeps_hyphenated_house_numbers(self):
+        assert parse_address("21-83 31 STREET, Queens") == ParsedAddress(
+            "21-83", ("31", "ST"), "queens"
+        )
+
+    def test_address_without_house_number(self):
+        assert parse_address("BROADWAY") == ParsedAddress(None, ("BROADWAY",), None)
+
+
+class TestGeohash:
+    @pytest.mark.parametrize(
+        "latitude, longitude, precision, expected",
+        [(57.64911, 10.40744, 11, "u4pruydqqvj"), (40.7128, -74.0060, 7, "dr5regw")],
+    )
+    def test_known_cells(self, latitude, longitude, precision, expected):
+        assert geohash(latitude, longitude, precision) == expected
+
+
+class TestResolveLocations:
+    def test_spelling_variants_share_the_most_common_address(self):
+        addresses = [
+            "123 MAIN STREET, Brooklyn",
+            "123 Main St., Brooklyn",
+            "123 MAIN ST, Brooklyn",
+            "123 MAIN ST, Brooklyn",
+            "123 MAINN ST, Brooklyn",
+        ]
+
+        assert resolve_locations(addresses) == ["123 MAIN ST, Brooklyn"] * 5
+
+    @pytest.mark.parametrize(
+        "other",
+        [
+            "125 MAIN ST, Brooklyn",
+            "123 MAIN AVE, Brooklyn",
+            "123 MAIN ST, Queens",
+            "123 MAIN ST",
+            "123 ELM ST, Brooklyn",
+        ],
+    )
+    def test_different_locations_stay_apart(self, other):
+        addresses = ["123 MAIN ST, Brooklyn", other]
+
+        assert resolve_locations(addresses) == addresses
+
+    def test_numbered_streets_must_match(self):
+        addresses = ["5 W 23RD STREET", "5 W 23 ST", "5 W 123 ST", "5 W 24 ST"]
+
+        assert resolve_locations(addresses) == [
+            "5 W 23 ST",
+            "5 W 23 ST",
+            "5 W 123 ST",
+            "5 W 24 ST",
+        ]
+
+    def test_coordinates_merge_across_borough_text(self):
+        addresses = ["10 MAIN ST", "10 MAINE STREET, Queens", "10 MAIN ST, Bronx"]
+        coordinates = [(40.7, -73.9), (40.70001, -73.9), (40.8, -73.9)]
+
+        assert resolve_locations(addresses, coordinates) == [
+            "10 MAIN ST",
+            "10 MAIN ST",
+            "10 MAIN ST, Bronx",
+        ]
+
+    def test_require_geohash_merges_similar_streets_only_in_one_cell(self):
+        addresses = [
+            "123 MAIN ST, Bronx",
+            "123 MAINE ST, Bronx",
+            "123 MAIN STREET, Bronx",
+        ]
+
+        assert resolve_locations(addresses)[:2] == ["123 MAIN ST, Bronx"] * 2
+        assert resolve_locations(addresses, require_geohash=True) == [
+            "123 MAIN ST, Bronx",
+            "123 MAINE ST, Bronx",
+            "123 MAIN ST, Bronx",
+        ]
+        coordinates = [(40.7, -73.9), (40.70001, -73.9), (None, None)]
+        assert (
+            resolve_locations(addresses, coordinates, require_geohash=True)
+            == ["123 MAIN ST, Bronx"] * 3
+        )
+
+    def test_addresses_without_borough_need_shared_coordinates(self):
+        addresses = ["123 MAIN ST", "123 MAINE ST"]
+        far_apart = [(40.6, -74.1), (40.85, -73.85)]
+
+        assert resolve_locations(addresses) == addresses
+        assert resolve_locations(addresses, far_apart) == addresses
+
+    def test_geocoded_addresses_must_be_near_to_merge_by_street(self):
+        addresses = ["123 MAIN ST, Bronx", "123 MAINE ST, Bronx"]
+
+        assert resolve_locations(addresses, [(40.8, -73.9), (40.85, -73.85)]) == (
+            addresses
+        )
+        assert (
+            resolve_locations(addresses, [(40.8, -73.9), (40.801, -73.9)])
+            == ["123 MAIN ST, Bronx"] * 2
+        )
+        assert (
+            resolve_locations(addresses, [(40.8, -73.9), (None, None)])
+            == ["123 MAIN ST, Bronx"] * 2
+        )
+
+    def test_ids_do_not_depend_on_order(self):
+        addresses = ["7 ST MARKS PL", "7 SAINT MARKS PLACE", "8 ST MARKS PL"]
+
+        forward = resolve_locations(addresses)
+        backward = resolve_locations(addresses[::-1])
+
+        assert forward == backward[::-1]
+        assert forward[0] == forward[1]
+
+    def test_invalid_addresses_are_returned_unchanged(self):
+        addresses = [None, "", 12, "UNKNOWN"]
+
+        assert resolve_locations(addresses, [(None, None)] * 4) == addresses
+
+    def test_oversized_blocks_are_skipped(self):
+        addresses = ["1 MAIN ST", "1 MAINN ST"]
+
+        with patch("graffiti_data_pipeline.locations.MAX_BLOCK_SIZE", 1):
+            assert resolve_locations(addresses) == addresses